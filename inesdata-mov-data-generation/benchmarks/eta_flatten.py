@@ -0,0 +1,101 @@
+"""Benchmark of the ETA flattening in generate_eta_df_from_file.
+
+Compares the current implementation against the previous row-wise one (apply + pd.Series per
+row) on a synthetic day and checks both produce the same dataframe.
+
+Execution example: python benchmarks/eta_flatten.py --arrivals 100000 --per-file 50
+"""
+
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from inesdata_mov_datasets.sources.create.emt import generate_eta_df_from_file
+
+
+def legacy_generate_eta_df_from_file(content: dict) -> pd.DataFrame:
+    """Previous implementation of generate_eta_df_from_file, kept as reference."""
+    day_df = pd.DataFrame(content["data"][0]["Arrive"])
+    day_df["datetime"] = pd.to_datetime(content["datetime"])
+    day_df["date"] = pd.to_datetime(day_df["datetime"].dt.date)
+    day_df["positionBus"] = day_df["geometry"].apply(lambda row: row["coordinates"])
+    day_df["positionBusLon"] = day_df["positionBus"].apply(pd.Series)[0]
+    day_df["positionBusLat"] = day_df["positionBus"].apply(pd.Series)[1]
+    return day_df.drop(columns=["geometry", "positionBus"])
+
+
+def synthetic_day(arrivals: int, per_file: int) -> list:
+    """Build the content of the ETA files of a synthetic day.
+
+    Args:
+        arrivals (int): total number of arrivals of the day
+        per_file (int): number of arrivals of each file
+
+    Returns:
+        list: content of each ETA file
+    """
+    contents = []
+    for file_number in range(0, arrivals, per_file):
+        minute = (file_number // per_file) % 1440
+        contents.append(
+            {
+                "code": "00",
+                "datetime": f"2024-10-01T{minute // 60:02d}:{minute % 60:02d}:00",
+                "data": [
+                    {
+                        "Arrive": [
+                            {
+                                "line": str(random.randint(1, 200)),
+                                "stop": random.randint(1, 5000),
+                                "isHead": "False",
+                                "destination": "DESTINATION",
+                                "deviation": 0,
+                                "bus": random.randint(1000, 9999),
+                                "geometry": {
+                                    "type": "Point",
+                                    "coordinates": [
+                                        -3.7 + random.random() / 10,
+                                        40.4 + random.random() / 10,
+                                    ],
+                                },
+                                "estimateArrive": random.randint(0, 3600),
+                                "DistanceBus": random.randint(0, 10000),
+                                "positionTypeBus": "1",
+                            }
+                            for _ in range(min(per_file, arrivals - file_number))
+                        ]
+                    }
+                ],
+            }
+        )
+    return contents
+
+
+def timed(function, contents: list) -> tuple:
+    """Flatten every file of the day with a function.
+
+    Returns:
+        tuple: day's dataframe and seconds spent
+    """
+    start = time.perf_counter()
+    df = pd.concat([function(content) for content in contents], ignore_index=True)
+    return df, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--arrivals", type=int, default=100_000)
+    parser.add_argument("--per-file", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(0)
+    contents = synthetic_day(args.arrivals, args.per_file)
+    legacy_df, legacy_time = timed(legacy_generate_eta_df_from_file, contents)
+    current_df, current_time = timed(generate_eta_df_from_file, contents)
+    pd.testing.assert_frame_equal(legacy_df, current_df)
+
+    print(f"{args.arrivals} arrivals in {len(contents)} files")
+    print(f"legacy:  {legacy_time:.2f}s")
+    print(f"current: {current_time:.2f}s ({legacy_time / current_time:.1f}x)")
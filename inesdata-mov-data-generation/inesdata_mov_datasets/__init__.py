@@ -1 +1,20 @@
 __version__: str = "0.5.0.dev"
+
+
+def __getattr__(name: str):
+    """Import read_dataset on first use, so importing the package doesn't load pandas/pyarrow.
+
+    Args:
+        name (str): Name of the attribute.
+
+    Raises:
+        AttributeError: If the package has no such attribute.
+
+    Returns:
+        Any: The attribute.
+    """
+    if name == "read_dataset":
+        from inesdata_mov_datasets.dataset import read_dataset
+
+        return read_dataset
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -6,14 +6,15 @@ from enum import Enum
 
 import pandas as pd
 import typer
+from rich import print as rich_print
 from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.table import Table
 
-from inesdata_mov_datasets.sources.create.aemet import create_aemet
-from inesdata_mov_datasets.sources.create.emt import create_emt
-from inesdata_mov_datasets.sources.create.informo import create_informo
+from inesdata_mov_datasets.sources.create.runner import create_dataset, create_datasets
 from inesdata_mov_datasets.sources.extract.aemet import get_aemet
 from inesdata_mov_datasets.sources.extract.emt import get_emt
 from inesdata_mov_datasets.sources.extract.informo import get_informo
+from inesdata_mov_datasets.sources.extract.runner import extract_sources, run_daemon
 from inesdata_mov_datasets.utils import read_settings
 
 app = typer.Typer(add_completion=False)
@@ -33,12 +34,41 @@ class Sources(str, Enum):
     informo = "informo"
 
 
+SOURCE_NAMES = {Sources.emt: "EMT", Sources.aemet: "AEMET", Sources.informo: "Informo"}
+
+
+def print_timings(timings: dict):
+    """Print the time spent creating each source's dataset per date.
+
+    Args:
+        timings (dict): seconds spent by date and source
+    """
+    sources = [source for source in SOURCE_NAMES if any(source in t for t in timings.values())]
+    table = Table(title="Dataset creation time (s)")
+    table.add_column("Date")
+    for source in sources:
+        table.add_column(SOURCE_NAMES[source], justify="right")
+    table.add_column("Total", justify="right")
+    for date in sorted(timings):
+        seconds = [timings[date][source] for source in sources]
+        table.add_row(date, *[f"{s:.1f}" for s in seconds], f"{sum(seconds):.1f}")
+    rich_print(table)
+
+
 @app.command()
 def extract(
     config_path: str = typer.Option(help="Path to configuration yaml file"),
     sources: Sources = typer.Option(
         default=Sources.all.value, help="Possible sources to extract."
     ),
+    concurrent: bool = typer.Option(
+        default=False,
+        help="Extract the selected sources concurrently sharing the HTTP session and storage client.",
+    ),
+    daemon: bool = typer.Option(
+        default=False,
+        help="Keep running and extract on schedule: EMT every minute, Informo every 5 minutes and AEMET daily.",
+    ),
 ):
     """Extract raw data from the sources configurated."""
     with Progress(
@@ -48,18 +78,28 @@ def extract(
     ) as progress:
         # read settings
         settings = read_settings(config_path)
-        # EMT
-        if sources.value == sources.emt or sources.value == sources.all:
-            progress.add_task(description="Extracting EMT data...", total=None)
-            asyncio.run(get_emt(settings))
-        # Aemet
-        if sources.value == sources.aemet or sources.value == sources.all:
-            progress.add_task(description="Extracting AEMET data...", total=None)
-            asyncio.run(get_aemet(settings))
-        # Informo
-        if sources.value == sources.informo or sources.value == sources.all:
-            progress.add_task(description="Extracting Informo data...", total=None)
-            asyncio.run(get_informo(settings))
+        selected_sources = [
+            source.value for source in SOURCE_NAMES if sources.value in (source, Sources.all)
+        ]
+        if daemon:
+            progress.add_task(description="Extracting data on schedule...", total=None)
+            asyncio.run(run_daemon(settings, selected_sources))
+        elif concurrent:
+            progress.add_task(description="Extracting data concurrently...", total=None)
+            asyncio.run(extract_sources(settings, selected_sources))
+        else:
+            # EMT
+            if sources.value == sources.emt or sources.value == sources.all:
+                progress.add_task(description="Extracting EMT data...", total=None)
+                asyncio.run(get_emt(settings))
+            # Aemet
+            if sources.value == sources.aemet or sources.value == sources.all:
+                progress.add_task(description="Extracting AEMET data...", total=None)
+                asyncio.run(get_aemet(settings))
+            # Informo
+            if sources.value == sources.informo or sources.value == sources.all:
+                progress.add_task(description="Extracting Informo data...", total=None)
+                asyncio.run(get_informo(settings))
 
         print("Extracted data")
 
@@ -80,6 +120,19 @@ def create(
     sources: Sources = typer.Option(
         default=Sources.all.value, help="Possible sources to generate."
     ),
+    stream: bool = typer.Option(
+        default=False,
+        help="Read EMT ETA raw files from MinIO into memory instead of downloading them to disk.",
+    ),
+    workers: int = typer.Option(
+        default=1,
+        min=1,
+        help="Number of processes creating datasets of different dates and sources in parallel.",
+    ),
+    incremental: bool = typer.Option(
+        default=False,
+        help="Only add to the EMT datasets the ETA data extracted since the previous run.",
+    ),
 ):
     """Create mobility datasets in a given date range from raw data. Please, run first extract command to get the raw data.
 
@@ -93,18 +146,40 @@ def create(
         # read settings
         settings = read_settings(config_path)
         dates = pd.date_range(start_date, end_date - timedelta(days=1), freq="d")
-        for date in progress.track(dates, description='Creating datasets...'):
-            date_formatted = date.strftime("%Y/%m/%d")
-            if sources.value == sources.emt or sources.value == sources.all:
-                progress.add_task(description="Creating EMT dataset...", total=None)
-                create_emt(settings=settings, date=date_formatted)
-            if sources.value == sources.aemet or sources.value == sources.all:
-                progress.add_task(description="Creating AEMET dataset...", total=None)
-                create_aemet(settings=settings, date=date_formatted)
-            if sources.value == sources.informo or sources.value == sources.all:
-                progress.add_task(description="Creating Informo dataset...", total=None)
-                create_informo(settings=settings, date=date_formatted)
-        print("Created data")
+        selected_sources = [
+            source for source in SOURCE_NAMES if sources.value in (source, Sources.all)
+        ]
+        timings = {}
+        if workers > 1:
+            progress.add_task(
+                description=f"Creating datasets with {workers} workers...", total=None
+            )
+            for date_formatted, source, seconds in create_datasets(
+                settings=settings,
+                dates=[date.strftime("%Y/%m/%d") for date in dates],
+                sources=[source.value for source in selected_sources],
+                stream=stream,
+                workers=workers,
+                incremental=incremental,
+            ):
+                timings.setdefault(date_formatted, {})[Sources(source)] = seconds
+        else:
+            for date in progress.track(dates, description="Creating datasets..."):
+                date_formatted = date.strftime("%Y/%m/%d")
+                for source in selected_sources:
+                    progress.add_task(
+                        description=f"Creating {SOURCE_NAMES[source]} dataset...", total=None
+                    )
+                    timings.setdefault(date_formatted, {})[source] = create_dataset(
+                        settings=settings,
+                        source=source.value,
+                        date=date_formatted,
+                        stream=stream,
+                        incremental=incremental,
+                    )
+    if timings:
+        print_timings(timings)
+    print("Created data")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+"""Reader of the datasets exported by the create command."""
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from inesdata_mov_datasets.utils import parquet_parts
+
+
+def dataset_files(
+    storage_path: str, source: str, start: Union[str, datetime], end: Union[str, datetime]
+) -> List[str]:
+    """Get the Parquet datasets of a source in a date range.
+
+    Only the files of the requested days are listed, so the rest of the days are never opened.
+    Days created incrementally may have several files (see write_processed_df).
+
+    Args:
+        storage_path (str): Local path where the datasets are stored.
+        source (str): Source of the datasets: emt, aemet or informo.
+        start (Union[str, datetime]): First date (YYYYMMDD if str).
+        end (Union[str, datetime]): End date, not included (YYYYMMDD if str).
+
+    Returns:
+        List[str]: Paths of the existing datasets, sorted by date.
+    """
+    files = []
+    for date in pd.date_range(start, end, freq="d", inclusive="left"):
+        path = (
+            Path(storage_path)
+            / "processed"
+            / source
+            / date.strftime("%Y/%m/%d")
+            / f"{source}_{date.strftime('%Y%m%d')}"
+        )
+        files.extend(str(part) for part in parquet_parts(path))
+    return files
+
+
+def filter_expression(filters: dict) -> Optional[ds.Expression]:
+    """Build the expression pushed down to the Parquet scan from a dict of filters.
+
+    The filter of each column can be a single value (equality), a list or set of values
+    (membership) or a (lower, upper) tuple (lower included, upper not included, None for an
+    open bound). The filters of the different columns are combined with and.
+
+    Args:
+        filters (dict): Filter by column, e.g. {"line": ["1", "27"], "datetime": (start, end)}.
+
+    Returns:
+        Optional[ds.Expression]: Expression of the filters, None if there are none.
+    """
+    expression = None
+    for column, value in filters.items():
+        field = pc.field(column)
+        if isinstance(value, tuple):
+            lower, upper = value
+            conditions = []
+            if lower is not None:
+                conditions.append(field >= lower)
+            if upper is not None:
+                conditions.append(field < upper)
+            if not conditions:
+                continue
+            condition = conditions[0] if len(conditions) == 1 else conditions[0] & conditions[1]
+        elif isinstance(value, (list, set)):
+            condition = field.isin(list(value))
+        else:
+            condition = field == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_dataset(
+    source: str,
+    start: Union[str, datetime],
+    end: Union[str, datetime],
+    filters: Optional[dict] = None,
+    *,
+    storage_path: str,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Read the Parquet datasets of a source in a date range as a single DataFrame.
+
+    Days outside the range are pruned before opening any file, and the filters are pushed down
+    to the scan, skipping the row groups whose statistics don't match them (the row groups are
+    sorted by datetime, see write_processed_df). Days created as CSV are not read. The types of
+    a column may differ between days or appended parts (e.g. int in one and float in another
+    after a join misses a key), so the schemas of every file are merged into the widest one.
+
+    Example:
+        read_dataset("emt", "20241001", "20241008", {"line": ["1", "27"]}, storage_path="/data")
+
+    Args:
+        source (str): Source of the datasets: emt, aemet or informo.
+        start (Union[str, datetime]): First date (YYYYMMDD if str).
+        end (Union[str, datetime]): End date, not included (YYYYMMDD if str).
+        filters (Optional[dict]): Filter by column (see filter_expression).
+        storage_path (str): Local path where the datasets are stored.
+        columns (Optional[List[str]]): Columns to read, all of them if None.
+
+    Returns:
+        pd.DataFrame: Rows of the datasets matching the filters, empty if there are none.
+    """
+    files = dataset_files(storage_path, source, start, end)
+    if not files:
+        return pd.DataFrame([])
+    schema = pa.unify_schemas(
+        [pq.read_schema(file) for file in files], promote_options="permissive"
+    )
+    dataset = ds.dataset(files, schema=schema, format="parquet")
+    table = dataset.to_table(columns=columns, filter=filter_expression(filters or {}))
+    return table.to_pandas()
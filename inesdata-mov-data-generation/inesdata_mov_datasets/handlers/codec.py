@@ -0,0 +1,96 @@
+import json
+from typing import Any, Optional, Union
+
+# JSON libraries by preference, the first one installed is used (see the fast extra)
+JSON_BACKENDS = ("orjson", "msgspec", "json")
+
+_backend = None
+_loads = None
+_dumps = None
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    """Serialize an object to JSON bytes with the standard library.
+
+    Args:
+        obj (Any): Object to serialize.
+
+    Returns:
+        bytes: JSON document encoded in UTF-8.
+    """
+    return json.dumps(obj).encode("utf-8")
+
+
+def use_json_backend(name: Optional[str] = None) -> str:
+    """Select the library parsing and serializing the raw JSON files.
+
+    The selection is silent since it runs at import, instantiate_logger logs it.
+
+    Args:
+        name (Optional[str]): orjson, msgspec or json. If None, the first library of
+            JSON_BACKENDS that is installed.
+
+    Raises:
+        ImportError: If the requested library is not installed.
+        ValueError: If the library is not a JSON backend.
+
+    Returns:
+        str: Name of the selected library.
+    """
+    global _backend, _loads, _dumps
+    for backend in JSON_BACKENDS if name is None else (name,):
+        try:
+            if backend == "orjson":
+                import orjson
+
+                _loads, _dumps = orjson.loads, orjson.dumps
+            elif backend == "msgspec":
+                import msgspec
+
+                _loads, _dumps = msgspec.json.decode, msgspec.json.encode
+            elif backend == "json":
+                _loads, _dumps = json.loads, _stdlib_dumps
+            else:
+                raise ValueError(f"Unknown JSON backend: {backend}")
+        except ImportError:
+            if name is not None:
+                raise
+            continue
+        _backend = backend
+        return backend
+
+
+def json_backend() -> str:
+    """Get the library parsing and serializing the raw JSON files.
+
+    Returns:
+        str: orjson, msgspec or json.
+    """
+    return _backend
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """Parse a JSON document.
+
+    Args:
+        data (Union[bytes, str]): JSON document, preferably the raw bytes of a file or response.
+
+    Returns:
+        Any: Parsed document.
+    """
+    return _loads(data)
+
+
+def json_dumps(obj: Any) -> bytes:
+    """Serialize an object to a compact JSON document.
+
+    Args:
+        obj (Any): Object to serialize.
+
+    Returns:
+        bytes: JSON document encoded in UTF-8.
+    """
+    return _dumps(obj)
+
+
+use_json_backend()
@@ -0,0 +1,189 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+
+class LimiterSlot:
+    """Outcome of a request made inside AdaptiveLimiter.slot()."""
+
+    def __init__(self):
+        """Init the slot without a response yet."""
+        self.status = None  # HTTP status of the response, set by the caller
+
+
+class AdaptiveLimiter:
+    """Concurrency limiter for an API, adapted with AIMD and capped by a token bucket.
+
+    The concurrency limit grows by one request per window of fast successful responses
+    (additive increase) and is halved when the API throttles (429), fails (5xx), raises or
+    answers slower than the latency target (multiplicative decrease). The limit is decreased
+    at most once per latency target, so a burst of failed requests of the same window only
+    counts once. Other 4xx responses are errors of the request, not of the API, so they count
+    as successes even when the caller raises on them. An optional token bucket caps the requests
+    per second on top of it.
+
+    Example:
+        async with limiter.slot() as slot:
+            async with session.get(url) as response:
+                slot.status = response.status
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = 10,
+        min_concurrency: int = 1,
+        max_concurrency: int = 100,
+        max_requests_per_second: Optional[float] = None,
+        latency_target: float = 2.0,
+    ):
+        """Init the limiter.
+
+        Args:
+            initial_concurrency (int): Concurrent requests allowed before adapting.
+            min_concurrency (int): Lower bound of the concurrency limit.
+            max_concurrency (int): Upper bound of the concurrency limit.
+            max_requests_per_second (Optional[float]): Max request rate, unlimited if None.
+            latency_target (float): Seconds above which a response counts as congestion.
+        """
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.max_requests_per_second = max_requests_per_second
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.failed = 0
+        self._tokens = max_requests_per_second or 0.0
+        self._last_refill = time.monotonic()
+        self._last_decrease = float("-inf")
+        self._successes = 0  # fast successful responses since the limit last changed
+        self._condition = None
+        self._loop = None
+
+    @property
+    def concurrency(self) -> int:
+        """Current number of concurrent requests allowed."""
+        return int(self.limit)
+
+    def stats(self) -> dict:
+        """Metrics of the limiter.
+
+        Returns:
+            dict: Current concurrency limit, requests in flight and request counters.
+        """
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "failed": self.failed,
+        }
+
+    def _get_condition(self) -> asyncio.Condition:
+        # the limiter outlives event loops (one per extraction when not running as a daemon)
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self.in_flight = 0
+        return self._condition
+
+    async def _take_token(self):
+        if self.max_requests_per_second is None:
+            return
+        rate = self.max_requests_per_second
+        while True:
+            now = time.monotonic()
+            self._tokens = min(rate, self._tokens + (now - self._last_refill) * rate)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / rate)
+
+    async def acquire(self):
+        """Wait for a free slot under the concurrency limit and the request rate."""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+        await self._take_token()
+
+    async def release(self, status: Optional[int], latency: float, error: bool = False):
+        """Free a slot and adapt the concurrency limit to the outcome of the request.
+
+        Args:
+            status (Optional[int]): HTTP status of the response, if any.
+            latency (float): Seconds the request took.
+            error (bool): Whether the request raised. Only counts as a failure when there is no
+                response (transport errors), otherwise the status decides.
+        """
+        self.requests += 1
+        failed = error if status is None else status >= 500
+        if status == 429:
+            self.throttled += 1
+        elif failed:
+            self.failed += 1
+
+        if failed or status == 429 or latency > self.latency_target:
+            self._decrease()
+        else:
+            self._successes += 1
+            if self._successes >= self.concurrency:
+                self.limit = min(self.max_concurrency, self.limit + 1)
+                self._successes = 0
+
+        await self._free()
+
+    async def _free(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight = max(self.in_flight - 1, 0)
+            condition.notify_all()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease >= self.latency_target:
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            self._last_decrease = now
+            self._successes = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[LimiterSlot]:
+        """Make a request inside the limits, reporting its status through the yielded slot.
+
+        Yields:
+            LimiterSlot: Slot where the caller sets the HTTP status of the response.
+        """
+        await self.acquire()
+        slot = LimiterSlot()
+        start = time.monotonic()
+        try:
+            yield slot
+        except asyncio.CancelledError:
+            # a cancelled request (e.g. the loser of a hedged request) says nothing of the API
+            await self._free()
+            raise
+        except BaseException:
+            await self.release(slot.status, time.monotonic() - start, error=True)
+            raise
+        await self.release(slot.status, time.monotonic() - start)
+
+
+@asynccontextmanager
+async def limited(limiter: Optional[AdaptiveLimiter]) -> AsyncIterator[LimiterSlot]:
+    """Get a slot of the limiter, or an unlimited one if there is no limiter.
+
+    Args:
+        limiter (Optional[AdaptiveLimiter]): Limiter of the API.
+
+    Yields:
+        LimiterSlot: Slot where the caller sets the HTTP status of the response.
+    """
+    if limiter is None:
+        yield LimiterSlot()
+    else:
+        async with limiter.slot() as slot:
+            yield slot
@@ -2,22 +2,45 @@ import os
 
 from loguru import logger
 
+from inesdata_mov_datasets.handlers.codec import json_backend
 from inesdata_mov_datasets.settings import Settings
 
+_worker_id = None  # set in each process of a pool so that workers don't share a log file
+_handler = None  # log file and level of the handler added by instantiate_logger
+
+
+def set_worker_id(worker_id: int):
+    """Make the current process log to a file of its own when running in a pool of workers."""
+    global _worker_id
+    _worker_id = worker_id
+
 
 def instantiate_logger(settings: Settings, source: str, method: str):
-    """Log configuration."""
-    logger.remove()  # disable all previous handlers
+    """Log configuration.
 
+    The log file handler is added once per process (or worker of a pool). Later calls with the
+    same file and level, e.g. on every tick of the daemon or from every source extracted
+    concurrently, only change the default source of the logs, so the handler is never removed
+    while other sources are logging.
+    """
+    global _handler
     logger.configure(extra={"source": source})  # add new formatted variables
 
     log_folder = settings.storage.logs.path
-    log_path = os.path.join(log_folder, method, "inesdata_mov_{time:YYYY_MM_DD}.log")
+    log_name = "inesdata_mov_{time:YYYY_MM_DD}"
+    if _worker_id is not None:
+        # rotating and compressing the same file from several processes would collide
+        log_name += f"_worker_{_worker_id}"
+    log_path = os.path.join(log_folder, method, f"{log_name}.log")
     log_level = settings.storage.logs.level
+    if _handler == (log_path, log_level):
+        return
+
     log_format = "[{time:YYYY-MM-DD HH:mm:ss}] - [{process}] - [{level}] - [{extra[source]}] - {name}.{function} - {message}"
     log_rotation = "00:00"  # each rotation a new log file is created
     log_compression = "tar.gz"  # each rotation the files are compressed
 
+    logger.remove()  # disable all previous handlers
     logger.add(
         log_path,
         level=log_level,
@@ -25,3 +48,5 @@ def instantiate_logger(settings: Settings, source: str, method: str):
         rotation=log_rotation,
         compression=log_compression,
     )
+    _handler = (log_path, log_level)
+    logger.debug(f"Using {json_backend()} to parse JSON")
@@ -0,0 +1,207 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import aiohttp
+import botocore.exceptions
+from loguru import logger
+
+T = TypeVar("T")
+
+# Monotonic time by which the running extraction tick must be done (if any)
+_tick_deadline: ContextVar[Optional[float]] = ContextVar("tick_deadline", default=None)
+
+
+class ApiError(Exception):
+    """The API answered successfully but with an error code in the body."""
+
+    def __init__(self, response: dict):
+        """Keep the response of the API.
+
+        Args:
+            response (dict): Response with the error code.
+        """
+        super().__init__(f"Error code {response.get('code')} in response")
+        self.response = response
+
+
+class RetryPolicy:
+    """How many times and how fast to retry a class of errors.
+
+    The delay before the n-th retry is drawn uniformly between 0 and
+    min(max_delay, base_delay * 2 ** (n - 1)) (exponential backoff with full jitter).
+    """
+
+    def __init__(self, max_retries: int, base_delay: float, max_delay: float):
+        """Init the policy.
+
+        Args:
+            max_retries (int): Max number of retries of the error class.
+            base_delay (float): Seconds of backoff before the first retry.
+            max_delay (float): Max seconds of backoff before a retry.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, retry: int) -> float:
+        """Get the seconds to wait before a retry.
+
+        Args:
+            retry (int): Number of the retry, starting at 1.
+
+        Returns:
+            float: Seconds to wait.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+
+DEFAULT_RETRY_POLICIES = {
+    "throttled": RetryPolicy(max_retries=4, base_delay=1.0, max_delay=15.0),
+    "server": RetryPolicy(max_retries=3, base_delay=0.5, max_delay=5.0),
+    "timeout": RetryPolicy(max_retries=2, base_delay=0.0, max_delay=0.0),
+    "connection": RetryPolicy(max_retries=3, base_delay=0.2, max_delay=2.0),
+    "api": RetryPolicy(max_retries=2, base_delay=0.5, max_delay=2.0),
+}
+
+
+def _classify_status(status: Optional[int]) -> Optional[str]:
+    """Get the class of an error response by its HTTP status.
+
+    Args:
+        status (Optional[int]): HTTP status of the response.
+
+    Returns:
+        Optional[str]: throttled, server or None if the error must not be retried (e.g. 4xx).
+    """
+    if status == 429:
+        return "throttled"
+    if status is not None and status >= 500:
+        return "server"
+    return None
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """Get the class of a request error used to pick its retry policy.
+
+    Args:
+        error (BaseException): Error raised by the request.
+
+    Returns:
+        Optional[str]: Error class, None if the error must not be retried (e.g. 4xx).
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        return _classify_status(error.status)
+    if isinstance(error, botocore.exceptions.ClientError):
+        # error answered by s3 (e.g. 503 SlowDown)
+        return _classify_status(error.response.get("ResponseMetadata", {}).get("HTTPStatusCode"))
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, aiohttp.ClientError):
+        return "connection"
+    if isinstance(
+        error, (botocore.exceptions.ConnectionError, botocore.exceptions.HTTPClientError)
+    ):
+        # s3 connection lost before or while reading the response
+        return "connection"
+    if isinstance(error, ApiError):
+        return "api"
+    return None
+
+
+@asynccontextmanager
+async def tick_deadline(seconds: float):
+    """Bound the retries of the requests made inside the context to a tick duration.
+
+    Nested deadlines keep the earliest one.
+
+    Args:
+        seconds (float): Seconds from now available for the requests.
+    """
+    deadline = time.monotonic() + seconds
+    current = _tick_deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _tick_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _tick_deadline.reset(token)
+
+
+async def hedged(request: Callable[[], Awaitable[T]], hedge_after: float) -> T:
+    """Make a request and a second identical one if the first is slow, keeping the first answer.
+
+    Args:
+        request (Callable[[], Awaitable[T]]): Function making the request.
+        hedge_after (float): Seconds to wait for the first request before hedging.
+
+    Returns:
+        T: Result of the first request that succeeds.
+    """
+    pending = {asyncio.ensure_future(request())}
+    error = None
+    try:
+        done, pending = await asyncio.wait(pending, timeout=hedge_after)
+        if done:
+            return done.pop().result()
+
+        pending.add(asyncio.ensure_future(request()))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # also when the caller is cancelled (e.g. at the tick deadline) while waiting
+        for task in pending:
+            task.cancel()
+        # wait for the cancelled requests to give back their connections and limiter slots
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def call_with_retry(
+    request: Callable[[], Awaitable[T]],
+    description: str,
+    policies: Optional[dict] = None,
+    hedge_after: Optional[float] = None,
+) -> T:
+    """Make a request retrying its errors with the policy of their class.
+
+    Retries stop when the policy of the error class is exhausted, when the error is not
+    retryable or when the backoff would end after the deadline of the tick (see tick_deadline).
+
+    Args:
+        request (Callable[[], Awaitable[T]]): Function making the request, raising on errors.
+        description (str): Name of the request for the logs.
+        policies (Optional[dict]): Retry policy by error class, DEFAULT_RETRY_POLICIES if None.
+        hedge_after (Optional[float]): Seconds after which a slow request is hedged, if any.
+
+    Returns:
+        T: Result of the request.
+    """
+    policies = DEFAULT_RETRY_POLICIES if policies is None else policies
+    retries = {}
+    while True:
+        deadline = _tick_deadline.get()
+        try:
+            attempt = hedged(request, hedge_after) if hedge_after else request()
+            if deadline is None:
+                return await attempt
+            return await asyncio.wait_for(attempt, timeout=max(deadline - time.monotonic(), 0))
+        except Exception as error:
+            error_class = classify_error(error)
+            policy = policies.get(error_class)
+            retries[error_class] = retries.get(error_class, 0) + 1
+            if policy is None or retries[error_class] > policy.max_retries:
+                raise
+            delay = policy.delay(retries[error_class])
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            logger.debug(f"Retrying {description} after {error_class} error in {delay:.2f}s")
+            await asyncio.sleep(delay)
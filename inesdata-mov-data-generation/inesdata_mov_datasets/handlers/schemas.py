@@ -0,0 +1,327 @@
+"""Typed schemas of the raw payloads read by the create stage.
+
+The schemas only declare the fields the datasets need, so the rest of the keys of a payload
+are skipped while decoding. With msgspec installed (fast extra) the raw files are decoded and
+validated in a single pass straight into the schemas. Otherwise they are parsed with json_loads
+and only their envelope is checked: the ETA arrivals are kept as parsed dicts, since building
+a dataclass per arrival is slower than the parsing itself. Maps whose keys are exported as they
+come (AEMET variables, Informo measures) are always kept as dicts.
+"""
+import dataclasses
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar, Union, get_args, get_origin
+
+from inesdata_mov_datasets.handlers.codec import json_loads
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+T = TypeVar("T")
+
+# Any JSON value that is not an object or an array
+Scalar = Union[None, bool, int, float, str]
+
+
+class SchemaError(ValueError):
+    """A raw payload is not valid JSON or doesn't match its schema."""
+
+
+@dataclasses.dataclass(slots=True)
+class EtaGeometry:
+    """Position of a bus."""
+
+    coordinates: List[float]
+
+
+@dataclasses.dataclass(slots=True)
+class EtaArrive:
+    """Arrival of a bus to a stop, with the fields of the EMT dataset."""
+
+    line: Scalar
+    stop: Scalar
+    bus: Scalar
+    geometry: EtaGeometry
+    isHead: Scalar = None
+    destination: Scalar = None
+    deviation: Scalar = None
+    estimateArrive: Scalar = None
+    DistanceBus: Scalar = None
+    positionTypeBus: Scalar = None
+
+
+@dataclasses.dataclass(slots=True)
+class EtaStop:
+    """Arrivals to a stop, dicts of the EtaArrive fields when decoded without msgspec."""
+
+    Arrive: List[EtaArrive] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass(slots=True)
+class EtaResponse:
+    """Response of the EMT ETA endpoint."""
+
+    datetime: str
+    data: List[EtaStop] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass(slots=True)
+class AemetForecast:
+    """Hourly forecast of AEMET, a dict of variables per day."""
+
+    dia: List[Dict[str, Any]] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass(slots=True)
+class AemetPrediction:
+    """Prediction of AEMET for a town."""
+
+    # AEMET sends an empty list when there is no forecast
+    prediccion: Union[AemetForecast, List[Any]]
+
+
+# AEMET answers with a list of predictions
+AemetResponse = List[AemetPrediction]
+
+
+@dataclasses.dataclass(slots=True)
+class InformoPms:
+    """Traffic measures of every measure point at a time."""
+
+    fecha_hora: str
+    pm: List[Dict[str, Any]]
+
+
+@dataclasses.dataclass(slots=True)
+class InformoResponse:
+    """Response of the Informo endpoint."""
+
+    pms: Optional[InformoPms] = None
+
+
+def _type_name(value: Any) -> str:
+    """Get the JSON name of the type of a value for the error messages.
+
+    Args:
+        value (Any): Parsed JSON value.
+
+    Returns:
+        str: object, array or the Python type name.
+    """
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    return type(value).__name__
+
+
+def _check(value: Any, expected: Any, name: str, location: str) -> Any:
+    """Check the type of a value of the envelope of a payload.
+
+    Args:
+        value (Any): Parsed JSON value.
+        expected (Any): Type or tuple of types of the value.
+        name (str): JSON name of the expected type for the error message.
+        location (str): Location of the value inside the payload, e.g. .data[0].
+
+    Raises:
+        SchemaError: If the value is not of the expected type.
+
+    Returns:
+        Any: Value.
+    """
+    if not isinstance(value, expected):
+        raise SchemaError(f"Expected {name}, got {_type_name(value)} at ${location}")
+    return value
+
+
+def _field(
+    content: dict, key: str, expected: Any, name: str, location: str, required: bool = False
+) -> Any:
+    """Get and check a field of an object of the envelope of a payload.
+
+    Args:
+        content (dict): Parsed JSON object.
+        key (str): Name of the field.
+        expected (Any): Type or tuple of types of the field.
+        name (str): JSON name of the expected type for the error message.
+        location (str): Location of the object inside the payload, e.g. .data[0].
+        required (bool): If the field must be in the object.
+
+    Raises:
+        SchemaError: If the field is missing or is not of the expected type.
+
+    Returns:
+        Any: Value of the field, None if it is missing.
+    """
+    if key not in content:
+        if required:
+            raise SchemaError(f"Missing required field {key} at ${location}")
+        return None
+    return _check(content[key], expected, name, f"{location}.{key}")
+
+
+def _eta_response(content: Any) -> EtaResponse:
+    """Check the envelope of an ETA response, keeping its arrivals as parsed.
+
+    Args:
+        content (Any): Parsed payload.
+
+    Returns:
+        EtaResponse: Payload in its schema.
+    """
+    _check(content, dict, "object", "")
+    stops = []
+    for index, stop in enumerate(_field(content, "data", list, "array", "") or []):
+        location = f".data[{index}]"
+        _check(stop, dict, "object", location)
+        stops.append(EtaStop(Arrive=_field(stop, "Arrive", list, "array", location) or []))
+    return EtaResponse(
+        datetime=_field(content, "datetime", str, "str", "", required=True), data=stops
+    )
+
+
+def _aemet_response(content: Any) -> AemetResponse:
+    """Check the envelope of an AEMET response, keeping its daily forecasts as parsed.
+
+    Args:
+        content (Any): Parsed payload.
+
+    Returns:
+        AemetResponse: Payload in its schema.
+    """
+    _check(content, list, "array", "")
+    predictions = []
+    for index, prediction in enumerate(content):
+        location = f"[{index}]"
+        _check(prediction, dict, "object", location)
+        forecast = _field(
+            prediction, "prediccion", (dict, list), "object or array", location, required=True
+        )
+        if isinstance(forecast, dict):
+            location += ".prediccion"
+            forecast = AemetForecast(dia=_field(forecast, "dia", list, "array", location) or [])
+        predictions.append(AemetPrediction(prediccion=forecast))
+    return predictions
+
+
+def _informo_pms(content: Any, location: str = "") -> InformoPms:
+    """Check the envelope of the Informo measures, keeping the measures as parsed.
+
+    Args:
+        content (Any): Parsed payload.
+        location (str): Location of the measures inside the payload.
+
+    Returns:
+        InformoPms: Payload in its schema.
+    """
+    _check(content, dict, "object", location)
+    return InformoPms(
+        fecha_hora=_field(content, "fecha_hora", str, "str", location, required=True),
+        pm=_field(content, "pm", list, "array", location, required=True),
+    )
+
+
+def _informo_response(content: Any) -> InformoResponse:
+    """Check the envelope of an Informo response, keeping its measures as parsed.
+
+    Args:
+        content (Any): Parsed payload.
+
+    Returns:
+        InformoResponse: Payload in its schema.
+    """
+    _check(content, dict, "object", "")
+    pms = content.get("pms")
+    return InformoResponse(pms=None if pms is None else _informo_pms(pms, ".pms"))
+
+
+# Conversion of the parsed payloads when msgspec is not installed
+_ENVELOPES: Dict[Any, Callable[[Any], Any]] = {
+    EtaResponse: _eta_response,
+    AemetResponse: _aemet_response,
+    InformoPms: _informo_pms,
+    InformoResponse: _informo_response,
+}
+
+
+def _is_schema_instance(content: Any, schema: Any) -> bool:
+    """Check if a payload is already in its schema.
+
+    Args:
+        content (Any): Payload.
+        schema (Any): Schema dataclass or list of them.
+
+    Returns:
+        bool: True if the payload doesn't need a conversion.
+    """
+    if get_origin(schema) is list:
+        (item_schema,) = get_args(schema)
+        return isinstance(content, list) and all(isinstance(item, item_schema) for item in content)
+    return isinstance(content, schema)
+
+
+def as_schema(content: Any, schema: Type[T]) -> T:
+    """Convert a parsed payload to its schema.
+
+    Values that already are instances of their schema are kept as they are. Without msgspec
+    only the envelope of the payload is checked and the records inside it (the ETA arrivals)
+    are kept as parsed dicts.
+
+    Args:
+        content (Any): Payload parsed as dicts and lists, e.g. with json_loads.
+        schema (Type[T]): Schema dataclass or list of them.
+
+    Raises:
+        SchemaError: If the payload doesn't match the schema.
+
+    Returns:
+        T: Payload in its schema.
+    """
+    if _is_schema_instance(content, schema):
+        return content
+    if msgspec is None:
+        return _ENVELOPES[schema](content)
+    try:
+        return msgspec.convert(content, schema)
+    except msgspec.ValidationError as e:
+        raise SchemaError(str(e)) from e
+
+
+@lru_cache(maxsize=None)
+def _decoder(schema: Any) -> Any:
+    """Get the msgspec decoder of a schema.
+
+    Args:
+        schema (Any): Schema dataclass or list of them.
+
+    Returns:
+        Any: msgspec.json.Decoder of the schema.
+    """
+    return msgspec.json.Decoder(schema)
+
+
+def decode(data: Union[bytes, str], schema: Type[T]) -> T:
+    """Decode a raw JSON payload into its schema.
+
+    Args:
+        data (Union[bytes, str]): JSON document, preferably the raw bytes of a file.
+        schema (Type[T]): Schema dataclass or list of them.
+
+    Raises:
+        SchemaError: If the document is not valid JSON or doesn't match the schema.
+
+    Returns:
+        T: Payload in its schema.
+    """
+    if msgspec is not None:
+        try:
+            return _decoder(schema).decode(data)
+        except msgspec.DecodeError as e:
+            raise SchemaError(str(e)) from e
+    try:
+        content = json_loads(data)
+    except ValueError as e:
+        raise SchemaError(f"Invalid JSON: {e}") from e
+    return _ENVELOPES[schema](content)
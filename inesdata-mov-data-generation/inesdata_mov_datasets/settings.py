@@ -39,6 +39,29 @@ class SourceEmtSettings(BaseModel):
     credentials: SourceEmtCredentialsSettings
     stops: List[int]
     lines: List[int]
+    initial_concurrency: int = 10
+    max_concurrency: int = 100
+    max_requests_per_second: Optional[float] = None
+    latency_target: float = 2.0
+    eta_layout: str = "stop"
+    eta_bundle_compression: Optional[str] = None
+    join_memory_mb: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_eta_layout(self) -> "SourceEmtSettings":
+        """Check the layout and the compression of the ETA raw files.
+
+        Raises:
+            ValueError: If the layout or the compression is not supported.
+
+        Returns:
+            SourceEmtSettings: The validated settings.
+        """
+        if self.eta_layout not in ["stop", "bundle"]:
+            raise ValueError("Provide a valid ETA layout: stop or bundle")
+        if self.eta_bundle_compression not in [None, "gzip", "zstd"]:
+            raise ValueError("Provide a valid ETA bundle compression: gzip, zstd or empty")
+        return self
 
 
 class SourceAemetCredentialsSettings(BaseModel):
@@ -63,6 +86,9 @@ class StorageMinioSettings(BaseModel):
     endpoint: str
     secure: bool
     bucket: str
+    max_pool_connections: int = 50
+    max_in_flight: int = 1000
+    max_downloads: int = 50
 
 
 class StorageLocalSettings(BaseModel):
@@ -83,11 +109,17 @@ class StorageSettings(BaseModel):
     default: Optional[str] = "local"
     config: StorageConfigSettings
     logs: StorageLogSettings
+    compression: Optional[str] = None
+    output_format: str = "csv"
 
     @model_validator(mode="after")
     def check_storage_config(self) -> "StorageSettings":
         if self.default not in ["minio", "local"]:
             raise ValueError("Provide a valid default storage: minio or local")
+        if self.compression not in [None, "gzip", "zstd"]:
+            raise ValueError("Provide a valid raw storage compression: gzip, zstd or empty")
+        if self.output_format not in ["csv", "parquet"]:
+            raise ValueError("Provide a valid output format: csv or parquet")
         return self
 
 
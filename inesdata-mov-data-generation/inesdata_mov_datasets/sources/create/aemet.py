@@ -1,17 +1,29 @@
 import asyncio
-import json
 import os
 import tempfile
 import traceback
 from datetime import datetime
 from pathlib import Path
+from typing import Union
 
 import pandas as pd
 from loguru import logger
 
 from inesdata_mov_datasets.handlers.logger import instantiate_logger
+from inesdata_mov_datasets.handlers.schemas import (
+    AemetForecast,
+    AemetResponse,
+    SchemaError,
+    as_schema,
+    decode,
+)
 from inesdata_mov_datasets.settings import Settings
-from inesdata_mov_datasets.utils import download_objs
+from inesdata_mov_datasets.utils import (
+    DEFAULT_MAX_DOWNLOADS,
+    download_objs,
+    open_raw,
+    write_processed_df,
+)
 
 
 def download_aemet(
@@ -21,6 +33,7 @@ def download_aemet(
     endpoint_url: str,
     aws_access_key_id: str,
     aws_secret_access_key: str,
+    max_downloads: int = DEFAULT_MAX_DOWNLOADS,
 ):
     """Download from minIO a day's raw data of AEMET endpoint.
 
@@ -31,23 +44,30 @@ def download_aemet(
         endpoint_url (str): url of minio bucket
         aws_access_key_id (str): minio user
         aws_secret_access_key (str): minio password
+        max_downloads (int): number of objects downloaded in parallel
     """
     try:
         loop = asyncio.new_event_loop()
         loop.run_until_complete(
             download_objs(
-                bucket, prefix, output_path, endpoint_url, aws_access_key_id, aws_secret_access_key
+                bucket,
+                prefix,
+                output_path,
+                endpoint_url,
+                aws_access_key_id,
+                aws_secret_access_key,
+                max_downloads=max_downloads,
             )
         )
     except Exception as e:
         logger.error(e)
 
 
-def generate_df_from_file(content: dict, date: str) -> pd.DataFrame:
+def generate_df_from_file(content: Union[AemetResponse, list], date: str) -> pd.DataFrame:
     """Generate a day's pandas dataframe from a single file downloaded from MinIO.
 
     Args:
-        content (dict): aemet info from a file
+        content (Union[AemetResponse, list]): aemet info from a file
         date (str): a date formatted in YYYY/MM/DD
 
     Returns:
@@ -56,8 +76,9 @@ def generate_df_from_file(content: dict, date: str) -> pd.DataFrame:
     day_df = pd.DataFrame([])
     day_df_final = pd.DataFrame([])
     try:
-        if len(content[0]["prediccion"]) != 0:
-            day_df = pd.DataFrame(content[0]["prediccion"]["dia"])
+        prediction = as_schema(content, AemetResponse)[0].prediccion
+        if isinstance(prediction, AemetForecast) and len(prediction.dia) != 0:
+            day_df = pd.DataFrame(prediction.dia)
             # filter values
             day_df["fecha"] = pd.to_datetime(day_df["fecha"])
             day_df = day_df[day_df["fecha"].dt.strftime("%Y/%m/%d") == date]
@@ -84,12 +105,13 @@ def generate_df_from_file(content: dict, date: str) -> pd.DataFrame:
     return day_df_final
 
 
-def generate_day_df(storage_path: str, date: str):
+def generate_day_df(storage_path: str, date: str, output_format: str = "csv"):
     """Generate a day's pandas dataframe from a whole day's files downloaded from MinIO.
 
     Args:
         storage_path (str): local path to store resulting df
         date (str): a date formatted in YYYY/MM/DD
+        output_format (str): format of the resulting df: csv or parquet
     """
     dfs = []
     raw_storage_dir = Path(storage_path) / Path("raw") / "aemet" / date
@@ -98,8 +120,13 @@ def generate_day_df(storage_path: str, date: str):
     logger.info(f"#{len(files)} files from AEMET endpoint")
     for file in files:
         filename = raw_storage_dir / file
-        with open(filename, "r") as f:
-            content = json.load(f)
+        with open_raw(filename) as f:
+            data = f.read()
+        try:
+            content = decode(data, AemetResponse)
+        except SchemaError as e:
+            logger.error(f"Skipping malformed AEMET file {file}: {e}")
+            continue
         df = generate_df_from_file(content, date)
         dfs.append(df)
     if len(dfs) > 0:
@@ -120,7 +147,9 @@ def generate_day_df(storage_path: str, date: str):
             processed_storage_dir = Path(storage_path) / Path("processed") / "aemet" / date
             date_formatted = date.replace("/", "")
             Path(processed_storage_dir).mkdir(parents=True, exist_ok=True)
-            final_df.to_csv(processed_storage_dir / f"aemet_{date_formatted}.csv", index=None)
+            write_processed_df(
+                final_df, processed_storage_dir / f"aemet_{date_formatted}", output_format
+            )
             logger.info(f"Created AEMET df of shape {final_df.shape}")
         else:
             logger.debug("There is no data to create")
@@ -153,8 +182,13 @@ def create_aemet(settings: Settings, date: str):
                     endpoint_url=storage_config.minio.endpoint,
                     aws_access_key_id=storage_config.minio.access_key,
                     aws_secret_access_key=storage_config.minio.secret_key,
+                    max_downloads=storage_config.minio.max_downloads,
                 )
-            generate_day_df(storage_path=storage_path, date=date)
+            generate_day_df(
+                storage_path=storage_path,
+                date=date,
+                output_format=settings.storage.output_format,
+            )
 
             end = datetime.now()
             logger.debug(f"Time duration of AEMET dataset creation {end - start}")
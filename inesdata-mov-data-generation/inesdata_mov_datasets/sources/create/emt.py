@@ -1,16 +1,186 @@
-import json
+import asyncio
 import os
+import re
 import tempfile
 import traceback
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Union
 
+import numpy as np
 import pandas as pd
+import pytz
 from loguru import logger
+from pandas.api.extensions import take
 
+from inesdata_mov_datasets.handlers.codec import json_dumps, json_loads
 from inesdata_mov_datasets.handlers.logger import instantiate_logger
+from inesdata_mov_datasets.handlers.schemas import EtaResponse, SchemaError, as_schema, decode
 from inesdata_mov_datasets.settings import Settings
-from inesdata_mov_datasets.utils import async_download
+from inesdata_mov_datasets.utils import (
+    ETA_BUNDLE_EXTENSION,
+    ColumnAccumulator,
+    async_download,
+    decompress,
+    open_raw,
+    stream_objs,
+    write_processed_df,
+)
+
+# Tick of an ETA raw file, in its name (see get_emt)
+ETA_TICK_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}T\d{4}")
+# Minutes an ETA tick is left for the next incremental run, since its files may still be written
+ETA_SETTLE_MINUTES = 2
+# ETA rows of the first slice of a chunked join, before measuring the size of the joined rows
+JOIN_FIRST_CHUNK_ROWS = 100_000
+# Peak memory of a chunked join relative to its joined slice (ETA slice and merge copies)
+JOIN_MEMORY_FACTOR = 3
+# Fields of the ETA arrivals, in the order of the EMT responses (geometry is split in lon and lat)
+ETA_ARRIVE_COLUMNS = [
+    "line",
+    "stop",
+    "isHead",
+    "destination",
+    "deviation",
+    "bus",
+    "estimateArrive",
+    "DistanceBus",
+    "positionTypeBus",
+]
+# Columns of the EMT dataset, in order
+EMT_COLUMNS = [
+    "date",
+    "datetime",
+    "bus",
+    "line",
+    "stop",
+    "positionBusLon",
+    "positionBusLat",
+    "positionTypeBus",
+    "DistanceBus",
+    "destination",
+    "deviation",
+    "StartTime",
+    "StopTime",
+    "MinimunFrequency",
+    "MaximumFrequency",
+    "isHead",
+    "dayType",
+    "strike",
+    "estimateArrive",
+]
+
+
+def eta_file_tick(name: str) -> Optional[str]:
+    """Get the tick of an ETA raw file from its name.
+
+    Args:
+        name (str): name or key of the raw file
+
+    Returns:
+        Optional[str]: tick formatted as YYYY-MM-DDTHHMM, None if the name has no tick
+    """
+    match = ETA_TICK_PATTERN.search(Path(name).name)
+    return match.group() if match else None
+
+
+class EtaWatermark:
+    """Select the ETA raw files of the ticks not processed yet by an incremental create.
+
+    Files of ticks up to the watermark were processed by a previous run, and files of ticks
+    after the cutoff are left for the next one. The latest tick selected becomes the new
+    watermark once the new rows are exported.
+    """
+
+    def __init__(self, watermark: Optional[str], cutoff: str):
+        """Init the selector.
+
+        Args:
+            watermark (Optional[str]): last tick processed (YYYY-MM-DDTHHMM), None if none.
+            cutoff (str): last tick to process (YYYY-MM-DDTHHMM).
+        """
+        self.watermark = watermark
+        self.cutoff = cutoff
+        self.last_tick = None
+
+    def __call__(self, name: str) -> bool:
+        """Check if a raw file must be processed, keeping track of the latest tick selected.
+
+        Args:
+            name (str): name or key of the raw file
+
+        Returns:
+            bool: True if the file belongs to a new tick
+        """
+        tick = eta_file_tick(name)
+        if tick is None:
+            return False
+        if tick > self.cutoff or (self.watermark is not None and tick <= self.watermark):
+            return False
+        if self.last_tick is None or tick > self.last_tick:
+            self.last_tick = tick
+        return True
+
+
+def read_watermark(path: Path) -> Optional[str]:
+    """Read the last ETA tick processed for a day.
+
+    Args:
+        path (Path): path of the watermark file
+
+    Returns:
+        Optional[str]: last tick processed, None if the day was not created incrementally
+    """
+    if not path.is_file():
+        return None
+    with open(path, "rb") as f:
+        return json_loads(f.read()).get("eta")
+
+
+def write_watermark(path: Path, tick: str):
+    """Write the last ETA tick processed for a day.
+
+    Args:
+        path (Path): path of the watermark file
+        tick (str): last tick processed
+    """
+    with open(path, "wb") as f:
+        f.write(json_dumps({"eta": tick}))
+
+
+def add_calendar_file(accumulator: ColumnAccumulator, content: dict) -> None:
+    """Add the calendar records of a single file downloaded from MinIO to a day's accumulator.
+
+    Args:
+        accumulator (ColumnAccumulator): day's calendar records
+        content (dict): calendar info from a file
+    """
+    try:
+        if len(content["data"]) != 0:
+            accumulator.add(
+                content["data"], columns={"datetime": pd.to_datetime(content["datetime"])}
+            )
+    except Exception as e:
+        logger.error(e)
+        logger.error(traceback.format_exc())
+
+
+def build_calendar_df(accumulator: ColumnAccumulator) -> pd.DataFrame:
+    """Build the calendar dataframe from the accumulated records.
+
+    Args:
+        accumulator (ColumnAccumulator): calendar records
+
+    Returns:
+        pd.DataFrame: calendar pandas dataframe
+    """
+    df = accumulator.to_frame()
+    if not df.empty:
+        # Add date col
+        df["date"] = pd.to_datetime(df["date"], dayfirst=True)
+        # Get selected cols
+        # df = df[['date', 'dayType']]
+    return df
 
 
 def generate_calendar_df_from_file(content: dict) -> pd.DataFrame:
@@ -22,20 +192,14 @@ def generate_calendar_df_from_file(content: dict) -> pd.DataFrame:
     Returns:
         pd.DataFrame: day's pandas dataframe from a single file downloaded from MinIO
     """
-    day_df = pd.DataFrame([])
+    accumulator = ColumnAccumulator()
+    add_calendar_file(accumulator, content)
     try:
-        if len(content["data"]) != 0:
-            day_df = pd.DataFrame(content["data"])
-            if not day_df.empty:
-                day_df["datetime"] = pd.to_datetime(content["datetime"])
-                # Add date col
-                day_df["date"] = pd.to_datetime(day_df["date"], dayfirst=True)
-                # Get selected cols
-                # day_df = day_df[['date', 'dayType']]
+        return build_calendar_df(accumulator)
     except Exception as e:
         logger.error(e)
         logger.error(traceback.format_exc())
-    return day_df
+        return pd.DataFrame([])
 
 
 def generate_calendar_day_df(storage_path: str, date: str) -> pd.DataFrame:
@@ -48,20 +212,19 @@ def generate_calendar_day_df(storage_path: str, date: str) -> pd.DataFrame:
     Returns:
         pd.DataFrame: day's pandas dataframe
     """
-    dfs = []
+    accumulator = ColumnAccumulator()
     raw_storage_dir = Path(storage_path) / Path("raw") / "emt" / date / "calendar"
     raw_storage_dir.mkdir(parents=True, exist_ok=True)
     files = os.listdir(raw_storage_dir)
     logger.info(f"#{len(files)} files from EMT calendar endpoint")
     for file in files:
         filename = raw_storage_dir / file
-        with open(filename, "r") as f:
-            content = json.load(f)
-        df = generate_calendar_df_from_file(content[0])
-        dfs.append(df)
+        with open_raw(filename) as f:
+            content = json_loads(f.read())
+        add_calendar_file(accumulator, content[0])
 
-    if len(dfs) > 0:
-        final_df = pd.concat(dfs)
+    if accumulator.length > 0:
+        final_df = build_calendar_df(accumulator)
         # sort values
         final_df = final_df.sort_values(by=["datetime"])
         # export final df
@@ -99,6 +262,7 @@ def create_calendar_emt(settings: Settings, date: str) -> pd.DataFrame:
                 endpoint_url=storage_config.minio.endpoint,
                 aws_access_key_id=storage_config.minio.access_key,
                 aws_secret_access_key=storage_config.minio.secret_key,
+                max_downloads=storage_config.minio.max_downloads,
             )
         df = generate_calendar_day_df(storage_path=storage_path, date=date)
 
@@ -107,46 +271,56 @@ def create_calendar_emt(settings: Settings, date: str) -> pd.DataFrame:
         return df
 
 
-def generate_line_df_from_file(content: dict) -> pd.DataFrame:
-    """Generate a day's pandas dataframe from a single file downloaded from MinIO.
+def add_line_file(accumulator: ColumnAccumulator, content: dict) -> None:
+    """Add the timetable of a single file downloaded from MinIO to a day's accumulator.
 
     Args:
+        accumulator (ColumnAccumulator): day's line_detail records
         content (dict): line_detail info from a file
-
-    Returns:
-        pd.DataFrame: day's pandas dataframe from a single file downloaded from MinIO
     """
-    day_df = pd.DataFrame([])
     try:
         if len(content["data"]) != 0:
-            day_df = pd.DataFrame(content["data"][0]["timeTable"])
-            day_df = day_df.join(pd.json_normalize(day_df["Direction1"]))
-            day_df.drop(columns=["Direction1", "Direction2"], inplace=True)
-            if not day_df.empty:
-                day_df["datetime"] = pd.to_datetime(content["datetime"])
-                # Add date col
-                day_df["date"] = pd.to_datetime(day_df["datetime"].dt.date)
-                # Add line col
-                day_df["line"] = content["data"][0]["line"]
-                # rename day type col to be the same as in calendar
-                day_df.rename(columns={"idDayType": "dayType"}, inplace=True)
-                # Get selected cols
-                day_df = day_df[
-                    [
-                        "dayType",
-                        "StartTime",
-                        "StopTime",
-                        "MinimunFrequency",
-                        "MaximumFrequency",
-                        "datetime",
-                        "date",
-                        "line",
-                    ]
-                ].drop_duplicates()
+            # keep the first direction's schedule and name the day type as in calendar
+            records = []
+            for time_table in content["data"][0]["timeTable"]:
+                direction = time_table["Direction1"]
+                records.append(
+                    {
+                        "dayType": time_table.get("idDayType"),
+                        "StartTime": direction.get("StartTime"),
+                        "StopTime": direction.get("StopTime"),
+                        "MinimunFrequency": direction.get("MinimunFrequency"),
+                        "MaximumFrequency": direction.get("MaximumFrequency"),
+                    }
+                )
+            file_datetime = pd.to_datetime(content["datetime"])
+            accumulator.add(
+                records,
+                columns={
+                    "datetime": file_datetime,
+                    # Add date col
+                    "date": file_datetime.tz_localize(None).normalize(),
+                    # Add line col
+                    "line": content["data"][0]["line"],
+                },
+            )
     except Exception as e:
         logger.error(e)
         logger.error(traceback.format_exc())
-    return day_df
+
+
+def generate_line_df_from_file(content: dict) -> pd.DataFrame:
+    """Generate a day's pandas dataframe from a single file downloaded from MinIO.
+
+    Args:
+        content (dict): line_detail info from a file
+
+    Returns:
+        pd.DataFrame: day's pandas dataframe from a single file downloaded from MinIO
+    """
+    accumulator = ColumnAccumulator()
+    add_line_file(accumulator, content)
+    return accumulator.to_frame().drop_duplicates()
 
 
 def generate_line_day_df(storage_path: str, date: str) -> pd.DataFrame:
@@ -159,20 +333,19 @@ def generate_line_day_df(storage_path: str, date: str) -> pd.DataFrame:
     Returns:
         pd.DataFrame: day's pandas dataframe
     """
-    dfs = []
+    accumulator = ColumnAccumulator()
     raw_storage_dir = Path(storage_path) / Path("raw") / "emt" / date / "line_detail"
     raw_storage_dir.mkdir(parents=True, exist_ok=True)
     files = os.listdir(raw_storage_dir)
     logger.info(f"#{len(files)} files from EMT line_detail endpoint")
     for file in files:
         filename = raw_storage_dir / file
-        with open(filename, "r") as f:
-            content = json.load(f)
-        df = generate_line_df_from_file(content)
-        dfs.append(df)
+        with open_raw(filename) as f:
+            content = json_loads(f.read())
+        add_line_file(accumulator, content)
 
-    if len(dfs) > 0:
-        final_df = pd.concat(dfs)
+    if accumulator.length > 0:
+        final_df = accumulator.to_frame().drop_duplicates()
         # sort values
         final_df = final_df.sort_values(by=["datetime", "line"])
         # export final df
@@ -210,6 +383,7 @@ def create_line_detail_emt(settings: Settings, date: str) -> pd.DataFrame:
                 endpoint_url=storage_config.minio.endpoint,
                 aws_access_key_id=storage_config.minio.access_key,
                 aws_secret_access_key=storage_config.minio.secret_key,
+                max_downloads=storage_config.minio.max_downloads,
             )
         df = generate_line_day_df(storage_path=storage_path, date=date)
 
@@ -218,60 +392,174 @@ def create_line_detail_emt(settings: Settings, date: str) -> pd.DataFrame:
         return df
 
 
-def generate_eta_df_from_file(content: dict) -> pd.DataFrame:
-    """Generate a day's pandas dataframe from a single file downloaded from MinIO.
+def add_eta_file(accumulator: ColumnAccumulator, content: Union[EtaResponse, dict]) -> None:
+    """Add the arrivals of a single file downloaded from MinIO to a day's accumulator.
 
     Args:
-        content (dict): ETA info from a file
-
-    Returns:
-        pd.DataFrame: day's pandas dataframe from a single file downloaded from MinIO
+        accumulator (ColumnAccumulator): day's ETA records
+        content (Union[EtaResponse, dict]): ETA info from a file
     """
-    day_df = pd.DataFrame([])
     try:
-        if len(content["data"]) != 0:
-            day_df = pd.DataFrame(content["data"][0]["Arrive"])
-            if not day_df.empty:
-                day_df["datetime"] = pd.to_datetime(content["datetime"])
+        content = as_schema(content, EtaResponse)
+        if len(content.data) != 0:
+            arrives = content.data[0].Arrive
+            if len(arrives) != 0:
+                # every arrival of a file shares the request datetime
+                file_datetime = pd.to_datetime(content.datetime)
+                if isinstance(arrives[0], dict):
+                    # decoded without msgspec, the arrivals are kept as parsed
+                    columns = {
+                        column: [arrive.get(column) for arrive in arrives]
+                        for column in ETA_ARRIVE_COLUMNS
+                    }
+                    coordinates = [arrive["geometry"]["coordinates"] for arrive in arrives]
+                else:
+                    columns = {
+                        column: [getattr(arrive, column) for arrive in arrives]
+                        for column in ETA_ARRIVE_COLUMNS
+                    }
+                    coordinates = [arrive.geometry.coordinates for arrive in arrives]
+                columns["datetime"] = file_datetime
                 # Add date col
-                day_df["date"] = pd.to_datetime(day_df["datetime"].dt.date)
-                # Get selected cols
-                # day_df = day_df[[ "line","stop","bus","date","datetime","geometry","DistanceBus","estimateArrive"]]
-                # Add lat lon cols
-                day_df["positionBus"] = day_df["geometry"].apply(lambda row: row["coordinates"])
-                day_df["positionBusLon"] = day_df["positionBus"].apply(pd.Series)[0]
-                day_df["positionBusLat"] = day_df["positionBus"].apply(pd.Series)[1]
-                day_df = day_df.drop(columns=["geometry", "positionBus"])
+                columns["date"] = file_datetime.tz_localize(None).normalize()
+                # Add lat lon cols in a single pass over the geometries
+                columns["positionBusLon"] = [coordinate[0] for coordinate in coordinates]
+                columns["positionBusLat"] = [coordinate[1] for coordinate in coordinates]
+                accumulator.add_columns(len(arrives), columns)
     except Exception as e:
         logger.error(e)
         logger.error(traceback.format_exc())
-    return day_df
 
 
-def generate_eta_day_df(storage_path: str, date: str) -> pd.DataFrame:
+def read_eta_contents(name: str, data: bytes) -> List[EtaResponse]:
+    """Decode the ETA responses of a raw file of any layout.
+
+    Files of the stop layout hold one response, bundles hold every response of a tick (one per
+    line) and may be compressed. A file with a malformed response is rejected as a whole.
+
+    Args:
+        name (str): name of the raw file
+        data (bytes): content of the raw file
+
+    Raises:
+        SchemaError: if a response is not valid JSON or doesn't match EtaResponse
+
+    Returns:
+        List[EtaResponse]: ETA responses of the file
+    """
+    data = decompress(data, name)
+    if ETA_BUNDLE_EXTENSION in Path(name).name:
+        return [decode(line, EtaResponse) for line in data.splitlines() if line.strip()]
+    return [decode(data, EtaResponse)]
+
+
+def generate_eta_df_from_file(content: Union[EtaResponse, dict]) -> pd.DataFrame:
+    """Generate a day's pandas dataframe from a single file downloaded from MinIO.
+
+    Args:
+        content (Union[EtaResponse, dict]): ETA info from a file
+
+    Returns:
+        pd.DataFrame: day's pandas dataframe from a single file downloaded from MinIO
+    """
+    accumulator = ColumnAccumulator()
+    add_eta_file(accumulator, content)
+    return accumulator.to_frame()
+
+
+def generate_eta_day_df(
+    storage_path: str, date: str, select: Optional[Callable[[str], bool]] = None
+) -> pd.DataFrame:
     """Generate a day's pandas dataframe from a whole day's files downloaded from MinIO.
 
     Args:
         storage_path (str): local path to store resulting df
         date (str): a date formatted in YYYY/MM/DD
+        select (Optional[Callable[[str], bool]]): files to read, all of them if None
 
     Returns:
         pd.DataFrame: day's pandas dataframe
     """
-    dfs = []
+    accumulator = ColumnAccumulator()
     raw_storage_dir = Path(storage_path) / Path("raw") / "emt" / date / "eta"
     raw_storage_dir.mkdir(parents=True, exist_ok=True)
     files = os.listdir(raw_storage_dir)
+    if select is not None:
+        files = [file for file in files if select(file)]
     logger.info(f"#{len(files)} files from EMT ETA endpoint")
     for file in files:
         filename = raw_storage_dir / file
-        with open(filename, "r") as f:
-            content = json.load(f)
-        df = generate_eta_df_from_file(content)
-        dfs.append(df)
+        with open(filename, "rb") as f:
+            data = f.read()
+        try:
+            contents = read_eta_contents(file, data)
+        except SchemaError as e:
+            logger.error(f"Skipping malformed ETA file {file}: {e}")
+            continue
+        for content in contents:
+            add_eta_file(accumulator, content)
+
+    return build_eta_day_df(accumulator)
+
+
+async def stream_eta_day_df(
+    bucket: str,
+    prefix: str,
+    endpoint_url: str,
+    aws_access_key_id: str,
+    aws_secret_access_key: str,
+    max_in_flight: int,
+    select: Optional[Callable[[str], bool]] = None,
+) -> pd.DataFrame:
+    """Generate a day's pandas dataframe reading the ETA files from MinIO straight into memory.
+
+    Args:
+        bucket (str): bucket name
+        prefix (str): path to raw data directory from minio
+        endpoint_url (str): url of minio bucket
+        aws_access_key_id (str): minio user
+        aws_secret_access_key (str): minio password
+        max_in_flight (int): max number of raw files buffered in memory
+        select (Optional[Callable[[str], bool]]): files to read, all of them if None
+
+    Returns:
+        pd.DataFrame: day's pandas dataframe
+    """
+    accumulator = ColumnAccumulator()
+    n_files = 0
+    async for key, body in stream_objs(
+        bucket,
+        prefix,
+        endpoint_url,
+        aws_access_key_id,
+        aws_secret_access_key,
+        max_in_flight,
+        select,
+    ):
+        try:
+            contents = read_eta_contents(key, body)
+        except Exception as e:
+            logger.error(f"Error parsing {key}: {e}")
+            continue
+        for content in contents:
+            add_eta_file(accumulator, content)
+        n_files += 1
+    logger.info(f"#{n_files} files from EMT ETA endpoint")
+
+    return build_eta_day_df(accumulator)
+
+
+def build_eta_day_df(accumulator: ColumnAccumulator) -> pd.DataFrame:
+    """Build the day's ETA dataframe from the arrivals of every file of a day.
 
-    if len(dfs) > 0:
-        final_df = pd.concat(dfs)
+    Args:
+        accumulator (ColumnAccumulator): day's ETA records
+
+    Returns:
+        pd.DataFrame: day's pandas dataframe
+    """
+    if accumulator.length > 0:
+        final_df = accumulator.to_frame()
         # sort values
         final_df = final_df.sort_values(by=["datetime", "bus", "line", "stop"])
         # export final df
@@ -284,12 +572,97 @@ def generate_eta_day_df(storage_path: str, date: str) -> pd.DataFrame:
         return pd.DataFrame([])
 
 
-def create_eta_emt(settings: Settings, date: str) -> pd.DataFrame:
+class JoinBudget:
+    """Number of ETA rows per time slice of a chunked join, adapted to a memory budget.
+
+    The first slice has JOIN_FIRST_CHUNK_ROWS rows. After each join the size of the joined rows
+    per ETA row is measured, and the next slices are sized to keep the peak memory of a slice
+    within the budget.
+    """
+
+    def __init__(self, memory_mb: int):
+        """Init the budget.
+
+        Args:
+            memory_mb (int): memory budget of the join in MB
+        """
+        self.memory_mb = memory_mb
+        self.eta_rows = JOIN_FIRST_CHUNK_ROWS
+
+    def update(self, eta_rows: int, joined_df: pd.DataFrame):
+        """Size the next slices from the last joined one.
+
+        Args:
+            eta_rows (int): ETA rows of the last slice
+            joined_df (pd.DataFrame): joined rows of the last slice
+        """
+        bytes_per_row = joined_df.memory_usage(deep=True).sum() / max(eta_rows, 1)
+        budget_bytes = self.memory_mb * 2**20 / JOIN_MEMORY_FACTOR
+        self.eta_rows = max(1, int(budget_bytes / max(bytes_per_row, 1)))
+
+
+def iter_eta_day_chunks(
+    storage_path: str,
+    date: str,
+    budget: JoinBudget,
+    select: Optional[Callable[[str], bool]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Generate a day's ETA dataframe in time slices from the files downloaded from MinIO.
+
+    Files are read in tick order and slices always hold whole ticks, so the slices are sorted
+    by datetime among them. A slice is closed when it reaches budget.eta_rows rows.
+
+    Args:
+        storage_path (str): local path to store resulting df
+        date (str): a date formatted in YYYY/MM/DD
+        budget (JoinBudget): rows per slice
+        select (Optional[Callable[[str], bool]]): files to read, all of them if None
+
+    Yields:
+        pd.DataFrame: ETA rows of a slice of ticks
+    """
+    raw_storage_dir = Path(storage_path) / Path("raw") / "emt" / date / "eta"
+    raw_storage_dir.mkdir(parents=True, exist_ok=True)
+    files = os.listdir(raw_storage_dir)
+    if select is not None:
+        files = [file for file in files if select(file)]
+    files.sort(key=lambda file: eta_file_tick(file) or "")
+    logger.info(f"#{len(files)} files from EMT ETA endpoint")
+
+    accumulator = ColumnAccumulator()
+    tick = None
+    for file in files:
+        file_tick = eta_file_tick(file)
+        if accumulator.length >= budget.eta_rows and file_tick != tick:
+            yield build_eta_day_df(accumulator)
+            accumulator = ColumnAccumulator()
+        tick = file_tick
+        with open(raw_storage_dir / file, "rb") as f:
+            data = f.read()
+        try:
+            contents = read_eta_contents(file, data)
+        except SchemaError as e:
+            logger.error(f"Skipping malformed ETA file {file}: {e}")
+            continue
+        for content in contents:
+            add_eta_file(accumulator, content)
+    if accumulator.length > 0:
+        yield build_eta_day_df(accumulator)
+
+
+def create_eta_emt(
+    settings: Settings,
+    date: str,
+    stream: bool = False,
+    select: Optional[Callable[[str], bool]] = None,
+) -> pd.DataFrame:
     """Create dataset from EMT ETA endpoint.
 
     Args:
         settings (Settings): project settings
         date (str): a date formatted in YYYY/MM/DD
+        stream (bool): read the raw files from MinIO into memory instead of downloading them
+        select (Optional[Callable[[str], bool]]): raw files to read, all of them if None
 
     Returns:
         pd.DataFrame: df from EMT ETA endpoint
@@ -301,17 +674,31 @@ def create_eta_emt(settings: Settings, date: str) -> pd.DataFrame:
         start = datetime.now()
         storage_config = settings.storage.config
         storage_path = storage_config.local.path  # tmpdirname
-        if settings.storage.default != "local":
-
-            async_download(
-                bucket=storage_config.minio.bucket,
-                prefix=f"raw/emt/{date}/eta/",
-                output_path=storage_path,
-                endpoint_url=storage_config.minio.endpoint,
-                aws_access_key_id=storage_config.minio.access_key,
-                aws_secret_access_key=storage_config.minio.secret_key,
+        if settings.storage.default != "local" and stream:
+            df = asyncio.run(
+                stream_eta_day_df(
+                    bucket=storage_config.minio.bucket,
+                    prefix=f"raw/emt/{date}/eta/",
+                    endpoint_url=storage_config.minio.endpoint,
+                    aws_access_key_id=storage_config.minio.access_key,
+                    aws_secret_access_key=storage_config.minio.secret_key,
+                    max_in_flight=storage_config.minio.max_in_flight,
+                    select=select,
+                )
             )
-        df = generate_eta_day_df(storage_path=storage_path, date=date)
+        else:
+            if settings.storage.default != "local":
+                async_download(
+                    bucket=storage_config.minio.bucket,
+                    prefix=f"raw/emt/{date}/eta/",
+                    output_path=storage_path,
+                    endpoint_url=storage_config.minio.endpoint,
+                    aws_access_key_id=storage_config.minio.access_key,
+                    aws_secret_access_key=storage_config.minio.secret_key,
+                    select=select,
+                    max_downloads=storage_config.minio.max_downloads,
+                )
+            df = generate_eta_day_df(storage_path=storage_path, date=date, select=select)
 
         end = datetime.now()
         logger.debug(f"Time duration of EMT ETA dataset creation {end - start}")
@@ -339,24 +726,59 @@ def join_calendar_line_datasets(calendar_df: pd.DataFrame, line_df: pd.DataFrame
         return pd.DataFrame([])
 
 
-def join_eta_dataset(calendar_line_df: pd.DataFrame, eta_df: pd.DataFrame) -> pd.DataFrame:
+def build_line_index(calendar_line_df: pd.DataFrame) -> pd.DataFrame:
+    """Index the calendar+line_detail attributes by line to enrich the ETA dataset.
+
+    Lines are normalized once here (as strings without leading zeros) instead of on every ETA row.
+
+    Args:
+        calendar_line_df (pd.DataFrame): calendar and line_detail previousy joined dataset
+
+    Returns:
+        pd.DataFrame: attributes of each line, indexed by the normalized line
+    """
+    attributes = calendar_line_df.drop(columns=["line", "datetime", "date"], errors="ignore")
+    attributes.index = pd.Index(calendar_line_df["line"].astype(str).str.lstrip("0"), name="line")
+    return attributes
+
+
+def join_eta_dataset(
+    calendar_line_df: pd.DataFrame,
+    eta_df: pd.DataFrame,
+    line_index: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
     """Join EMT calendar+line_detail (previously joined dataset) with ETA dataset.
 
+    The ETA lines are turned into a categorical column, so only its distinct lines are
+    normalized and looked up in the line index; the attributes are then taken by position for
+    every row. ETA rows whose line is not in the index get empty attributes (left join).
+
     Args:
         calendar_line_df (pd.DataFrame): calendar and line_detail previousy joined dataset
         eta_df (pd.DataFrame): ETA dataset
+        line_index (Optional[pd.DataFrame]): calendar_line_df indexed by build_line_index, built
+            from calendar_line_df if None
 
     Returns:
         pd.DataFrame: joined dataset
     """
     try:
-        # fix lines that begin with zeros
-        calendar_line_df["line"] = calendar_line_df["line"].apply(str).str.lstrip("0")
-        eta_df["line"] = eta_df["line"].apply(str).str.lstrip("0")
-        # left join on line col
-        df = eta_df.merge(calendar_line_df, on="line", how="left")
-        df.drop(columns=["datetime_y", "date_y"], inplace=True)
-        df.rename(columns={"datetime_x": "datetime", "date_x": "date"}, inplace=True)
+        if line_index is None:
+            line_index = build_line_index(calendar_line_df)
+        # fix lines that begin with zeros, once per distinct line
+        lines = eta_df["line"].astype("category")
+        key_codes, keys = pd.factorize(lines.cat.categories.astype(str).str.lstrip("0"))
+        codes = lines.cat.codes.to_numpy()
+        row_codes = np.where(codes >= 0, key_codes[codes], -1)
+        df = eta_df.assign(line=pd.Categorical.from_codes(row_codes, keys))
+
+        if not line_index.index.is_unique:
+            # a line with several rows multiplies its arrivals, as a merge does
+            return df.merge(line_index.reset_index(), on="line", how="left")
+        # left join on line col: one row of attributes per distinct line, taken for every row
+        lookup = line_index.reindex(keys)
+        for column in lookup.columns:
+            df[column] = take(lookup[column].to_numpy(), row_codes, allow_fill=True)
         return df
     except Exception as e:
         logger.error(e)
@@ -364,12 +786,80 @@ def join_eta_dataset(calendar_line_df: pd.DataFrame, eta_df: pd.DataFrame) -> pd
         return pd.DataFrame([])
 
 
-def create_emt(settings: Settings, date: str):
+def create_emt_chunked(
+    settings: Settings,
+    date: str,
+    calendar_line_df: pd.DataFrame,
+    output_path: str,
+    append: bool,
+    select: Optional[Callable[[str], bool]] = None,
+) -> Optional[tuple]:
+    """Join and export the day's ETA dataset in time slices within the join memory budget.
+
+    Only a slice of ETA and its joined rows are in memory at a time; each joined slice is
+    appended to the output.
+
+    Args:
+        settings (Settings): project settings
+        date (str): a date formatted in YYYY/MM/DD
+        calendar_line_df (pd.DataFrame): calendar and line_detail previously joined dataset
+        output_path (str): path of the output without extension
+        append (bool): add the first slice to the existing output instead of replacing it
+        select (Optional[Callable[[str], bool]]): ETA raw files to read, all of them if None
+
+    Returns:
+        Optional[tuple]: shape of the exported dataset, None if there was no data
+    """
+    storage_config = settings.storage.config
+    if settings.storage.default != "local":
+        async_download(
+            bucket=storage_config.minio.bucket,
+            prefix=f"raw/emt/{date}/eta/",
+            output_path=storage_config.local.path,
+            endpoint_url=storage_config.minio.endpoint,
+            aws_access_key_id=storage_config.minio.access_key,
+            aws_secret_access_key=storage_config.minio.secret_key,
+            select=select,
+            max_downloads=storage_config.minio.max_downloads,
+        )
+
+    budget = JoinBudget(settings.sources.emt.join_memory_mb)
+    line_index = build_line_index(calendar_line_df)
+    n_rows = 0
+    for eta_df in iter_eta_day_chunks(storage_config.local.path, date, budget, select):
+        df = join_eta_dataset(calendar_line_df, eta_df, line_index=line_index)
+        if df.empty:
+            continue
+        budget.update(len(eta_df), df)
+        df = df[EMT_COLUMNS].sort_values(by=["datetime", "bus", "line", "stop"])
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        write_processed_df(
+            df,
+            output_path,
+            settings.storage.output_format,
+            dictionary_columns=("line", "stop", "bus"),
+            append=append or n_rows > 0,
+        )
+        n_rows += len(df)
+        logger.debug(
+            f"Exported EMT slice of {len(df)} rows, next slices of {budget.eta_rows} ETA rows"
+        )
+    return (n_rows, len(EMT_COLUMNS)) if n_rows > 0 else None
+
+
+def create_emt(settings: Settings, date: str, stream: bool = False, incremental: bool = False):
     """Create and export joined dataset from all EMT endpoints.
 
+    Incremental runs only read the ETA files of the ticks after the day's watermark and append
+    their rows to the existing dataset, so intraday refreshes cost as much as the new data.
+    With a join memory budget (join_memory_mb) the ETA files are joined in time slices instead
+    of as a whole day, except when streaming them from MinIO.
+
     Args:
         settings (Settings): project settings
         date (str): a date formatted in YYYY/MM/DD
+        stream (bool): read the ETA raw files from MinIO into memory instead of downloading them
+        incremental (bool): only add the ETA ticks not processed by the previous run
     """
     # Logger
     instantiate_logger(settings, "EMT", "create")
@@ -377,44 +867,57 @@ def create_emt(settings: Settings, date: str):
     storage_path = settings.storage.config.local.path
     logger.info(f"Creating EMT dataset for date: {date}")
     try:
+        date_formatted = date.replace("/", "")
+        processed_storage_path = storage_path + f"/processed/emt/{date}"
+        output_path = processed_storage_path + f"/emt_{date_formatted}"
+        watermark_path = Path(processed_storage_path) / f"emt_{date_formatted}_watermark.json"
+        select = None
+        if incremental:
+            cutoff = datetime.now(pytz.timezone("Europe/Madrid")) - timedelta(
+                minutes=ETA_SETTLE_MINUTES
+            )
+            select = EtaWatermark(read_watermark(watermark_path), cutoff.strftime("%Y-%m-%dT%H%M"))
+            logger.info(f"Adding EMT ETA ticks after {select.watermark} up to {select.cutoff}")
+        elif watermark_path.is_file():
+            # the whole day is rebuilt
+            watermark_path.unlink()
+        append = select is not None and select.watermark is not None
+        chunked = settings.sources.emt.join_memory_mb and not (
+            stream and settings.storage.default != "local"
+        )
+
         calendar_df = create_calendar_emt(settings, date)
         line_detail_df = create_line_detail_emt(settings, date)
-        eta_df = create_eta_emt(settings, date)
-        if not calendar_df.empty and not line_detail_df.empty and not eta_df.empty:
+        shape = None
+        if not calendar_df.empty and not line_detail_df.empty and chunked:
             calendar_line_df = join_calendar_line_datasets(calendar_df, line_detail_df)
-            df = join_eta_dataset(calendar_line_df, eta_df)
-
-            # reorder cols and sort values
-            df = df[
-                [
-                    "date",
-                    "datetime",
-                    "bus",
-                    "line",
-                    "stop",
-                    "positionBusLon",
-                    "positionBusLat",
-                    "positionTypeBus",
-                    "DistanceBus",
-                    "destination",
-                    "deviation",
-                    "StartTime",
-                    "StopTime",
-                    "MinimunFrequency",
-                    "MaximumFrequency",
-                    "isHead",
-                    "dayType",
-                    "strike",
-                    "estimateArrive",
-                ]
-            ].sort_values(by=["datetime", "bus", "line", "stop"])
-
-            # export final df
-            Path(storage_path + f"/processed/emt/{date}").mkdir(parents=True, exist_ok=True)
-            date_formatted = date.replace("/", "")
-            processed_storage_path = storage_path + f"/processed/emt/{date}"
-            df.to_csv(processed_storage_path + f"/emt_{date_formatted}.csv", index=None)
-            logger.info(f"Created EMT df of shape {df.shape}")
+            shape = create_emt_chunked(
+                settings, date, calendar_line_df, output_path, append, select=select
+            )
+        elif not calendar_df.empty and not line_detail_df.empty:
+            eta_df = create_eta_emt(settings, date, stream=stream, select=select)
+            if not eta_df.empty:
+                calendar_line_df = join_calendar_line_datasets(calendar_df, line_detail_df)
+                df = join_eta_dataset(calendar_line_df, eta_df)
+
+                # reorder cols and sort values
+                df = df[EMT_COLUMNS].sort_values(by=["datetime", "bus", "line", "stop"])
+
+                # export final df
+                Path(processed_storage_path).mkdir(parents=True, exist_ok=True)
+                write_processed_df(
+                    df,
+                    output_path,
+                    settings.storage.output_format,
+                    dictionary_columns=("line", "stop", "bus"),
+                    append=append,
+                )
+                shape = df.shape
+
+        if shape is not None:
+            if select is not None:
+                write_watermark(watermark_path, select.last_tick)
+            logger.info(f"Created EMT df of shape {shape}")
         else:
             logger.debug("There is no data to create")
     except Exception as e:
@@ -1,17 +1,30 @@
 import asyncio
-import json
 import os
 import tempfile
 import traceback
 from datetime import datetime
 from pathlib import Path
+from typing import Union
 
 import pandas as pd
 from loguru import logger
 
 from inesdata_mov_datasets.handlers.logger import instantiate_logger
+from inesdata_mov_datasets.handlers.schemas import (
+    InformoPms,
+    InformoResponse,
+    SchemaError,
+    as_schema,
+    decode,
+)
 from inesdata_mov_datasets.settings import Settings
-from inesdata_mov_datasets.utils import download_objs
+from inesdata_mov_datasets.utils import (
+    DEFAULT_MAX_DOWNLOADS,
+    ColumnAccumulator,
+    download_objs,
+    open_raw,
+    write_processed_df,
+)
 
 
 def download_informo(
@@ -21,6 +34,7 @@ def download_informo(
     endpoint_url: str,
     aws_access_key_id: str,
     aws_secret_access_key: str,
+    max_downloads: int = DEFAULT_MAX_DOWNLOADS,
 ):
     """Download from minIO a day's raw data of Informo endpoint.
 
@@ -31,67 +45,99 @@ def download_informo(
         endpoint_url (str): url of minio bucket
         aws_access_key_id (str): minio user
         aws_secret_access_key (str): minio password
+        max_downloads (int): number of objects downloaded in parallel
     """
     loop = asyncio.new_event_loop()
     loop.run_until_complete(
         download_objs(
-            bucket, prefix, output_path, endpoint_url, aws_access_key_id, aws_secret_access_key
+            bucket,
+            prefix,
+            output_path,
+            endpoint_url,
+            aws_access_key_id,
+            aws_secret_access_key,
+            max_downloads=max_downloads,
         )
     )
 
 
-def generate_df_from_file(content: dict) -> pd.DataFrame:
-    """Generate a day's pandas dataframe from a single file downloaded from MinIO.
+def add_file(accumulator: ColumnAccumulator, content: Union[InformoPms, dict]) -> None:
+    """Add the traffic records of a single file downloaded from MinIO to a day's accumulator.
 
     Args:
-        content (dict): traffic info from a file
-
-    Returns:
-        pd.DataFrame: day's pandas dataframe from a single file downloaded from MinIO
+        accumulator (ColumnAccumulator): day's traffic records
+        content (Union[InformoPms, dict]): traffic info from a file
     """
-    day_df = pd.DataFrame([])
     try:
-        if len(content) != 0:
-            day_df = pd.DataFrame(content["pm"])
-            if not day_df.empty:
-                day_df["datetime"] = pd.to_datetime(content["fecha_hora"], dayfirst=True)
-                # Add date col
-                day_df["date"] = pd.to_datetime(day_df["datetime"].dt.date)
+        if isinstance(content, InformoPms) or len(content) != 0:
+            content = as_schema(content, InformoPms)
+            file_datetime = pd.to_datetime(content.fecha_hora, dayfirst=True)
+            accumulator.add(
+                content.pm,
+                columns={
+                    "datetime": file_datetime,
+                    # Add date col
+                    "date": file_datetime.normalize(),
+                },
+            )
     except Exception as e:
         logger.error(e)
         logger.error(traceback.format_exc())
-    return day_df
 
 
-def generate_day_df(storage_path: str, date: str):
+def generate_df_from_file(content: Union[InformoPms, dict]) -> pd.DataFrame:
+    """Generate a day's pandas dataframe from a single file downloaded from MinIO.
+
+    Args:
+        content (Union[InformoPms, dict]): traffic info from a file
+
+    Returns:
+        pd.DataFrame: day's pandas dataframe from a single file downloaded from MinIO
+    """
+    accumulator = ColumnAccumulator()
+    add_file(accumulator, content)
+    return accumulator.to_frame()
+
+
+def generate_day_df(storage_path: str, date: str, output_format: str = "csv"):
     """Generate a day's pandas dataframe from a whole day's files downloaded from MinIO.
 
     Args:
         storage_path (str): local path to store resulting df
         date (str): a date formatted in YYYY/MM/DD
+        output_format (str): format of the resulting df: csv or parquet
     """
-    dfs = []
+    accumulator = ColumnAccumulator()
     raw_storage_dir = Path(storage_path) / Path("raw") / "informo" / date
     raw_storage_dir.mkdir(parents=True, exist_ok=True)
     files = os.listdir(raw_storage_dir)
     logger.info(f"#{len(files)} files from INFORMO endpoint")
     for file in files:
         filename = raw_storage_dir / file
-        with open(filename, "r") as f:
-            content = json.load(f)
-        if "pms" in content:
-            df = generate_df_from_file(content["pms"])
-            dfs.append(df)
-
-    if len(dfs) > 0:
-        final_df = pd.concat(dfs)
+        with open_raw(filename) as f:
+            data = f.read()
+        try:
+            content = decode(data, InformoResponse)
+        except SchemaError as e:
+            logger.error(f"Skipping malformed INFORMO file {file}: {e}")
+            continue
+        if content.pms is not None:
+            add_file(accumulator, content.pms)
+
+    if accumulator.length > 0:
+        final_df = accumulator.to_frame()
         # sort values
         final_df = final_df.sort_values(by="datetime")
         # export final df
         processed_storage_dir = Path(storage_path) / Path("processed") / "informo" / date
         date_formatted = date.replace("/", "")
         Path(processed_storage_dir).mkdir(parents=True, exist_ok=True)
-        final_df.to_csv(processed_storage_dir / f"informo_{date_formatted}.csv", index=None)
+        write_processed_df(
+            final_df,
+            processed_storage_dir / f"informo_{date_formatted}",
+            output_format,
+            dictionary_columns=("idelem",),
+        )
         logger.info(f"Created INFORMO df of shape {final_df.shape}")
     else:
         logger.debug("There is no data to create")
@@ -122,8 +168,13 @@ def create_informo(settings: Settings, date: str):
                     endpoint_url=storage_config.minio.endpoint,
                     aws_access_key_id=storage_config.minio.access_key,
                     aws_secret_access_key=storage_config.minio.secret_key,
+                    max_downloads=storage_config.minio.max_downloads,
                 )
-            generate_day_df(storage_path=storage_path, date=date)
+            generate_day_df(
+                storage_path=storage_path,
+                date=date,
+                output_format=settings.storage.output_format,
+            )
 
             end = datetime.now()
             logger.debug(f"Time duration of INFORMO dataset creation {end - start}")
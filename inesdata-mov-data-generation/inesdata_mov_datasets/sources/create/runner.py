@@ -0,0 +1,86 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator
+
+from inesdata_mov_datasets.handlers.logger import set_worker_id
+from inesdata_mov_datasets.settings import Settings
+from inesdata_mov_datasets.sources.create.aemet import create_aemet
+from inesdata_mov_datasets.sources.create.emt import create_emt
+from inesdata_mov_datasets.sources.create.informo import create_informo
+
+
+def create_dataset(
+    settings: Settings, source: str, date: str, stream: bool = False, incremental: bool = False
+) -> float:
+    """Create the dataset of a source for a given date.
+
+    Args:
+        settings (Settings): project settings
+        source (str): source name (emt, aemet, informo)
+        date (str): a date formatted in YYYY/MM/DD
+        stream (bool): read EMT ETA raw files from MinIO into memory
+        incremental (bool): only add the EMT ETA ticks not processed by the previous run
+
+    Returns:
+        float: seconds spent creating the dataset
+    """
+    start = time.perf_counter()
+    if source == "emt":
+        create_emt(settings=settings, date=date, stream=stream, incremental=incremental)
+    elif source == "aemet":
+        create_aemet(settings=settings, date=date)
+    elif source == "informo":
+        create_informo(settings=settings, date=date)
+    else:
+        raise ValueError(f"Unknown source: {source}")
+    return time.perf_counter() - start
+
+
+def init_worker(worker_ids: multiprocessing.Queue):
+    """Give each process of the pool its own worker id for logging.
+
+    Args:
+        worker_ids (multiprocessing.Queue): ids not taken yet by any worker
+    """
+    set_worker_id(worker_ids.get())
+
+
+def create_datasets(
+    settings: Settings,
+    dates: list,
+    sources: list,
+    stream: bool,
+    workers: int,
+    incremental: bool = False,
+) -> Iterator[tuple]:
+    """Create the datasets of every date and source in a pool of processes.
+
+    Args:
+        settings (Settings): project settings
+        dates (list): dates formatted in YYYY/MM/DD
+        sources (list): source names (emt, aemet, informo)
+        stream (bool): read EMT ETA raw files from MinIO into memory
+        workers (int): number of processes
+        incremental (bool): only add the EMT ETA ticks not processed by the previous run
+
+    Yields:
+        tuple: date, source and seconds spent as each dataset finishes
+    """
+    worker_ids = multiprocessing.Queue()
+    for worker_id in range(workers):
+        worker_ids.put(worker_id)
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(worker_ids,)
+    ) as executor:
+        futures = {}
+        for date in dates:
+            for source in sources:
+                future = executor.submit(
+                    create_dataset, settings, source, date, stream, incremental
+                )
+                futures[future] = (date, source)
+        for future in as_completed(futures):
+            date, source = futures[future]
+            yield date, source, future.result()
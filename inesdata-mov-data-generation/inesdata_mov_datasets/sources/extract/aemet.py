@@ -6,12 +6,54 @@ import traceback
 from pathlib import Path
 import pytz
 
-import requests
+import aiohttp
 from loguru import logger
 
+from inesdata_mov_datasets.handlers.codec import json_dumps, json_loads
 from inesdata_mov_datasets.handlers.logger import instantiate_logger
+from inesdata_mov_datasets.handlers.retry import call_with_retry
 from inesdata_mov_datasets.settings import Settings
-from inesdata_mov_datasets.utils import check_local_file_exists, check_s3_file_exists, upload_objs
+from inesdata_mov_datasets.utils import (
+    check_local_file_exists,
+    check_s3_file_exists,
+    encode_raw,
+    http_session,
+    raw_object_name,
+    storage_context,
+    upload_objs,
+)
+
+
+AEMET_URL_MADRID = (
+    "https://opendata.aemet.es/opendata/api/prediccion/especifica/municipio/horaria/28079"
+)
+
+
+async def request_aemet(session: aiohttp.ClientSession, api_key: str) -> json:
+    """Request the hourly weather forecast of Madrid to aemet API.
+
+    AEMET answers first with the url where the data is published, so two requests are made
+    reusing the session connections.
+
+    Args:
+        session (aiohttp.ClientSession): Call session to make faster the calls to the same API.
+        api_key (str): AEMET api key.
+
+    Returns:
+        json: Weather forecast in json format.
+    """
+    headers = {
+        "api_key": api_key,
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+    # AEMET doesn't always answer with a json content type
+    async with session.get(AEMET_URL_MADRID, headers=headers) as response:
+        response.raise_for_status()
+        url_data = (await response.json(loads=json_loads, content_type=None))["datos"]
+    async with session.get(url_data) as response:
+        response.raise_for_status()
+        return await response.json(loads=json_loads, content_type=None)
 
 
 async def get_aemet(config: Settings):
@@ -26,20 +68,13 @@ async def get_aemet(config: Settings):
         logger.info("Extracting AEMET")
         now = datetime.datetime.now()
 
-        url_madrid = (
-            "https://opendata.aemet.es/opendata/api/prediccion/especifica/municipio/horaria/28079"
-        )
-
-        headers = {
-            "api_key": config.sources.aemet.credentials.api_key,
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        }
-
-        r = requests.get(url_madrid, headers=headers)
-        r_json = requests.get(r.json()["datos"]).json()
+        async with http_session() as session:
+            r_json = await call_with_retry(
+                lambda: request_aemet(session, config.sources.aemet.credentials.api_key), "AEMET"
+            )
 
-        await save_aemet(config, r_json)
+        async with storage_context(config):
+            await save_aemet(config, r_json)
 
         end = datetime.datetime.now()
         logger.debug(f"Time duration of AEMET extraction {end - now}")
@@ -66,12 +101,12 @@ async def save_aemet(config: Settings, data: json):
     formatted_date_slash = current_datetime.strftime(
         "%Y/%m/%d"
     )  # formatted date year/month/day for storage in Minio
+    compression = config.storage.compression
+    file_name = raw_object_name(f"aemet_{formatted_date_day}.json", compression)
 
     if config.storage.default == "minio":
         # Define object name
-        object_name = (
-            Path("raw") / "aemet" / formatted_date_slash / f"aemet_{formatted_date_day}.json"
-        )
+        object_name = Path("raw") / "aemet" / formatted_date_slash / file_name
 
         if not await check_s3_file_exists(
             endpoint_url=config.storage.config.minio.endpoint,
@@ -80,12 +115,12 @@ async def save_aemet(config: Settings, data: json):
             bucket_name=config.storage.config.minio.bucket,
             object_name=str(object_name),
         ):
-            # Convert data to JSON string
-            response_json_str = json.dumps(data)
+            # Convert data to JSON
+            response_json = json_dumps(data)
 
             # Create dict and upload into s3
             aemet_dict_upload = {}
-            aemet_dict_upload[str(object_name)] = response_json_str
+            aemet_dict_upload[str(object_name)] = encode_raw(response_json, compression)
             await upload_objs(
                 config.storage.config.minio.bucket,
                 config.storage.config.minio.endpoint,
@@ -98,20 +133,20 @@ async def save_aemet(config: Settings, data: json):
 
     if config.storage.default == "local":
         # Define object name and path for local storage
-        object_name = f"aemet_{formatted_date_day}.json"
+        object_name = file_name
         local_path = (
             Path(config.storage.config.local.path) / "raw" / "aemet" / formatted_date_slash
         )
 
         if not check_local_file_exists(local_path, object_name):
-            # Convert data to JSON string
-            response_json_str = json.dumps(data)
+            # Convert data to JSON
+            response_json = json_dumps(data)
 
             # Create directories if they don't exist
             local_path.mkdir(parents=True, exist_ok=True)
 
             # Write JSON data to file
-            with open(local_path / object_name, "w") as file:
-                file.write(response_json_str)
+            with open(local_path / object_name, "wb") as file:
+                file.write(encode_raw(response_json, compression))
         else:
             logger.debug("Already called AEMET today")
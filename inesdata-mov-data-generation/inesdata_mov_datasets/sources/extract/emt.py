@@ -5,28 +5,282 @@ import json
 import os
 import traceback
 from pathlib import Path
+from typing import Awaitable, Callable, Optional
 
 import aiohttp
 import pytz
-import requests
 from loguru import logger
 
+from inesdata_mov_datasets.handlers.codec import json_dumps, json_loads
+from inesdata_mov_datasets.handlers.limiter import AdaptiveLimiter, limited
 from inesdata_mov_datasets.handlers.logger import instantiate_logger
+from inesdata_mov_datasets.handlers.retry import ApiError, call_with_retry, tick_deadline
 from inesdata_mov_datasets.settings import Settings
 from inesdata_mov_datasets.utils import (
+    ETA_BUNDLE_EXTENSION,
     check_local_file_exists,
     check_s3_file_exists,
+    encode_raw,
+    http_session,
+    list_s3_keys,
+    open_raw,
+    raw_object_name,
     read_obj,
+    storage_context,
+    upload_metadata,
     upload_objs,
-    upload_metadata
 )
 
+EMT_LOGIN_URL = "https://openapi.emtmadrid.es/v2/mobilitylabs/user/login/"
+# Tokens closer than this to their expiration are renewed in the background
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=15)
+# Seconds of the one-minute tick available for the EMT requests and their retries, the rest is
+# left to store the responses before the next extraction starts
+EMT_TICK_BUDGET = 50
+
+# Daily EMT objects (line_detail, calendar, login) already stored, cached for the current day
+_stored_objects_cache: dict = {}
+# EMT access tokens and their expiration, keyed by the credentials that requested them
+_token_cache: dict = {}
+# Background logins renewing a token, keyed by credentials
+_token_refreshes: dict = {}
+# Limiter of the requests to the EMT API, kept between extractions to remember its rate
+_emt_limiter: Optional[AdaptiveLimiter] = None
+# File under the local storage path keeping the EMT concurrency limit between runs (e.g. cron)
+EMT_LIMITER_STATE = Path("state") / "emt_limiter.json"
+
+
+def read_limiter_state(config: Settings) -> Optional[int]:
+    """Read the EMT concurrency limit reached by the previous run.
+
+    Args:
+        config (Settings): Object with the config file.
+
+    Returns:
+        Optional[int]: Concurrency limit, None if no run saved it.
+    """
+    path = Path(config.storage.config.local.path) / EMT_LIMITER_STATE
+    try:
+        with open(path, "rb") as f:
+            return int(json_loads(f.read())["concurrency"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_limiter_state(config: Settings, limiter: AdaptiveLimiter):
+    """Save the EMT concurrency limit reached, so that the next run starts from it.
+
+    Args:
+        config (Settings): Object with the config file.
+        limiter (AdaptiveLimiter): Limiter of the requests to the EMT API.
+    """
+    path = Path(config.storage.config.local.path) / EMT_LIMITER_STATE
+    try:
+        os.makedirs(path.parent, exist_ok=True)
+        with open(f"{path}.part", "wb") as f:
+            f.write(json_dumps({"concurrency": limiter.concurrency}))
+        os.replace(f"{path}.part", path)
+    except OSError as e:
+        logger.warning(f"Could not save the EMT limiter state: {e}")
+
+
+def get_emt_limiter(config: Settings) -> AdaptiveLimiter:
+    """Get the limiter of the requests to the EMT API, creating it the first time.
+
+    A new limiter starts from the concurrency limit reached by the previous run, so that runs
+    started every minute by cron don't start again from initial_concurrency.
+
+    Args:
+        config (Settings): Object with the config file.
+
+    Returns:
+        AdaptiveLimiter: Limiter shared by the ETA, line_detail and calendar requests.
+    """
+    global _emt_limiter
+    if _emt_limiter is None:
+        emt_config = config.sources.emt
+        saved_concurrency = read_limiter_state(config)
+        _emt_limiter = AdaptiveLimiter(
+            initial_concurrency=(
+                emt_config.initial_concurrency if saved_concurrency is None else saved_concurrency
+            ),
+            max_concurrency=emt_config.max_concurrency,
+            max_requests_per_second=emt_config.max_requests_per_second,
+            latency_target=emt_config.latency_target,
+        )
+    return _emt_limiter
+
+
+def get_credentials_key(config: Settings) -> tuple:
+    """Get the key identifying the EMT credentials of the config in the token cache.
+
+    Args:
+        config (Settings): Object with the config file.
+
+    Returns:
+        tuple: EMT credentials.
+    """
+    credentials = config.sources.emt.credentials
+    if credentials.x_client_id is not None:
+        return ("x_client_id", credentials.x_client_id, credentials.passkey)
+    return ("email", credentials.email, credentials.password)
+
+
+def cache_token(config: Settings, login_json: dict):
+    """Keep in memory the token of an EMT login response until it expires.
+
+    Args:
+        config (Settings): Object with the config file.
+        login_json (dict): Response of the login endpoint.
+    """
+    data = login_json["data"][0]
+    expiration = datetime.datetime.fromtimestamp(
+        data["tokenDteExpiration"]["$date"] / 1000, tz=datetime.timezone.utc
+    )  # miliseconds to seconds
+    _token_cache[get_credentials_key(config)] = (data["accessToken"], expiration)
+
+
+def refresh_token_in_background(config: Settings, date_slash: str, date_day: str):
+    """Start a login renewing the cached token, unless one is already running.
+
+    Args:
+        config (Settings): Object with the config file.
+        date_slash (str): date format for object name
+        date_day (str): date format for object name
+    """
+    key = get_credentials_key(config)
+    if key in _token_refreshes and not _token_refreshes[key].done():
+        return
+    logger.debug("Refreshing EMT token before it expires")
+    login_name = raw_object_name(f"login_{date_day}.json", config.storage.compression)
+    if config.storage.default == "minio":
+        object_login_name = Path("raw") / "emt" / date_slash / "login" / login_name
+        _token_refreshes[key] = asyncio.ensure_future(login_emt(config, object_login_name))
+    elif config.storage.default == "local":
+        dir_path = Path(config.storage.config.local.path) / "raw" / "emt" / date_slash / "login"
+        _token_refreshes[key] = asyncio.ensure_future(
+            login_emt(config, login_name, local_path=dir_path)
+        )
+
+
+async def get_stored_objects(config: Settings, date_slash: str) -> set:
+    """Get the names of the daily EMT objects already stored for a date.
+
+    The line_detail, calendar and login directories are listed once per day (one request per
+    directory regardless of the number of lines) and the result is cached in memory.
+
+    Args:
+        config (Settings): Object with the config file.
+        date_slash (str): date format for object name
+
+    Returns:
+        set: Names of the objects already stored.
+    """
+    if config.storage.default == "minio":
+        cache_key = ("minio", config.storage.config.minio.bucket, date_slash)
+    else:
+        cache_key = ("local", config.storage.config.local.path, date_slash)
+    if cache_key in _stored_objects_cache:
+        return _stored_objects_cache[cache_key]
+
+    # Only the current day is kept in the cache
+    _stored_objects_cache.clear()
+    directories = ["line_detail", "calendar", "login"]
+    stored_objects = set()
+    if config.storage.default == "minio":
+        listings = await asyncio.gather(
+            *[
+                list_s3_keys(
+                    endpoint_url=config.storage.config.minio.endpoint,
+                    aws_secret_access_key=config.storage.config.minio.secret_key,
+                    aws_access_key_id=config.storage.config.minio.access_key,
+                    bucket_name=config.storage.config.minio.bucket,
+                    prefix=f"raw/emt/{date_slash}/{directory}/",
+                )
+                for directory in directories
+            ]
+        )
+        stored_objects = {Path(key).name for keys in listings for key in keys}
+    elif config.storage.default == "local":
+        for directory in directories:
+            dir_path = Path(config.storage.config.local.path) / "raw" / "emt" / date_slash / directory
+            if dir_path.is_dir():
+                stored_objects.update(os.listdir(dir_path))
+
+    _stored_objects_cache[cache_key] = stored_objects
+    return stored_objects
+
+
+async def request_emt(
+    session: aiohttp,
+    method: str,
+    url: str,
+    headers: json,
+    limiter: AdaptiveLimiter = None,
+    body: json = None,
+) -> json:
+    """Make a call to an EMT endpoint, raising if it fails.
+
+    Args:
+        session (aiohttp): Call session to make faster the calls to the same API.
+        method (str): HTTP method of the call.
+        url (str): Url of the endpoint.
+        headers (json): Headers of the http call.
+        limiter (AdaptiveLimiter): Limiter of the requests to the EMT API.
+        body (json): Body of the call, if any.
+
+    Raises:
+        ApiError: If the response has an error code.
+
+    Returns:
+        json: Response of the petition in json format.
+    """
+    async with limited(limiter) as slot, session.request(
+        method, url, headers=headers, json=body
+    ) as response:
+        slot.status = response.status
+        response.raise_for_status()
+        response_json = await response.json(loads=json_loads)
+    if isinstance(response_json, dict) and response_json.get("code", "00") != "00":
+        raise ApiError(response_json)
+    return response_json
+
+
+async def call_emt(
+    request: Callable[[], Awaitable[json]],
+    description: str,
+    policies: dict = None,
+    hedge_after: float = None,
+) -> json:
+    """Make a call to an EMT endpoint with retries, without raising.
+
+    Args:
+        request (Callable[[], Awaitable[json]]): Function making the call (see request_emt).
+        description (str): Name of the call for the logs.
+        policies (dict): Retry policy by error class, the default ones if None.
+        hedge_after (float): Seconds after which a slow call is hedged, if any.
+
+    Returns:
+        json: Response of the petition in json format, the response with the error code if the
+            API answered with an error or {"code": -1} if the call failed.
+    """
+    try:
+        return await call_with_retry(request, description, policies, hedge_after)
+    except ApiError as e:
+        return e.response
+    except Exception as e:
+        logger.error(f"Error in {description} to the server")
+        logger.error(e)
+        return {"code": -1}
+
 
 async def get_calendar(
     session: aiohttp,
     startDate: str,
     endDate: str,
     headers: json,
+    limiter: AdaptiveLimiter = None,
+    policies: dict = None,
 ) -> json:
     """Call Calendar endpoint EMT.
 
@@ -35,6 +289,8 @@ async def get_calendar(
         startDate (str): Start date of the date you want to check.
         endDate (str): End date of the date you want to check.
         headers (json): Headers of the http petition.
+        limiter (AdaptiveLimiter): Limiter of the requests to the EMT API.
+        policies (dict): Retry policy by error class, the default ones if None.
 
     Returns:
         json: Response of the petition in json format.
@@ -42,14 +298,11 @@ async def get_calendar(
     calendar_url = (
         f"https://openapi.emtmadrid.es/v1/transport/busemtmad/calendar/{startDate}/{endDate}/"
     )
-    async with session.get(calendar_url, headers=headers) as response:
-        try:
-            response.raise_for_status()
-            return await response.json()
-        except Exception as e:
-            logger.error("Error in calendar call to the server")
-            logger.error(e)
-            return {"code": -1}
+    return await call_emt(
+        lambda: request_emt(session, "GET", calendar_url, headers, limiter),
+        "calendar call",
+        policies,
+    )
 
 
 async def get_line_detail(
@@ -57,6 +310,8 @@ async def get_line_detail(
     date: str,
     line_id: str,
     headers: json,
+    limiter: AdaptiveLimiter = None,
+    policies: dict = None,
 ) -> json:
     """Call line_detail endpoint EMT.
 
@@ -65,6 +320,8 @@ async def get_line_detail(
         date (str): Date reference of the petition (we use the date of the done petition).
         line_id (str): Id of the line.
         headers (json): Headers of the petition.
+        limiter (AdaptiveLimiter): Limiter of the requests to the EMT API.
+        policies (dict): Retry policy by error class, the default ones if None.
 
     Returns:
         json: Response of the petition in json format.
@@ -72,23 +329,30 @@ async def get_line_detail(
     line_detail_url = (
         f"https://openapi.emtmadrid.es/v1/transport/busemtmad/lines/{line_id}/info/{date}/"
     )
-    async with session.get(line_detail_url, headers=headers) as response:
-        try:
-            response.raise_for_status()
-            return await response.json()
-        except Exception as e:
-            logger.error(f"Error in line_detail call line {line_id} to the server")
-            logger.error(e)
-            return {"code": -1}
+    return await call_emt(
+        lambda: request_emt(session, "GET", line_detail_url, headers, limiter),
+        f"line_detail call line {line_id}",
+        policies,
+    )
 
 
-async def get_eta(session: aiohttp, stop_id: str, headers: json) -> json:
+async def get_eta(
+    session: aiohttp,
+    stop_id: str,
+    headers: json,
+    limiter: AdaptiveLimiter = None,
+    policies: dict = None,
+    hedge_after: float = None,
+) -> json:
     """Make the API call to ETA endpoint.
 
     Args:
         session (aiohttp): Call session to make faster the calls to the same API.
         stop_id (str): Id of the bus stop.
         headers (json): Headers of the http call.
+        limiter (AdaptiveLimiter): Limiter of the requests to the EMT API.
+        policies (dict): Retry policy by error class, the default ones if None.
+        hedge_after (float): Seconds after which a slow call is hedged, if any.
 
     Returns:
         json: Response of the petition in json format.
@@ -100,14 +364,12 @@ async def get_eta(session: aiohttp, stop_id: str, headers: json) -> json:
         "Text_IncidencesRequired_YN": "N",
     }
     eta_url = f"https://openapi.emtmadrid.es/v2/transport/busemtmad/stops/{stop_id}/arrives/"
-    async with session.post(eta_url, headers=headers, json=body) as response:
-        try:
-            response.raise_for_status()
-            return await response.json()
-        except Exception as e:
-            logger.error(f"Error in ETA call stop {stop_id} to the server")
-            logger.error(e)
-            return {"code": -1}
+    return await call_emt(
+        lambda: request_emt(session, "POST", eta_url, headers, limiter, body),
+        f"ETA call stop {stop_id}",
+        policies,
+        hedge_after,
+    )
 
 
 async def login_emt(config: Settings, object_login_name: str, local_path: Path = None) -> str:
@@ -135,19 +397,23 @@ async def login_emt(config: Settings, object_login_name: str, local_path: Path =
             "Content-Type": "application/json",
             "Accept": "application/json",
         }
-    r = requests.get(
-        "https://openapi.emtmadrid.es/v2/mobilitylabs/user/login/", headers=headers, verify=True
-    )
+    async with http_session() as session:
+        async with session.get(EMT_LOGIN_URL, headers=headers) as r:
+            login_content = await r.read()
     try:
-        login_json = r.json()
-        login_json_str = json.dumps(login_json)
+        login_json = json_loads(login_content)
+        login_raw = encode_raw(login_content, config.storage.compression)
 
         token = login_json["data"][0]["accessToken"]
+        try:
+            cache_token(config, login_json)
+        except (KeyError, TypeError):
+            logger.warning("EMT login without token expiration, the token is not cached")
 
         if config.storage.default == "minio":
             # Dict to upload s3 asynchronously
             login_dict_upload = {}
-            login_dict_upload[str(object_login_name)] = login_json_str
+            login_dict_upload[str(object_login_name)] = login_raw
             await upload_objs(
                 config.storage.config.minio.bucket,
                 config.storage.config.minio.endpoint,
@@ -158,8 +424,8 @@ async def login_emt(config: Settings, object_login_name: str, local_path: Path =
 
         if config.storage.default == "local" and local_path:
             os.makedirs(local_path, exist_ok=True)
-            with open(os.path.join(local_path, object_login_name), "w") as file:
-                file.write(login_json_str)
+            with open(os.path.join(local_path, object_login_name), "wb") as file:
+                file.write(login_raw)
 
         return token
     except Exception as e:
@@ -168,28 +434,48 @@ async def login_emt(config: Settings, object_login_name: str, local_path: Path =
         return ""
 
 
-async def token_control(config: Settings, date_slash: str, date_day: str) -> str:
+async def token_control(
+    config: Settings, date_slash: str, date_day: str, stored_objects: set = None
+) -> str:
     """Get existing token from EMT API or regenerate it if its deprecated.
 
     Args:
         config (Settings): Object with the config file.
         date_slash (str): date format for object name
         date_day (str): date format for object name
+        stored_objects (set): Names of the daily objects already stored (see
+            get_stored_objects). If not provided, the storage is checked.
 
     Returns:
        str: Token from EMT Login.
     """
+    # Serve the token from memory while it is valid, the persisted login is only read at cold start
+    cached = _token_cache.get(get_credentials_key(config))
+    if cached is not None:
+        token, expiration = cached
+        remaining = expiration - datetime.datetime.now(datetime.timezone.utc)
+        if remaining > datetime.timedelta(0):
+            if remaining <= TOKEN_REFRESH_MARGIN:
+                refresh_token_in_background(config, date_slash, date_day)
+            return token
+
+    login_name = raw_object_name(f"login_{date_day}.json", config.storage.compression)
+    if stored_objects is not None:
+        login_stored = login_name in stored_objects
+
     if config.storage.default == "minio":
-        object_login_name = Path("raw") / "emt" / date_slash / "login" / f"login_{date_day}.json"
+        object_login_name = Path("raw") / "emt" / date_slash / "login" / login_name
 
         # Check if file already exists so we have made the call already
-        if not await check_s3_file_exists(
-            endpoint_url=config.storage.config.minio.endpoint,
-            aws_secret_access_key=config.storage.config.minio.secret_key,
-            aws_access_key_id=config.storage.config.minio.access_key,
-            bucket_name=config.storage.config.minio.bucket,
-            object_name=str(object_login_name),
-        ):
+        if stored_objects is None:
+            login_stored = await check_s3_file_exists(
+                endpoint_url=config.storage.config.minio.endpoint,
+                aws_secret_access_key=config.storage.config.minio.secret_key,
+                aws_access_key_id=config.storage.config.minio.access_key,
+                bucket_name=config.storage.config.minio.bucket,
+                object_name=str(object_login_name),
+            )
+        if not login_stored:
             token = await login_emt(config, object_login_name)
             return token
 
@@ -203,7 +489,7 @@ async def token_control(config: Settings, date_slash: str, date_day: str) -> str
                 str(object_login_name),
             )
 
-            data = json.loads(response)
+            data = json_loads(response)
             token = data["data"][0]["accessToken"]
             
             #Catching an error that ocurrs when the server doesnt provide the token expiration
@@ -225,22 +511,25 @@ async def token_control(config: Settings, date_slash: str, date_day: str) -> str
                 return token
             # Get the token that already exists
             elif now < expiration_date:
+                cache_token(config, data)
                 return token
 
     elif config.storage.default == "local":
         dir_path = Path(config.storage.config.local.path) / "raw" / "emt" / date_slash / "login"
-        object_login_name = f"login_{date_day}.json"
+        object_login_name = login_name
 
         # Check if file already exists so we have made the call already
-        if not check_local_file_exists(dir_path, object_login_name):
+        if stored_objects is None:
+            login_stored = check_local_file_exists(dir_path, object_login_name)
+        if not login_stored:
             token = await login_emt(config, object_login_name, local_path=dir_path)
             return token
 
         # If it exists, get the token from the json
         else:
-            with open(os.path.join(dir_path, object_login_name), "r") as file:
+            with open_raw(os.path.join(dir_path, object_login_name)) as file:
                 response = file.read()
-                data = json.loads(response)
+                data = json_loads(response)
                 token = data["data"][0]["accessToken"]
                 
                 #Catching an error that ocurrs when the server doesnt provide the token expiration
@@ -261,6 +550,7 @@ async def token_control(config: Settings, date_slash: str, date_day: str) -> str
                     return token
                 # Get the token that already exists
                 elif now < expiration_date:
+                    cache_token(config, data)
                     return token
 
 
@@ -287,76 +577,72 @@ async def get_emt(config: Settings):
         formatted_date_slash = current_datetime.strftime(
             "%Y/%m/%d"
         )  # formatted date year/month/day for storage in Minio
+        # Extension of the raw files, including the one of the compression (if any)
+        compression = config.storage.compression
+        json_ext = raw_object_name(".json", compression)
 
         now = datetime.datetime.now()
 
-        access_token = await token_control(
-            config, formatted_date_slash, formatted_date_day
-        )  # Obtain token from EMT
-
-        # Headers for requests to the EMT API
-        headers = {
-            "accessToken": access_token,
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        }
+        # Failed requests are retried until the budget of the tick is spent
+        async with tick_deadline(EMT_TICK_BUDGET), storage_context(
+            config
+        ), http_session() as session:
+            # Daily objects already stored (listed once per day instead of one check per object)
+            stored_objects = await get_stored_objects(config, formatted_date_slash)
+
+            access_token = await token_control(
+                config, formatted_date_slash, formatted_date_day, stored_objects
+            )  # Obtain token from EMT
+            if access_token:
+                stored_objects.add(f"login_{formatted_date_day}{json_ext}")
+
+            # Headers for requests to the EMT API
+            headers = {
+                "accessToken": access_token,
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+            }
+
+            # Requests to the EMT API go through an adaptive limiter to avoid being throttled
+            limiter = get_emt_limiter(config)
+            # ETA calls slower than the latency target are hedged with a second call
+            hedge_after = config.sources.emt.latency_target
 
-        async with aiohttp.ClientSession() as session:
             # List to store tasks asynchronously
             calendar_tasks = []
             eta_tasks = []
             line_detail_tasks = []
 
+            path_dir_line_detail = (
+                Path(config.storage.config.local.path)
+                / "raw"
+                / "emt"
+                / formatted_date_slash
+                / "line_detail"
+            )
+            path_dir_calendar = (
+                Path(config.storage.config.local.path)
+                / "raw"
+                / "emt"
+                / formatted_date_slash
+                / "calendar"
+            )
+
             # Make request to the line_detail endpoint checking if the request has not been made today
             lines_called = 0
             lines_not_called = []
             for line_id in config.sources.emt.lines:
-                if config.storage.default == "minio":
-                    object_line_detail_name = (
-                        Path("raw")
-                        / "emt"
-                        / formatted_date_slash
-                        / "line_detail"
-                        / f"line_detail_{line_id}_{formatted_date_day}.json"
-                    )
-                    # If the files are not saved, append the task of the line_detail request
-                    if not await check_s3_file_exists(
-                        endpoint_url=config.storage.config.minio.endpoint,
-                        aws_secret_access_key=config.storage.config.minio.secret_key,
-                        aws_access_key_id=config.storage.config.minio.access_key,
-                        bucket_name=config.storage.config.minio.bucket,
-                        object_name=str(object_line_detail_name),
-                    ):
-                        line_detail_task = asyncio.ensure_future(
-                            get_line_detail(session, formatted_date_day, line_id, headers)
-                        )
-                        line_detail_tasks.append(line_detail_task)
-                        lines_not_called.append(line_id)
-
-                    # line already called
-                    else:
-                        lines_called += 1
-
-                elif config.storage.default == "local":
-                    object_line_detail_name = f"line_detail_{line_id}_{formatted_date_day}.json"
-                    path_dir_line_detail = (
-                        Path(config.storage.config.local.path)
-                        / "raw"
-                        / "emt"
-                        / formatted_date_slash
-                        / "line_detail"
+                # If the files are not saved, append the task of the line_detail request
+                if f"line_detail_{line_id}_{formatted_date_day}{json_ext}" not in stored_objects:
+                    line_detail_task = asyncio.ensure_future(
+                        get_line_detail(session, formatted_date_day, line_id, headers, limiter)
                     )
-                    # If the files are not saved, append the task of the line_detail request
-                    if not check_local_file_exists(path_dir_line_detail, object_line_detail_name):
-                        line_detail_task = asyncio.ensure_future(
-                            get_line_detail(session, formatted_date_day, line_id, headers)
-                        )
-                        line_detail_tasks.append(line_detail_task)
-                        lines_not_called.append(line_id)
-
-                    # line already called
-                    else:
-                        lines_called += 1
+                    line_detail_tasks.append(line_detail_task)
+                    lines_not_called.append(line_id)
+
+                # line already called
+                else:
+                    lines_called += 1
 
             logger.debug(f"Already called {lines_called} lines")
 
@@ -367,50 +653,35 @@ async def get_emt(config: Settings):
                     / "emt"
                     / formatted_date_slash
                     / "calendar"
-                    / f"calendar_{formatted_date_day}.json"
+                    / f"calendar_{formatted_date_day}{json_ext}"
                 )
-                # If the file are not saved, append the task of the calendar request
-                if not await check_s3_file_exists(
-                    endpoint_url=config.storage.config.minio.endpoint,
-                    aws_secret_access_key=config.storage.config.minio.secret_key,
-                    aws_access_key_id=config.storage.config.minio.access_key,
-                    bucket_name=config.storage.config.minio.bucket,
-                    object_name=str(object_calendar_name),
-                ):
-                    calendar_task = asyncio.ensure_future(
-                        get_calendar(session, formatted_date_day, formatted_date_day, headers)
-                    )
-                    calendar_tasks.append(calendar_task)
-                else:
-                    logger.debug("Already called Calendar")
-
             if config.storage.default == "local":
-                object_calendar_name = f"calendar_{formatted_date_day}.json"
-                path_dir_calendar = (
-                    Path(config.storage.config.local.path)
-                    / "raw"
-                    / "emt"
-                    / formatted_date_slash
-                    / "calendar"
-                )
-                # If the file are not saved, append the task of the calendar request
-                if not check_local_file_exists(path_dir_calendar, object_calendar_name):
-                    calendar_task = asyncio.ensure_future(
-                        get_calendar(session, formatted_date_day, formatted_date_day, headers)
+                object_calendar_name = f"calendar_{formatted_date_day}{json_ext}"
+
+            # If the file are not saved, append the task of the calendar request
+            if f"calendar_{formatted_date_day}{json_ext}" not in stored_objects:
+                calendar_task = asyncio.ensure_future(
+                    get_calendar(
+                        session, formatted_date_day, formatted_date_day, headers, limiter
                     )
-                    calendar_tasks.append(calendar_task)
-                else:
-                    logger.debug("Already called Calendar")
+                )
+                calendar_tasks.append(calendar_task)
+            else:
+                logger.debug("Already called Calendar")
 
             # Make requests to the eta for each stop
             for stop_id in config.sources.emt.stops:
-                eta_task = asyncio.ensure_future(get_eta(session, stop_id, headers))
+                eta_task = asyncio.ensure_future(
+                    get_eta(session, stop_id, headers, limiter, hedge_after=hedge_after)
+                )
                 eta_tasks.append(eta_task)
 
             # Wait for all tasks to complete
             calendar_response = await asyncio.gather(*calendar_tasks)
             eta_responses = await asyncio.gather(*eta_tasks)
             line_detail_responses = await asyncio.gather(*line_detail_tasks)
+            logger.info(f"EMT limiter: {limiter.stats()}")
+            save_limiter_state(config, limiter)
 
             errors_ld = 0
             errors_eta = 0
@@ -419,7 +690,7 @@ async def get_emt(config: Settings):
                 line_detail_dict_upload = {}
                 for line_id, response in zip(lines_not_called, line_detail_responses):
                     try:
-                        response_json_str = json.dumps(response)
+                        response_json = json_dumps(response)
                         if response["code"] == "00":
                             if config.storage.default == "minio":
                                 object_line_detail_name = (
@@ -427,23 +698,24 @@ async def get_emt(config: Settings):
                                     / "emt"
                                     / formatted_date_slash
                                     / "line_detail"
-                                    / f"line_detail_{line_id}_{formatted_date_day}.json"
+                                    / f"line_detail_{line_id}_{formatted_date_day}{json_ext}"
                                 )
                                 # Add to the dict the good responses
-                                line_detail_dict_upload[
-                                    object_line_detail_name
-                                ] = response_json_str
+                                line_detail_dict_upload[object_line_detail_name] = encode_raw(
+                                    response_json, compression
+                                )
 
                             if config.storage.default == "local":
                                 object_line_detail_name = (
-                                    f"line_detail_{line_id}_{formatted_date_day}.json"
+                                    f"line_detail_{line_id}_{formatted_date_day}{json_ext}"
                                 )
                                 os.makedirs(path_dir_line_detail, exist_ok=True)
                                 with open(
                                     os.path.join(path_dir_line_detail, object_line_detail_name),
-                                    "w",
+                                    "wb",
                                 ) as file:
-                                    file.write(response_json_str)
+                                    file.write(encode_raw(response_json, compression))
+                                stored_objects.add(object_line_detail_name)
                         else:
                             errors_ld += 1
                             logger.error(f"Error code {response['code']} in line {line_id} in line_detail")
@@ -459,15 +731,18 @@ async def get_emt(config: Settings):
                         config.storage.config.minio.secret_key,
                         line_detail_dict_upload,
                     )
+                    stored_objects.update(key.name for key in line_detail_dict_upload)
 
             # Store the calendar response if present
             if calendar_response:
                 calendar_dict_upload = {}
                 try:
-                    calendar_json_str = json.dumps(calendar_response)
+                    calendar_json = json_dumps(calendar_response)
                     if calendar_response[0]["code"] == "00":
                         if config.storage.default == "minio":
-                            calendar_dict_upload[str(object_calendar_name)] = calendar_json_str
+                            calendar_dict_upload[str(object_calendar_name)] = encode_raw(
+                                calendar_json, compression
+                            )
 
                             # Upload to s3 asynchronously
                             await upload_objs(
@@ -480,9 +755,10 @@ async def get_emt(config: Settings):
                         if config.storage.default == "local":
                             os.makedirs(path_dir_calendar, exist_ok=True)
                             with open(
-                                os.path.join(path_dir_calendar, object_calendar_name), "w"
+                                os.path.join(path_dir_calendar, object_calendar_name), "wb"
                             ) as file:
-                                file.write(calendar_json_str)
+                                file.write(encode_raw(calendar_json, compression))
+                        stored_objects.add(f"calendar_{formatted_date_day}{json_ext}")
                     else:
                         logger.error(f"Error code {response['code']} in calendar")
                 except Exception as e:
@@ -492,32 +768,37 @@ async def get_emt(config: Settings):
             # Store the bus stop responses in MinIO
             list_stops_error = []
             eta_dict_upload = {}
+            path_dir_eta = (
+                Path(config.storage.config.local.path) / "raw" / "emt" / formatted_date_slash / "eta"
+            )
+            # With the bundle layout every stop of the tick is written in a single object
+            bundle = config.sources.emt.eta_layout == "bundle"
+            bundle_lines = []
             for stop_id, response in zip(config.sources.emt.stops, eta_responses):
                 try:
-                    response_json_str = json.dumps(response)
+                    response_json = json_dumps(response)
                     if response["code"] == "00":
+                        if bundle:
+                            bundle_lines.append(response_json)
+                            continue
+
                         if config.storage.default == "minio":
                             object_eta_name = (
                                 Path("raw")
                                 / "emt"
                                 / formatted_date_slash
                                 / "eta"
-                                / f"eta_{stop_id}_{formatted_date}.json"
+                                / f"eta_{stop_id}_{formatted_date}{json_ext}"
+                            )
+                            eta_dict_upload[object_eta_name] = encode_raw(
+                                response_json, compression
                             )
-                            eta_dict_upload[object_eta_name] = response_json_str
 
                         if config.storage.default == "local":
-                            object_eta_name = f"eta_{stop_id}_{formatted_date}.json"
-                            path_dir_eta = (
-                                Path(config.storage.config.local.path)
-                                / "raw"
-                                / "emt"
-                                / formatted_date_slash
-                                / "eta"
-                            )
+                            object_eta_name = f"eta_{stop_id}_{formatted_date}{json_ext}"
                             os.makedirs(path_dir_eta, exist_ok=True)
-                            with open(os.path.join(path_dir_eta, object_eta_name), "w") as file:
-                                file.write(response_json_str)
+                            with open(os.path.join(path_dir_eta, object_eta_name), "wb") as file:
+                                file.write(encode_raw(response_json, compression))
 
                     else:  # 200 CODE BUT ERROR IN RESPONSE JSON
                         errors_eta += 1
@@ -530,6 +811,22 @@ async def get_emt(config: Settings):
                     logger.error(e)
                     logger.error(traceback.format_exc())
 
+            if bundle_lines:
+                bundle_compression = config.sources.emt.eta_bundle_compression or compression
+                object_eta_name = raw_object_name(
+                    f"eta_{formatted_date}{ETA_BUNDLE_EXTENSION}", bundle_compression
+                )
+                # one response per line (newline-delimited json)
+                bundle_content = encode_raw(b"\n".join(bundle_lines), bundle_compression)
+                if config.storage.default == "minio":
+                    eta_dict_upload[
+                        Path("raw") / "emt" / formatted_date_slash / "eta" / object_eta_name
+                    ] = bundle_content
+                if config.storage.default == "local":
+                    os.makedirs(path_dir_eta, exist_ok=True)
+                    with open(os.path.join(path_dir_eta, object_eta_name), "wb") as file:
+                        file.write(bundle_content)
+
             # Upload the dict to s3 asynchronously if dict contains something (This means minio flag in convig was enabled)
             if eta_dict_upload:
                 #List of str names of objects uploaded into s3
@@ -544,7 +841,7 @@ async def get_emt(config: Settings):
                     eta_dict_upload,
                 )
                 
-                upload_metadata(
+                await upload_metadata(
                     config.storage.config.minio.bucket,
                     config.storage.config.minio.endpoint,
                     config.storage.config.minio.access_key,
@@ -554,87 +851,9 @@ async def get_emt(config: Settings):
 
 
             logger.error(f"{errors_ld} errors in Line Detail")
-            logger.error(f"{errors_eta} errors in ETA, list of stops erroring: {list_stops_error}")
-            eta_dict_upload = {}
-
-            # Retry the failed petitions
-            if errors_eta > 0:
-                list_stops_error_retry = []
-                eta_tasks2 = []
-                errors_eta_retry = 0
-                # Make requests that failed to the eta for each stop
-                for stop_id in list_stops_error:
-                    eta_task = asyncio.ensure_future(get_eta(session, stop_id, headers))
-                    eta_tasks2.append(eta_task)
-
-                eta_responses2 = await asyncio.gather(*eta_tasks2)
-                for stop_id, response in zip(list_stops_error, eta_responses2):
-                    try:
-                        response_json_str = json.dumps(response)
-                        if response == -1:
-                            errors_eta_retry += 1
-                            list_stops_error_retry.append(stop_id)
-                            continue
-
-                        if response["code"] == "00":
-                            if config.storage.default == "minio":
-                                object_eta_name = (
-                                    Path("raw")
-                                    / "emt"
-                                    / formatted_date_slash
-                                    / "eta"
-                                    / f"eta_{stop_id}_{formatted_date}.json"
-                                )
-                                eta_dict_upload[object_eta_name] = response_json_str
-
-                            if config.storage.default == "local":
-                                object_eta_name = f"eta_{stop_id}_{formatted_date}.json"
-                                path_dir_eta = (
-                                    Path(config.storage.config.local.path)
-                                    / "raw"
-                                    / "emt"
-                                    / formatted_date_slash
-                                    / "eta"
-                                )
-                                os.makedirs(path_dir_eta, exist_ok=True)
-                                with open(
-                                    os.path.join(path_dir_eta, object_eta_name), "w"
-                                ) as file:
-                                    file.write(response_json_str)
-
-                        else:
-                            errors_eta_retry += 1
-                            list_stops_error_retry.append(stop_id)
-                            logger.error(f"Error code {response['code']} in stop {stop_id} in ETA after retrying")
-                    except Exception as e:
-                        errors_eta_retry += 1
-                        list_stops_error_retry.append(stop_id)
-                        logger.error(e)
-                        logger.error(traceback.format_exc())
-                logger.error(
-                    f"{errors_eta_retry} errors in ETA after retrying, "
-                    + f"list of stops erroring after retrying:, {list_stops_error_retry}"
-                )
-
-            # Upload the dict to s3 asynchronously if dict contains something (This means minio flag in convig was enabled)
-            if eta_dict_upload:
-                #List of str names of objects uploaded into s3
-                list_keys_str = [str(key.parent) + '/' + str(key.name) for key in eta_dict_upload]
-                logger.debug(f"Uploading {len(list_keys_str)} files")
-                await upload_objs(
-                    config.storage.config.minio.bucket,
-                    config.storage.config.minio.endpoint,
-                    config.storage.config.minio.access_key,
-                    config.storage.config.minio.secret_key,
-                    eta_dict_upload,
-                )
-                upload_metadata(
-                    config.storage.config.minio.bucket,
-                    config.storage.config.minio.endpoint,
-                    config.storage.config.minio.access_key,
-                    config.storage.config.minio.secret_key,
-                    list_keys_str
-                )
+            logger.error(
+                f"{errors_eta} errors in ETA after retrying, list of stops erroring: {list_stops_error}"
+            )
 
             end = datetime.datetime.now()
             logger.debug(f"Time duration of EMT extraction {end - now}")
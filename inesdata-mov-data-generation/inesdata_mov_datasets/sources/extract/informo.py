@@ -5,13 +5,42 @@ import traceback
 from pathlib import Path
 import pytz
 
-import requests
+import aiohttp
 import xmltodict
 from loguru import logger
 
+from inesdata_mov_datasets.handlers.codec import json_dumps
 from inesdata_mov_datasets.handlers.logger import instantiate_logger
+from inesdata_mov_datasets.handlers.retry import call_with_retry
 from inesdata_mov_datasets.settings import Settings
-from inesdata_mov_datasets.utils import check_local_file_exists, check_s3_file_exists, upload_objs
+from inesdata_mov_datasets.utils import (
+    check_local_file_exists,
+    check_s3_file_exists,
+    encode_raw,
+    http_session,
+    raw_object_name,
+    storage_context,
+    upload_objs,
+)
+
+
+INFORMO_URL = "https://informo.madrid.es/informo/tmadrid/pm.xml"
+
+
+async def request_informo(session: aiohttp.ClientSession) -> dict:
+    """Request informo API to get the current traffic of Madrid.
+
+    Args:
+        session (aiohttp.ClientSession): Call session to make faster the calls to the same API.
+
+    Returns:
+        dict: Traffic data parsed from the XML response.
+    """
+    async with session.get(INFORMO_URL) as response:
+        response.raise_for_status()
+        content = await response.read()
+    # Parse XML
+    return xmltodict.parse(content)
 
 
 async def get_informo(config: Settings):
@@ -25,13 +54,11 @@ async def get_informo(config: Settings):
         instantiate_logger(config, "INFORMO", "extract")
         logger.info("Extracting INFORMO")
         now = datetime.datetime.now()
-        url_informo = "https://informo.madrid.es/informo/tmadrid/pm.xml"
+        async with http_session() as session:
+            xml_dict = await call_with_retry(lambda: request_informo(session), "INFORMO")
 
-        r = requests.get(url_informo)
-        # Parse XML
-        xml_dict = xmltodict.parse(r.content)
-
-        await save_informo(config, xml_dict)
+        async with storage_context(config):
+            await save_informo(config, xml_dict)
 
         end = datetime.datetime.now()
         logger.debug(f"Time duration of INFORMO extraction {end - now}")
@@ -63,12 +90,12 @@ async def save_informo(config: Settings, data: json):
     formatted_date_slash = current_datetime.strftime(
         "%Y/%m/%d"
     )  # formatted date year/month/day for storage in Minio
+    compression = config.storage.compression
+    file_name = raw_object_name(f"informo_{formated_date}.json", compression)
 
     if config.storage.default == "minio":
         # Define the object name
-        object_name = (
-            Path("raw") / "informo" / formatted_date_slash / f"informo_{formated_date}.json"
-        )
+        object_name = Path("raw") / "informo" / formatted_date_slash / file_name
         # Check if the Minio object exists
         if not await check_s3_file_exists(
             endpoint_url=config.storage.config.minio.endpoint,
@@ -77,11 +104,11 @@ async def save_informo(config: Settings, data: json):
             bucket_name=config.storage.config.minio.bucket,
             object_name=str(object_name),
         ):
-            # Convert data to JSON string
-            response_json_str = json.dumps(data)
+            # Convert data to JSON
+            response_json = json_dumps(data)
 
             informo_dict_upload = {}
-            informo_dict_upload[str(object_name)] = response_json_str
+            informo_dict_upload[str(object_name)] = encode_raw(response_json, compression)
             await upload_objs(
                 config.storage.config.minio.bucket,
                 config.storage.config.minio.endpoint,
@@ -93,20 +120,20 @@ async def save_informo(config: Settings, data: json):
             logger.debug("Already called INFORMO in the past 5 minutes")
 
     if config.storage.default == "local":
-        object_name = f"informo_{formated_date}.json"
+        object_name = file_name
         path_save_informo = (
             Path(config.storage.config.local.path) / "raw" / "informo" / formatted_date_slash
         )
         # Check if the file exists
         if not check_local_file_exists(path_save_informo, object_name):
-            # Convert data to JSON string
-            response_json_str = json.dumps(data)
+            # Convert data to JSON
+            response_json = json_dumps(data)
 
             # Create directories if they don't exist
             path_save_informo.mkdir(parents=True, exist_ok=True)
 
             # Write JSON data to file
-            with open(path_save_informo / object_name, "w") as file:
-                file.write(response_json_str)
+            with open(path_save_informo / object_name, "wb") as file:
+                file.write(encode_raw(response_json, compression))
         else:
             logger.debug("Already called INFORMO in the past 5 minutes")
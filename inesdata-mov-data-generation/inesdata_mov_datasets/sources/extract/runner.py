@@ -0,0 +1,133 @@
+import asyncio
+import datetime
+import random
+import signal
+import time
+
+from loguru import logger
+
+from inesdata_mov_datasets.handlers.retry import tick_deadline
+from inesdata_mov_datasets.settings import Settings
+from inesdata_mov_datasets.sources.extract.aemet import get_aemet
+from inesdata_mov_datasets.sources.extract.emt import get_emt
+from inesdata_mov_datasets.sources.extract.informo import get_informo
+from inesdata_mov_datasets.utils import shared_http_session, storage_context
+
+EXTRACTORS = {"emt": get_emt, "aemet": get_aemet, "informo": get_informo}
+
+# Seconds between ticks of each source in daemon mode. EMT calendar and line_detail are
+# requested in the EMT tick only while they are missing for the day (see get_stored_objects).
+DAEMON_INTERVALS = {"emt": 60, "informo": 5 * 60, "aemet": 24 * 60 * 60}
+DEFAULT_JITTER = 5.0
+
+
+async def extract_source(config: Settings, source: str):
+    """Extract the raw data of a source, tagging its logs with the source name.
+
+    Args:
+        config (Settings): Object with the config file.
+        source (str): source name (emt, aemet, informo)
+    """
+    # the log handler is shared by the sources running concurrently
+    with logger.contextualize(source=source.upper()):
+        await EXTRACTORS[source](config)
+
+
+async def extract_sources(config: Settings, sources: list):
+    """Extract the raw data of several sources concurrently.
+
+    Every source runs on the same event loop and shares one HTTP session and one storage
+    client, so the extraction takes as long as the slowest source instead of the sum of all.
+
+    Args:
+        config (Settings): Object with the config file.
+        sources (list): source names (emt, aemet, informo)
+    """
+    now = datetime.datetime.now()
+    async with storage_context(config), shared_http_session():
+        results = await asyncio.gather(
+            *[extract_source(config, source) for source in sources], return_exceptions=True
+        )
+    for source, result in zip(sources, results):
+        if isinstance(result, Exception):
+            with logger.contextualize(source=source.upper()):
+                logger.error(f"Error extracting {source}: {result}")
+    end = datetime.datetime.now()
+    with logger.contextualize(source="ALL"):
+        logger.debug(f"Time duration of concurrent extraction {end - now}")
+
+
+async def run_periodically(
+    config: Settings,
+    source: str,
+    interval: float,
+    stop: asyncio.Event,
+    jitter: float = DEFAULT_JITTER,
+):
+    """Extract a source on every tick of a fixed schedule until stopped.
+
+    Ticks are aligned to multiples of the interval (e.g. the start of each minute) and delayed
+    a random jitter. If a tick is missed (a slow extraction or the host was suspended), the
+    most recent missed tick runs right away and the older ones are skipped. The retries of the
+    requests of a tick stop when the next tick is due.
+
+    Args:
+        config (Settings): Object with the config file.
+        source (str): source name (emt, aemet, informo)
+        interval (float): seconds between ticks
+        stop (asyncio.Event): event set to stop the schedule
+        jitter (float): max seconds of random delay added to each tick
+    """
+    next_run = time.time()  # first tick as soon as the daemon starts
+    tick = int(next_run // interval)  # index of the tick on the schedule
+    while not stop.is_set():
+        delay = max(next_run - time.time(), 0) + random.uniform(0, jitter)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=delay)
+            break
+        except asyncio.TimeoutError:
+            pass
+
+        try:
+            async with tick_deadline(max((tick + 1) * interval - time.time(), 0)):
+                await extract_source(config, source)
+        except Exception as e:
+            with logger.contextualize(source=source.upper()):
+                logger.error(f"Error extracting {source}: {e}")
+
+        tick += 1
+        current_tick = int(time.time() // interval)
+        if current_tick > tick:
+            with logger.contextualize(source=source.upper()):
+                logger.warning(
+                    f"Skipped {current_tick - tick} ticks of {source}, catching up with the last one"
+                )
+            tick = current_tick
+        next_run = tick * interval
+
+
+async def run_daemon(config: Settings, sources: list, jitter: float = DEFAULT_JITTER):
+    """Extract the sources on their schedule until SIGINT or SIGTERM is received.
+
+    The HTTP session, storage client and EMT daily objects are kept between ticks.
+
+    Args:
+        config (Settings): Object with the config file.
+        sources (list): source names (emt, aemet, informo)
+        jitter (float): max seconds of random delay added to each tick
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # not available on this platform or thread
+
+    async with storage_context(config), shared_http_session():
+        await asyncio.gather(
+            *[
+                run_periodically(config, source, DAEMON_INTERVALS[source], stop, jitter)
+                for source in sources
+            ]
+        )
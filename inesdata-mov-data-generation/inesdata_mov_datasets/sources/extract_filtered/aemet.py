@@ -2,10 +2,12 @@
 
 import traceback
 
-import requests
 from loguru import logger
 
+from inesdata_mov_datasets.handlers.retry import call_with_retry
 from inesdata_mov_datasets.settings import Settings
+from inesdata_mov_datasets.sources.extract.aemet import request_aemet
+from inesdata_mov_datasets.utils import http_session
 
 
 async def get_filter_aemet(config: Settings):
@@ -15,18 +17,10 @@ async def get_filter_aemet(config: Settings):
         config (Settings): Object with the config file.
     """
     try:
-        url_madrid = (
-            "https://opendata.aemet.es/opendata/api/prediccion/especifica/municipio/horaria/28079"
-        )
-
-        headers = {
-            "api_key": config.sources.aemet.credentials.api_key,
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        }
-
-        r = requests.get(url_madrid, headers=headers)
-        r_json = requests.get(r.json()["datos"]).json()
+        async with http_session() as session:
+            r_json = await call_with_retry(
+                lambda: request_aemet(session, config.sources.aemet.credentials.api_key), "AEMET"
+            )
 
         logger.info("Extracted AEMET")
 
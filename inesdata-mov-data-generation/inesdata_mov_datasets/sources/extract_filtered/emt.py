@@ -9,6 +9,7 @@ import aiohttp
 import pytz
 from loguru import logger
 
+from inesdata_mov_datasets.handlers.codec import json_loads
 from inesdata_mov_datasets.settings import Settings
 from inesdata_mov_datasets.sources.extract.emt import (
     get_calendar,
@@ -40,7 +41,7 @@ async def get_eta(session: aiohttp, stop_id: str, line_id: str, headers: json) -
 
     async with session.post(eta_url, headers=headers, json=body) as response:
         try:
-            return await response.json()
+            return await response.json(loads=json_loads)
         except Exception as e:
             logger.error(f"Error in ETA call stop {stop_id} to the server")
             logger.error(e)
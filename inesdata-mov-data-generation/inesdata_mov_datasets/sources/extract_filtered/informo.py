@@ -2,11 +2,12 @@
 
 import traceback
 
-import requests
-import xmltodict
 from loguru import logger
 
+from inesdata_mov_datasets.handlers.retry import call_with_retry
 from inesdata_mov_datasets.settings import Settings
+from inesdata_mov_datasets.sources.extract.informo import request_informo
+from inesdata_mov_datasets.utils import http_session
 
 
 async def get_filter_informo(config: Settings):
@@ -16,12 +17,8 @@ async def get_filter_informo(config: Settings):
         config (Settings): Object with the config file.
     """
     try:
-        url_informo = "https://informo.madrid.es/informo/tmadrid/pm.xml"
-
-        r = requests.get(url_informo)
-
-        # Parse XML
-        xml_dict = xmltodict.parse(r.content)
+        async with http_session() as session:
+            xml_dict = await call_with_retry(lambda: request_informo(session), "INFORMO")
         # await save_informo(config, xml_dict)
 
         logger.info("Extracted INFORMO")
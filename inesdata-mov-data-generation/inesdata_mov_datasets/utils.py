@@ -1,45 +1,477 @@
 """File with utils functions."""
 import asyncio
+import datetime
+import gzip
 import os
+import time
+import uuid
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
 from pathlib import Path
-import botocore
-from botocore.client import Config as BotoConfig
-import aiofiles.os
+from typing import AsyncIterator, BinaryIO, Callable, List, Optional, Union
+from urllib.parse import urlparse
+
+import aiohttp
+import botocore.exceptions
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import yaml
+from aiobotocore.config import AioConfig
 from aiobotocore.session import ClientCreatorContext, get_session
 from loguru import logger
 
+from inesdata_mov_datasets.handlers.retry import call_with_retry
 from inesdata_mov_datasets.settings import Settings
 
-def list_objs(bucket: str, prefix: str, endpoint_url: str, aws_secret_access_key: str, aws_access_key_id: str) -> list:
-    """List objects from s3 bucket.
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+DEFAULT_MAX_IN_FLIGHT = 1000
+# Directory with the manifest shards listing the ETA objects of a day (see upload_metadata)
+METADATA_DIR = "metadata"
+# Extension of the objects bundling every ETA response of a tick (one json per line)
+ETA_BUNDLE_EXTENSION = ".ndjson"
+# Extension added to the name of the raw objects by compression
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+# Extension of the processed datasets by output format
+OUTPUT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+# Rows per Parquet row group: small enough to skip row groups by their datetime statistics
+PARQUET_ROW_GROUP_SIZE = 100_000
+# Objects downloaded in parallel by create (see download_keys)
+DEFAULT_MAX_DOWNLOADS = 50
+# Downloaded objects between progress logs
+DOWNLOAD_PROGRESS_EVERY = 10_000
+# Bytes read at a time from the body of a downloaded object (most raw files fit in one chunk)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Max seconds for a whole HTTP request to the sources (connection + response body)
+DEFAULT_HTTP_TIMEOUT = aiohttp.ClientTimeout(total=60, connect=10)
+
+# Storage client opened by the running extract/create job (if any)
+_active_storage_client: ContextVar[Optional["StorageClient"]] = ContextVar(
+    "active_storage_client", default=None
+)
+# HTTP session opened by the running extract job (if any)
+_active_http_session: ContextVar[Optional[aiohttp.ClientSession]] = ContextVar(
+    "active_http_session", default=None
+)
+
+
+class StorageClient:
+    """Long-lived s3 client with a connection pool shared by the storage helpers.
+
+    While the context is open, every helper of this module targeting the same endpoint reuses
+    its connections instead of opening a new session (and TLS handshake) per call.
+
+    Example:
+        async with StorageClient.from_settings(config):
+            await upload_objs(...)
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        aws_access_key_id: str,
+        aws_secret_access_key: str,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+        use_ssl: Optional[bool] = None,
+    ):
+        """Init the client parameters. The connection is opened when entering the context.
+
+        Args:
+            endpoint_url (str): Url of minio bucket.
+            aws_access_key_id (str): Minio user.
+            aws_secret_access_key (str): Minio password.
+            max_pool_connections (int): Max number of connections kept in the pool.
+            use_ssl (Optional[bool]): Connect with TLS. If None, only for https endpoints.
+        """
+        self.endpoint_url = endpoint_url
+        self.aws_access_key_id = aws_access_key_id
+        self.aws_secret_access_key = aws_secret_access_key
+        self.max_pool_connections = max_pool_connections
+        if use_ssl is None:
+            use_ssl = urlparse(endpoint_url).scheme == "https"
+        self.use_ssl = use_ssl
+        self.client = None
+        self._client_context = None
+        self._token = None
+
+    @classmethod
+    def from_settings(cls, config: Settings) -> "StorageClient":
+        """Build the client from the minio storage settings.
+
+        Args:
+            config (Settings): Object with the config file.
+
+        Returns:
+            StorageClient: Client (not opened yet).
+        """
+        minio = config.storage.config.minio
+        return cls(
+            endpoint_url=minio.endpoint,
+            aws_access_key_id=minio.access_key,
+            aws_secret_access_key=minio.secret_key,
+            max_pool_connections=minio.max_pool_connections,
+            use_ssl=minio.secure,
+        )
+
+    async def __aenter__(self) -> "StorageClient":
+        """Open the s3 client and make it the active one of the current context.
+
+        Returns:
+            StorageClient: The client itself, with its s3 client opened.
+        """
+        session = get_session()
+        self._client_context = session.create_client(
+            "s3",
+            endpoint_url=self.endpoint_url,
+            aws_secret_access_key=self.aws_secret_access_key,
+            aws_access_key_id=self.aws_access_key_id,
+            use_ssl=self.use_ssl,
+            config=AioConfig(max_pool_connections=self.max_pool_connections),
+        )
+        self.client = await self._client_context.__aenter__()
+        self._token = _active_storage_client.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """Close the s3 client and restore the previously active one.
+
+        Args:
+            exc_type (Optional[type]): Type of the exception raised inside the context, if any.
+            exc (Optional[BaseException]): Exception raised inside the context, if any.
+            tb (Optional[TracebackType]): Traceback of the exception, if any.
+        """
+        _active_storage_client.reset(self._token)
+        await self._client_context.__aexit__(exc_type, exc, tb)
+        self.client = None
+
+
+@asynccontextmanager
+async def storage_client(
+    endpoint_url: str,
+    aws_access_key_id: str,
+    aws_secret_access_key: str,
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+):
+    """Get a s3 client, reusing the active StorageClient if it targets the same endpoint.
 
     Args:
-        bucket (str): Name of the bucket.
-        prefix (str): Prefix to list.
-        endpoint_url (str): url of minio bucket
-        aws_access_key_id (str): minio user
-        aws_secret_access_key (str): minio password
+        endpoint_url (str): Url of minio bucket.
+        aws_access_key_id (str): Minio user.
+        aws_secret_access_key (str): Minio password.
+        max_pool_connections (int): Max number of connections of the client, if a new one
+            is opened.
+
+    Yields:
+        AioBaseClient: Client with s3 connection.
+    """
+    active = _active_storage_client.get()
+    if (
+        active is not None
+        and active.client is not None
+        and active.endpoint_url == endpoint_url
+        and active.aws_access_key_id == aws_access_key_id
+    ):
+        yield active.client
+    else:
+        async with StorageClient(
+            endpoint_url, aws_access_key_id, aws_secret_access_key, max_pool_connections
+        ) as new_client:
+            yield new_client.client
+
+
+@asynccontextmanager
+async def shared_http_session() -> AsyncIterator[aiohttp.ClientSession]:
+    """Open a HTTP session reused by every http_session() call inside the context.
+
+    Yields:
+        aiohttp.ClientSession: Session with a pool of keep-alive connections.
+    """
+    async with aiohttp.ClientSession(timeout=DEFAULT_HTTP_TIMEOUT) as session:
+        token = _active_http_session.set(session)
+        try:
+            yield session
+        finally:
+            _active_http_session.reset(token)
+
+
+@asynccontextmanager
+async def http_session() -> AsyncIterator[aiohttp.ClientSession]:
+    """Get a HTTP session, reusing the one opened by shared_http_session if any.
+
+    Yields:
+        aiohttp.ClientSession: Session to make the requests.
+    """
+    active = _active_http_session.get()
+    if active is not None and not active.closed:
+        yield active
+    else:
+        async with aiohttp.ClientSession(timeout=DEFAULT_HTTP_TIMEOUT) as session:
+            yield session
+
+
+def compress(data: bytes, compression: Optional[str]) -> bytes:
+    """Compress the content of a raw object.
+
+    Args:
+        data (bytes): Content of the object.
+        compression (Optional[str]): Compression (see COMPRESSION_EXTENSIONS), None to keep it as is.
 
     Returns:
-        list: List of the objects listed.
+        bytes: Compressed content.
     """
-    
-    session = botocore.session.get_session()
-    client = session.create_client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_secret_access_key=aws_secret_access_key,
-        aws_access_key_id=aws_access_key_id,
+    if compression is None:
+        return data
+    if compression == "gzip":
+        return gzip.compress(data)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor().compress(data)
+    raise ValueError(f"Unknown compression {compression}")
+
+
+def decompress(data: bytes, name: str) -> bytes:
+    """Decompress the content of a raw object according to the extension of its name.
+
+    Args:
+        data (bytes): Content of the object.
+        name (str): Name of the object.
+
+    Returns:
+        bytes: Decompressed content, the same content if the name has no compression extension.
+    """
+    if str(name).endswith(COMPRESSION_EXTENSIONS["gzip"]):
+        return gzip.decompress(data)
+    if str(name).endswith(COMPRESSION_EXTENSIONS["zstd"]):
+        # streaming so objects written without the content size in the frame can be read
+        return _zstandard().ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def raw_object_name(name: str, compression: Optional[str]) -> str:
+    """Add the extension of the compression to the name of a raw object.
+
+    Args:
+        name (str): Name of the object (e.g. aemet_20240101.json).
+        compression (Optional[str]): Compression of the raw storage, None if not compressed.
+
+    Returns:
+        str: Name of the stored object.
+    """
+    return name + COMPRESSION_EXTENSIONS[compression] if compression else name
+
+
+def encode_raw(content: Union[str, bytes], compression: Optional[str]) -> bytes:
+    """Encode the text of a raw object to store it with the configured compression.
+
+    Args:
+        content (Union[str, bytes]): Content of the object (e.g. a json response).
+        compression (Optional[str]): Compression of the raw storage, None if not compressed.
+
+    Returns:
+        bytes: Content to store.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return compress(content, compression)
+
+
+def open_raw(path: Union[str, Path]) -> BinaryIO:
+    """Open a local raw file, decompressing it while it is read if its name says it's compressed.
+
+    Args:
+        path (Union[str, Path]): Path of the file.
+
+    Returns:
+        BinaryIO: Binary file object with the decompressed content.
+    """
+    if str(path).endswith(COMPRESSION_EXTENSIONS["gzip"]):
+        return gzip.open(path, "rb")
+    if str(path).endswith(COMPRESSION_EXTENSIONS["zstd"]):
+        return _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "zstd compression needs the zstandard package: pip install zstandard"
+        ) from e
+    return zstandard
+
+
+class ColumnAccumulator:
+    """Gather the records of many raw files into columns to build a single DataFrame.
+
+    Building one DataFrame per file and concatenating them at the end is dominated by the
+    per-frame overhead when a day has thousands of small files; lists are cheap to extend.
+    Columns missing in some records are filled with None.
+    """
+
+    def __init__(self):
+        """Init an empty accumulator."""
+        self.columns = {}
+        self.length = 0
+
+    def add(self, records: list, columns: dict = None, exclude: tuple = ()):
+        """Add the records of a file.
+
+        Args:
+            records (list): Rows of the file as dicts.
+            columns (dict): Extra columns for these rows: a list with a value per row or a
+                single value shared by all of them.
+            exclude (tuple): Keys of the records to ignore.
+        """
+        n_records = len(records)
+        if n_records == 0:
+            return
+        extra_columns = columns or {}
+        keys = {}
+        for record in records:
+            keys.update(dict.fromkeys(record.keys()))
+        for key in [*keys, *extra_columns]:
+            if key not in exclude and key not in self.columns:
+                self.columns[key] = [None] * self.length
+
+        for key, column in self.columns.items():
+            if key in extra_columns:
+                values = extra_columns[key]
+                if isinstance(values, list):
+                    column.extend(values)
+                else:
+                    column.extend([values] * n_records)
+            elif key in keys:
+                column.extend([record.get(key) for record in records])
+            else:
+                column.extend([None] * n_records)
+        self.length += n_records
+
+    def add_columns(self, n_records: int, columns: dict):
+        """Add the records of a file already split in columns.
+
+        Args:
+            n_records (int): Number of records of the file.
+            columns (dict): Columns of the records: a list with a value per row or a single
+                value shared by all of them.
+        """
+        if n_records == 0:
+            return
+        for key in columns:
+            if key not in self.columns:
+                self.columns[key] = [None] * self.length
+        for key, column in self.columns.items():
+            values = columns.get(key)
+            if isinstance(values, list):
+                column.extend(values)
+            else:
+                column.extend([values] * n_records)
+        self.length += n_records
+
+    def to_frame(self) -> pd.DataFrame:
+        """Build the DataFrame with all the records added.
+
+        Returns:
+            pd.DataFrame: DataFrame with a row per record.
+        """
+        return pd.DataFrame(self.columns)
+
+
+def write_processed_df(
+    df: pd.DataFrame,
+    path: Union[str, Path],
+    output_format: str = "csv",
+    dictionary_columns: tuple = (),
+    sort_by: str = "datetime",
+    append: bool = False,
+) -> Path:
+    """Export a processed dataset as CSV or Parquet.
+
+    Parquet files keep the dtypes of the columns, store dictionary_columns as dictionary-encoded
+    categories and are written in row groups sorted by sort_by. Rows appended to an existing
+    Parquet dataset go to a new part file next to it (see parquet_parts).
+
+    Args:
+        df (pd.DataFrame): Processed dataset.
+        path (Union[str, Path]): Path of the file without extension.
+        output_format (str): csv or parquet.
+        dictionary_columns (tuple): Low-cardinality columns to dictionary-encode in Parquet.
+        sort_by (str): Column ordering the Parquet row groups.
+        append (bool): Add the rows to the existing dataset instead of replacing it.
+
+    Returns:
+        Path: Path of the written file.
+    """
+    output_path = Path(f"{path}{OUTPUT_EXTENSIONS.get(output_format, '.csv')}")
+    if output_format != "parquet":
+        if append and output_path.is_file():
+            df.to_csv(output_path, index=None, mode="a", header=False)
+        else:
+            df.to_csv(output_path, index=None)
+        return output_path
+
+    parts = parquet_parts(path)
+    if append and parts:
+        output_path = Path(f"{path}-{len(parts)}.parquet")
+    else:
+        for part in parts[1:]:
+            part.unlink()
+
+    sorting_columns = None
+    if sort_by in df.columns:
+        if not df[sort_by].is_monotonic_increasing:
+            df = df.sort_values(by=sort_by, kind="stable")
+        sorting_columns = [pq.SortingColumn(df.columns.get_loc(sort_by))]
+    df = df.astype({column: "category" for column in dictionary_columns if column in df.columns})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(
+        table,
+        output_path,
+        row_group_size=PARQUET_ROW_GROUP_SIZE,
+        sorting_columns=sorting_columns,
     )
+    return output_path
 
-    paginator = client.get_paginator("list_objects_v2")
-    keys = []
-    for result in paginator.paginate(Bucket=bucket, Prefix=prefix):
-        for c in result.get("Contents", []):
-            keys.append(c.get("Key"))
 
-    return keys
+def parquet_parts(path: Union[str, Path]) -> List[Path]:
+    """Get the files of a Parquet dataset: the first one and the parts appended to it.
+
+    Args:
+        path (Union[str, Path]): Path of the dataset without extension.
+
+    Returns:
+        List[Path]: Existing files, in the order they were written.
+    """
+    parts = []
+    part = Path(f"{path}.parquet")
+    while part.is_file():
+        parts.append(part)
+        part = Path(f"{path}-{len(parts)}.parquet")
+    return parts
+
+
+def storage_context(config: Settings):
+    """Get the shared storage client context of the configured storage.
+
+    Args:
+        config (Settings): Object with the config file.
+
+    Returns:
+        StorageClient if the default storage is minio, a no-op context otherwise.
+    """
+    if config.storage.default == "minio":
+        minio = config.storage.config.minio
+        active = _active_storage_client.get()
+        if (
+            active is not None
+            and active.client is not None
+            and active.endpoint_url == minio.endpoint
+            and active.aws_access_key_id == minio.access_key
+        ):
+            # already opened by an outer context (e.g. concurrent extraction)
+            return nullcontext(active)
+        return StorageClient.from_settings(config)
+    return nullcontext()
+
 
 def async_download(
     bucket: str,
@@ -48,6 +480,8 @@ def async_download(
     endpoint_url: str,
     aws_access_key_id: str,
     aws_secret_access_key: str,
+    select: Optional[Callable[[str], bool]] = None,
+    max_downloads: int = DEFAULT_MAX_DOWNLOADS,
 ):
     """Download from minIO a day's raw data of an EMT's endpoint.
 
@@ -58,16 +492,25 @@ def async_download(
         endpoint_url (str): url of minio bucket
         aws_access_key_id (str): minio user
         aws_secret_access_key (str): minio password
+        select (Optional[Callable[[str], bool]]): keys to download, all of them if None
+        max_downloads (int): number of objects downloaded in parallel
     """
     loop = asyncio.new_event_loop()
     loop.run_until_complete(
         download_objs(
-            bucket, prefix, output_path, endpoint_url, aws_access_key_id, aws_secret_access_key
+            bucket,
+            prefix,
+            output_path,
+            endpoint_url,
+            aws_access_key_id,
+            aws_secret_access_key,
+            select,
+            max_downloads,
         )
     )
 
 
-async def get_obj(client: ClientCreatorContext, bucket: str, key: str) -> str:
+async def get_obj(client: ClientCreatorContext, bucket: str, key: str) -> bytes:
     """Get an object from s3.
 
     Args:
@@ -76,7 +519,7 @@ async def get_obj(client: ClientCreatorContext, bucket: str, key: str) -> str:
         key (str): Object to request.
 
     Returns:
-        str: Content of the object.
+        bytes: Content of the object.
     """
     resp = await client.get_object(Bucket=bucket, Key=key)
     obj = await resp["Body"].read()
@@ -88,18 +531,215 @@ async def download_obj(
 ):
     """Download object from s3.
 
+    The body is written to disk as its chunks arrive, as bytes (the object may be compressed),
+    so the object is never held whole in memory. It is written to a temporary file renamed at
+    the end, so a failed download never leaves a truncated file.
+
     Args:
         client (ClientCreatorContext): Client with s3 connection.
         bucket (str): Name of the bucket.
         key (str): Object to request.
         output_path (str): Local path to store output from minio.
+        semaphore (Optional[asyncio.Semaphore]): Limit of concurrent downloads, if any.
     """
-    async with semaphore:
-        await aiofiles.os.makedirs(os.path.dirname(os.path.join(output_path, key)), exist_ok=True)
-        obj = await get_obj(client, bucket, key)
+    async with semaphore or nullcontext():
+        path = os.path.join(output_path, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        resp = await client.get_object(Bucket=bucket, Key=key)
+        body = resp["Body"]
+        part_path = f"{path}.part"
+        try:
+            # plain blocking writes: the raw files are small and land in the page cache, so a
+            # write is cheaper than handing it to a thread
+            async with body:
+                with open(part_path, "wb") as out:
+                    async for chunk in body.iter_chunks(DOWNLOAD_CHUNK_SIZE):
+                        out.write(chunk)
+            os.replace(part_path, path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+
+async def read_metadata_keys(client: ClientCreatorContext, bucket: str, prefix: str) -> list:
+    """Read the names of the objects of a prefix from its manifest shards.
+
+    The shards written by upload_metadata are merged in the order they were written. Days
+    extracted before the shards existed keep their names in a single metadata.txt, which is
+    read too if present.
 
-        async with aiofiles.open(os.path.join(output_path, key), "w") as out:
-            await out.write(obj.decode())
+    Args:
+        client (ClientCreatorContext): Client with s3 connection.
+        bucket (str): Bucket name.
+        prefix (str): Path to raw data directory from minio.
+
+    Raises:
+        botocore.exceptions.ClientError: If a shard or the legacy metadata.txt can't be read.
+
+    Returns:
+        list: Keys of the objects written in the prefix.
+    """
+    paginator = client.get_paginator("list_objects_v2")
+    shard_keys = []
+    async for result in paginator.paginate(Bucket=bucket, Prefix=prefix + METADATA_DIR + "/"):
+        for c in result.get("Contents", []):
+            shard_keys.append(c.get("Key"))
+    # shard names start with their writing time
+    shards = await asyncio.gather(*[get_obj(client, bucket, key) for key in sorted(shard_keys)])
+
+    try:
+        response = await client.get_object(Bucket=bucket, Key=prefix + "metadata.txt")
+        async with response["Body"] as stream:
+            shards = [await stream.read(), *shards]
+    except botocore.exceptions.ClientError as e:
+        # no legacy metadata file, any other error would leave keys out of the listing
+        if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+            raise
+
+    keys = dict.fromkeys(
+        key.rstrip()
+        for shard in shards
+        for key in shard.decode("utf-8").split("\n")
+        if key.rstrip() != ""  # eliminate blank strings (EOL)
+    )
+    return list(keys)
+
+
+async def stream_objs(
+    bucket: str,
+    prefix: str,
+    endpoint_url: str,
+    aws_access_key_id: str,
+    aws_secret_access_key: str,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    select: Optional[Callable[[str], bool]] = None,
+) -> AsyncIterator[tuple]:
+    """Fetch the objects of a prefix concurrently and yield their content without touching disk.
+
+    At most `max_in_flight` objects are being downloaded or waiting to be consumed at the same
+    time, so memory stays bounded whatever the number of objects of the prefix.
+
+    Args:
+        bucket (str): Bucket name.
+        prefix (str): Path to raw data directory from minio.
+        endpoint_url (str): Url of minio bucket.
+        aws_access_key_id (str): Minio user.
+        aws_secret_access_key (str): Minio password.
+        max_in_flight (int): Max number of objects buffered in memory.
+        select (Optional[Callable[[str], bool]]): Keys to fetch, all of them if None.
+
+    Yields:
+        tuple: Key and content (bytes) of each object, in completion order. Each object is
+            retried with the policy of its error class (see call_with_retry); objects that
+            still fail are logged and skipped.
+    """
+    async with storage_client(endpoint_url, aws_access_key_id, aws_secret_access_key) as client:
+        if "/eta" in prefix:
+            keys = await read_metadata_keys(client, bucket, prefix)
+        else:
+            keys = await list_s3_keys(
+                endpoint_url, aws_secret_access_key, aws_access_key_id, bucket, prefix
+            )
+        if select is not None:
+            keys = [key for key in keys if select(key)]
+        logger.debug(f"Streaming {len(keys)} files from s3")
+
+        slots = asyncio.Semaphore(max_in_flight)
+        results = asyncio.Queue()
+        pending = iter(keys)
+
+        async def fetch():
+            for key in pending:
+                await slots.acquire()
+                try:
+                    body = await call_with_retry(
+                        lambda: get_obj(client, bucket, key), f"read of {key}"
+                    )
+                except Exception as e:
+                    logger.error(f"Error reading {key}: {e}")
+                    body = None
+                await results.put((key, body))
+
+        # a fixed pool of fetchers pulls the keys, a slot is freed when its object is consumed
+        fetchers = [asyncio.create_task(fetch()) for _ in range(min(max_in_flight, len(keys)))]
+        try:
+            for _ in range(len(keys)):
+                key, body = await results.get()
+                slots.release()
+                if body is not None:
+                    yield key, body
+        finally:
+            for fetcher in fetchers:
+                fetcher.cancel()
+            await asyncio.gather(*fetchers, return_exceptions=True)
+
+
+async def download_keys(
+    client: ClientCreatorContext,
+    bucket: str,
+    keys: Union[List[str], AsyncIterator[str]],
+    output_path: str,
+    max_downloads: int = DEFAULT_MAX_DOWNLOADS,
+) -> List[str]:
+    """Download objects from s3 with a fixed pool of workers.
+
+    The workers pull the keys from a bounded queue, so at most `max_downloads` objects are
+    being downloaded at the same time whatever the number of keys, and a slow object only holds
+    its worker. The keys can be given while they are listed (e.g. by iter_s3_keys), the
+    downloads start with the first ones. Each object is retried with the policy of its error
+    class (see call_with_retry); objects that still fail are logged and skipped.
+
+    Args:
+        client (ClientCreatorContext): Client with s3 connection.
+        bucket (str): Bucket name.
+        keys (Union[List[str], AsyncIterator[str]]): Objects to download.
+        output_path (str): Local path to store output from minio.
+        max_downloads (int): Number of workers downloading objects in parallel.
+
+    Returns:
+        List[str]: Keys of the objects that could not be downloaded.
+    """
+    queue = asyncio.Queue(maxsize=2 * max_downloads)
+    failed = []
+    listed = 0
+    downloaded = 0
+    start = time.monotonic()
+
+    async def produce():
+        nonlocal listed
+        if isinstance(keys, list):
+            listed = len(keys)
+            for key in keys:
+                await queue.put(key)
+        else:
+            async for key in keys:
+                listed += 1
+                await queue.put(key)
+        for _ in range(max_downloads):
+            await queue.put(None)  # stop a worker
+
+    async def work():
+        nonlocal downloaded
+        while (key := await queue.get()) is not None:
+            try:
+                await call_with_retry(
+                    lambda: download_obj(client, bucket, key, output_path), f"download of {key}"
+                )
+            except Exception as e:
+                logger.error(f"Error downloading {key}: {e}")
+                failed.append(key)
+                continue
+            downloaded += 1
+            if downloaded % DOWNLOAD_PROGRESS_EVERY == 0:
+                rate = downloaded / (time.monotonic() - start)
+                logger.debug(f"Downloaded {downloaded}/{listed} files ({rate:.0f} files/s)")
+
+    await asyncio.gather(produce(), *[work() for _ in range(max_downloads)])
+    logger.debug(f"Downloaded {downloaded}/{listed} files in {time.monotonic() - start:.1f}s")
+    if failed:
+        logger.error(f"{len(failed)} files could not be downloaded")
+    return failed
 
 
 async def download_objs(
@@ -109,9 +749,14 @@ async def download_objs(
     endpoint_url: str,
     aws_access_key_id: str,
     aws_secret_access_key: str,
-):
+    select: Optional[Callable[[str], bool]] = None,
+    max_downloads: int = DEFAULT_MAX_DOWNLOADS,
+) -> List[str]:
     """Download objects from s3.
 
+    The ETA objects are read from the manifest of the day (see read_metadata_keys). The rest of
+    the prefixes are listed page by page while the first objects are downloading.
+
     Args:
         bucket (str): Bucket name.
         prefix (str): Path to raw data directory from minio.
@@ -119,54 +764,30 @@ async def download_objs(
         endpoint_url (str): Url of minio bucket.
         aws_access_key_id (str): Minio user.
         aws_secret_access_key (str): Minio password.
+        select (Optional[Callable[[str], bool]]): Keys to download, all of them if None.
+        max_downloads (int): Number of objects downloaded in parallel.
+
+    Returns:
+        List[str]: Keys of the objects that could not be downloaded.
     """
-    session = get_session()
-    async with session.create_client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_secret_access_key=aws_secret_access_key,
-        aws_access_key_id=aws_access_key_id,
+    async with storage_client(
+        endpoint_url,
+        aws_access_key_id,
+        aws_secret_access_key,
+        max(max_downloads, DEFAULT_MAX_POOL_CONNECTIONS),
     ) as client:
-        
         logger.debug("Downloading files from s3")
-        
+
         if "/eta" in prefix:
-            metadata_path = prefix + "metadata.txt"
-            
-            response = await client.get_object(Bucket = bucket, Key = metadata_path)
-            async with response['Body'] as stream:
-                keys = await stream.read()
-                keys = keys.decode('utf-8')
-
-            semaphore = asyncio.BoundedSemaphore(10000)
-            keys_list = keys.split('\n')
-            
-            #eliminate blank strings (EOL)
-            keys_list = [elemento.rstrip() for elemento in keys_list if elemento.rstrip() != '']
-
-            tasks = []
-            logger.debug(f"Downloading {len(keys_list)} files from emt endpoint")
-            completed_tasks_count = 0
-            remaining_tasks = 0
-            
-            for i, key in enumerate(keys_list, 1):
-                tasks.append(download_obj(client, bucket, key, output_path, semaphore))
-                if i % 10000 == 0:
-                    await asyncio.gather(*tasks)
-                    completed_tasks_count+=10000
-                    remaining_tasks = len(keys_list) - completed_tasks_count
-                    logger.debug(f"Finished {completed_tasks_count} tasks. {remaining_tasks} left remaining tasks.")
-                    tasks = []
-            if tasks:
-                await asyncio.gather(*tasks)
-                logger.debug(f"Finished all tasks. {len(keys_list)}/{len(keys_list)}")
-                        
+            keys = await read_metadata_keys(client, bucket, prefix)
+            if select is not None:
+                keys = [key for key in keys if select(key)]
+            logger.debug(f"Downloading {len(keys)} files with {max_downloads} workers")
         else:
-            keys = list_objs(bucket, prefix, endpoint_url, aws_secret_access_key, aws_access_key_id)
-            semaphore = asyncio.BoundedSemaphore(10000)
-            tasks = [download_obj(client, bucket, key, output_path, semaphore) for key in keys]
+            keys = iter_s3_keys(client, bucket, prefix, select)
+            logger.debug(f"Downloading files of {prefix} with {max_downloads} workers")
 
-            await asyncio.gather(*tasks)
+        return await download_keys(client, bucket, keys, output_path, max_downloads)
 
 
 async def read_obj(
@@ -188,62 +809,54 @@ async def read_obj(
     Returns:
         str: Content from object.
     """
-    session = get_session()
-    async with session.create_client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_secret_access_key=aws_secret_access_key,
-        aws_access_key_id=aws_access_key_id,
-    ) as client:
+    async with storage_client(endpoint_url, aws_access_key_id, aws_secret_access_key) as client:
         resp = await client.get_object(Bucket=bucket, Key=object_name)
         obj = await resp["Body"].read()
-        data_str = obj.decode("utf-8")
+        data_str = decompress(obj, object_name).decode("utf-8")
         return data_str
 
 
-async def upload_obj(client: ClientCreatorContext, bucket: str, key: str, object_value: str):
+async def upload_obj(
+    client: ClientCreatorContext, bucket: str, key: str, object_value: Union[str, bytes]
+):
     """Upload an object to s3.
 
     Args:
         client (ClientCreatorContext): Client with s3 connection.
         bucket (str): Bucket name.
         key (str): Name of the object.
-        object_value (str): Content of the object.
+        object_value (Union[str, bytes]): Content of the object, text is encoded as utf-8.
     """
-    await client.put_object(Bucket=bucket, Key=str(key), Body=object_value.encode("utf-8"))
+    if isinstance(object_value, str):
+        object_value = object_value.encode("utf-8")
+    await client.put_object(Bucket=bucket, Key=str(key), Body=object_value)
 
-def upload_metadata(
-    bucket: str,
-    endpoint_url: str,
-    aws_access_key_id: str,
-    aws_secret_access_key: str,
-    keys: list
+
+async def upload_metadata(
+    bucket: str, endpoint_url: str, aws_access_key_id: str, aws_secret_access_key: str, keys: list
 ):
-    session = botocore.session.get_session()
-    client = session.create_client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_secret_access_key=aws_secret_access_key,
-        aws_access_key_id=aws_access_key_id,
-        use_ssl=False, #TODO Change all s3 function connections to manage the ssl by config parameter
-    )
-    
-    #Get the prefix of the metadata from the first name of the object from the keys list
-    prefix = "/".join(keys[0].split('/')[:-1]) + '/metadata.txt'
-    try:
-        #If file exists in the bucket
-        response = client.get_object(Bucket=bucket, Key=prefix)
-        #Get the previous content of the file
-        content = response['Body'].read().decode('utf-8')
-        #add the new names of files written
-        new_content = content + '\n' + '\n'.join(keys)
-    except :
-        #if metadata file does not exist (first execution of the day)
-        new_content = '\n'.join(keys)
-
-    # upload s3
-    client.put_object(Bucket=bucket, Key=prefix, Body=new_content.encode('utf-8'))
-    
+    """Write the names of the uploaded objects in a new manifest shard of their directory.
+
+    Each call writes its own small object (see read_metadata_keys), so the cost does not grow
+    along the day and concurrent extractions can't overwrite each other's names.
+
+    Args:
+        bucket (str): Bucket name.
+        endpoint_url (str): Url of minio bucket.
+        aws_access_key_id (str): Minio user.
+        aws_secret_access_key (str): Minio password.
+        keys (list): Names of the objects uploaded.
+    """
+    # Get the directory of the manifest from the first name of the object from the keys list
+    prefix = "/".join(keys[0].split("/")[:-1]) + "/" + METADATA_DIR
+    # time first so the shards are listed in writing order, then a random suffix for uniqueness
+    shard_name = f"{datetime.datetime.utcnow():%Y%m%dT%H%M%S%f}_{uuid.uuid4().hex[:8]}.txt"
+    async with storage_client(endpoint_url, aws_access_key_id, aws_secret_access_key) as client:
+        await client.put_object(
+            Bucket=bucket, Key=f"{prefix}/{shard_name}", Body="\n".join(keys).encode("utf-8")
+        )
+
+
 async def upload_objs(
     bucket: str,
     endpoint_url: str,
@@ -260,13 +873,7 @@ async def upload_objs(
         aws_secret_access_key (str): Minio password.
         objects_dict (dict): Dict ofobjects to upload.
     """
-    session = get_session()
-    async with session.create_client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_secret_access_key=aws_secret_access_key,
-        aws_access_key_id=aws_access_key_id,
-    ) as client:
+    async with storage_client(endpoint_url, aws_access_key_id, aws_secret_access_key) as client:
         keys = objects_dict.keys()
         tasks = [upload_obj(client, bucket, key, objects_dict[key]) for key in keys]
         await asyncio.gather(*tasks)
@@ -323,15 +930,57 @@ async def check_s3_file_exists(
     Returns:
         bool: True if file is detected, False otherwise.
     """
-    session = get_session()
-    async with session.create_client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_secret_access_key=aws_secret_access_key,
-        aws_access_key_id=aws_access_key_id,
-    ) as client:
+    async with storage_client(endpoint_url, aws_access_key_id, aws_secret_access_key) as client:
         try:
             await client.head_object(Bucket=bucket_name, Key=object_name)
             return True
         except:
             return False
+
+
+async def iter_s3_keys(
+    client: ClientCreatorContext,
+    bucket: str,
+    prefix: str,
+    select: Optional[Callable[[str], bool]] = None,
+) -> AsyncIterator[str]:
+    """List the keys of a prefix page by page, yielding each page as soon as it arrives.
+
+    Args:
+        client (ClientCreatorContext): Client with s3 connection.
+        bucket (str): Bucket name.
+        prefix (str): Prefix to list.
+        select (Optional[Callable[[str], bool]]): Keys to yield, all of them if None.
+
+    Yields:
+        str: Keys of the objects under the prefix.
+    """
+    paginator = client.get_paginator("list_objects_v2")
+    async for result in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for c in result.get("Contents", []):
+            key = c.get("Key")
+            if select is None or select(key):
+                yield key
+
+
+async def list_s3_keys(
+    endpoint_url: str,
+    aws_secret_access_key: str,
+    aws_access_key_id: str,
+    bucket_name: str,
+    prefix: str,
+) -> list:
+    """List the keys of a prefix in an S3 bucket with the shared client.
+
+    Args:
+        endpoint_url (str): The endpoint URL of the S3 service.
+        aws_secret_access_key (str): The AWS secret access key.
+        aws_access_key_id (str): The AWS access key ID.
+        bucket_name (str): Bucket name.
+        prefix (str): Prefix to list.
+
+    Returns:
+        list: Keys of the objects under the prefix.
+    """
+    async with storage_client(endpoint_url, aws_access_key_id, aws_secret_access_key) as client:
+        return [key async for key in iter_s3_keys(client, bucket_name, prefix)]
@@ -0,0 +1,14 @@
+import pytest
+
+from inesdata_mov_datasets.handlers import retry
+
+
+@pytest.fixture(autouse=True)
+def no_retry_backoff(monkeypatch):
+    """Fixture para reintentar las peticiones fallidas sin esperas en los tests."""
+    for error_class, policy in retry.DEFAULT_RETRY_POLICIES.items():
+        monkeypatch.setitem(
+            retry.DEFAULT_RETRY_POLICIES,
+            error_class,
+            retry.RetryPolicy(max_retries=policy.max_retries, base_delay=0, max_delay=0),
+        )
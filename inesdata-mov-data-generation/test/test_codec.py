@@ -0,0 +1,47 @@
+import sys
+import pytest
+
+from inesdata_mov_datasets.handlers import codec
+from inesdata_mov_datasets.handlers.codec import json_backend, json_dumps, json_loads, use_json_backend
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    """Fixture para volver a la librería JSON por defecto tras cada test."""
+    yield
+    use_json_backend()
+
+
+###################### use_json_backend
+@pytest.mark.parametrize("backend", codec.JSON_BACKENDS)
+def test_json_round_trip(backend):
+    """Test para verificar que cada librería instalada lee y escribe el mismo documento."""
+    pytest.importorskip(backend)
+    use_json_backend(backend)
+    content = {"code": "00", "data": [{"Arrive": [{"line": "27", "stop": 1, "estimateArrive": 120.5}]}]}
+
+    data = json_dumps(content)
+
+    assert isinstance(data, bytes)
+    assert json_backend() == backend
+    assert json_loads(data) == content
+    assert json_loads(data.decode("utf-8")) == content
+
+
+def test_json_backend_fallback(monkeypatch):
+    """Test para verificar que se usa la librería estándar si no hay librerías rápidas instaladas."""
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    monkeypatch.setitem(sys.modules, "msgspec", None)
+
+    assert use_json_backend() == "json"
+    assert json_loads(json_dumps({"code": "00"})) == {"code": "00"}
+
+    # Si se pide una librería concreta que no está instalada se avisa
+    with pytest.raises(ImportError):
+        use_json_backend("orjson")
+
+
+def test_json_backend_unknown():
+    """Test para verificar que se rechaza una librería desconocida."""
+    with pytest.raises(ValueError):
+        use_json_backend("yaml")
@@ -93,7 +93,7 @@ def test_generate_df_from_file_exception():
 ###################### generate_day_df
 @patch('inesdata_mov_datasets.sources.create.aemet.logger')
 @patch('inesdata_mov_datasets.sources.create.aemet.os.listdir')
-@patch('inesdata_mov_datasets.sources.create.aemet.open', new_callable=mock_open, read_data='{"data": [{"valor": 10, "periodo": "1200"}]}')
+@patch('inesdata_mov_datasets.sources.create.aemet.open_raw', new_callable=mock_open, read_data='[{"prediccion": {"dia": []}}]')
 @patch('inesdata_mov_datasets.sources.create.aemet.generate_df_from_file')
 def test_generate_day_df_valid_data(mock_generate_df_from_file, mock_open, mock_listdir, mock_logger):
     """Test para verificar la generación de DataFrame con datos válidos."""
@@ -193,7 +193,9 @@ def test_create_aemet(mock_logger_debug, mock_generate_day_df, mock_download_aem
     mock_download_aemet.assert_not_called()  # Cambia esto si es necesario
 
     # Verificar que se llamó a `generate_day_df` con los argumentos correctos
-    mock_generate_day_df.assert_called_once_with(storage_path="/tmp", date=date)
+    mock_generate_day_df.assert_called_once_with(
+        storage_path="/tmp", date=date, output_format=mock_settings.storage.output_format
+    )
 
 @patch('inesdata_mov_datasets.sources.create.aemet.instantiate_logger')
 @patch('inesdata_mov_datasets.sources.create.aemet.logger.error')
@@ -7,8 +7,10 @@ import tempfile
 import logging
 from unittest.mock import patch, mock_open, MagicMock
 from pydantic import BaseModel
-from inesdata_mov_datasets.sources.create.emt import generate_calendar_df_from_file, generate_calendar_day_df, create_calendar_emt, generate_line_df_from_file, generate_line_day_df, create_line_detail_emt, generate_eta_df_from_file, generate_eta_day_df, create_eta_emt, join_calendar_line_datasets, join_eta_dataset, create_emt
+from inesdata_mov_datasets.handlers.schemas import EtaResponse, as_schema
+from inesdata_mov_datasets.sources.create.emt import generate_calendar_df_from_file, generate_calendar_day_df, create_calendar_emt, generate_line_df_from_file, generate_line_day_df, create_line_detail_emt, generate_eta_df_from_file, generate_eta_day_df, read_eta_contents, create_eta_emt, join_calendar_line_datasets, join_eta_dataset, create_emt, EtaWatermark, JoinBudget, iter_eta_day_chunks, build_line_index
 from inesdata_mov_datasets.settings import Settings
+from inesdata_mov_datasets import read_dataset
 
 ###################### generate_calendar_df_from_file
 def test_generate_calendar_df_from_file():
@@ -70,7 +72,7 @@ def test_generate_calendar_df_from_file():
 @pytest.fixture
 def mock_file_content():
     # Simula el contenido de un archivo JSON
-    return [{"data": [{"date": "2024-01-10", "dayType": "working"}], "datetime": "2024-01-10"}]
+    return [{"data": [{"date": "10/01/2024", "dayType": "working"}], "datetime": "2024-01-10"}]
 
 @pytest.fixture
 def mock_storage_path(tmp_path):
@@ -79,21 +81,13 @@ def mock_storage_path(tmp_path):
 
 @patch("builtins.open", new_callable=mock_open)
 @patch("os.listdir")
-@patch("inesdata_mov_datasets.sources.create.emt.generate_calendar_df_from_file")  # Cambia 'inesdata_mov_datasets.sources.create.emt' por el nombre del módulo correcto
-def test_generate_calendar_day_df(mock_generate_calendar_df_from_file, mock_listdir, mock_open, mock_storage_path, mock_file_content):
+def test_generate_calendar_day_df(mock_listdir, mock_open, mock_storage_path, mock_file_content):
     # Configura el mock para el contenido del archivo
     mock_open.return_value.__enter__.return_value.read = lambda: json.dumps(mock_file_content)
     
     # Configura el mock para listar archivos
     mock_listdir.return_value = ["file1.json", "file2.json"]
 
-    # Configura el mock para generate_calendar_df_from_file
-    mock_generate_calendar_df_from_file.return_value = pd.DataFrame({
-        "datetime": [mock_file_content[0]["datetime"]],
-        "date": ["2024-01-10"],
-        "dayType": ["working"]
-    })
-
     # Llama a la función
     result_df = generate_calendar_day_df(mock_storage_path, "2024/01/10")
 
@@ -102,9 +96,9 @@ def test_generate_calendar_day_df(mock_generate_calendar_df_from_file, mock_list
     assert not result_df.empty
     assert result_df.shape[0] == 2  # Debería haber 2 filas
     assert list(result_df["dayType"]) == ["working", "working"]  # Verifica el contenido esperado
+    assert list(result_df["date"]) == [pd.Timestamp("2024-01-10")] * 2
 
     # Verifica que las funciones de log fueron llamadas correctamente
-    mock_generate_calendar_df_from_file.assert_called()
     mock_listdir.assert_called_once()
 
 ###################### create_calendar_emt
@@ -151,6 +145,7 @@ def test_create_calendar_emt(mock_settings_create_calendar_emt, mock_generate_ca
         endpoint_url=mock_settings_create_calendar_emt.storage.config.minio.endpoint,
         aws_access_key_id=mock_settings_create_calendar_emt.storage.config.minio.access_key,
         aws_secret_access_key=mock_settings_create_calendar_emt.storage.config.minio.secret_key,
+        max_downloads=mock_settings_create_calendar_emt.storage.config.minio.max_downloads,
     )
 
     # Verificar que generate_calendar_day_df se llamó
@@ -245,20 +240,6 @@ def test_generate_line_df_from_file_empty_data():
     assert df.empty
 
 ###################### generate_line_day_df
-# Función simulada para generar un DataFrame a partir de contenido (mock)
-def mock_generate_line_df_from_file(content):
-    return pd.DataFrame({
-        "dayType": [content["data"][0]["timeTable"][0]["idDayType"]],
-        "StartTime": [content["data"][0]["timeTable"][0]['Direction1']["StartTime"]],
-        "StopTime": [content["data"][0]["timeTable"][0]['Direction1']["StopTime"]],
-        "MinimunFrequency": [content["data"][0]["timeTable"][0]['Direction1']["MinimunFrequency"]],
-        "MaximumFrequency": [content["data"][0]["timeTable"][0]['Direction1']["MaximumFrequency"]],
-        "datetime": [pd.to_datetime(content["datetime"])],
-        "date": [pd.to_datetime(content["datetime"]).date()],
-        "line": [content["data"][0]["line"]]
-    })
-
-@patch('inesdata_mov_datasets.sources.create.emt.generate_line_df_from_file', side_effect=mock_generate_line_df_from_file)
 @patch('os.listdir', return_value=['file1.json', 'file2.json'])
 @patch('builtins.open', new_callable=mock_open, read_data=json.dumps({
     "data": [
@@ -277,7 +258,7 @@ def mock_generate_line_df_from_file(content):
     ],
     "datetime": "2024-10-01T00:00:00"
 }))
-def test_generate_line_day_df(mock_open, mock_listdir, mock_generate_line_df_from_file):
+def test_generate_line_day_df(mock_open, mock_listdir):
     # Establecer el path y la fecha
     storage_path = "/tmp"
     date = "2024/10/01"
@@ -369,6 +350,7 @@ def test_create_line_detail_emt(mock_generate_line_day_df, mock_async_download):
         endpoint_url=settings.storage.config.minio.endpoint,
         aws_access_key_id=settings.storage.config.minio.access_key,
         aws_secret_access_key=settings.storage.config.minio.secret_key,
+        max_downloads=settings.storage.config.minio.max_downloads,
     )
 
     # Verificar que el DataFrame no está vacío
@@ -432,7 +414,7 @@ def test_generate_eta_df_from_file():
     assert not df.empty
 
     # Verificar las columnas del DataFrame
-    expected_columns = ['line', 'stop', 'bus', 'DistanceBus', 'estimateArrive', 'datetime', 'date', 'positionBusLon', 'positionBusLat']
+    expected_columns = ['line', 'stop', 'isHead', 'destination', 'deviation', 'bus', 'estimateArrive', 'DistanceBus', 'positionTypeBus', 'datetime', 'date', 'positionBusLon', 'positionBusLat']
     assert list(df.columns) == expected_columns
 
     # Verificar el contenido del DataFrame
@@ -470,6 +452,58 @@ def test_generate_eta_day_df_no_files(mock_storage_path):
     # Verifica que el DataFrame resultante esté vacío
     assert result_df.empty
 
+def eta_content(stop, bus, datetime):
+    """Crea la respuesta de ETA de una parada con una llegada."""
+    return {
+        "data": [{"Arrive": [{"line": "1", "stop": stop, "bus": bus, "geometry": {"coordinates": [1.0, 2.0]}}]}],
+        "datetime": datetime,
+    }
+
+
+def test_generate_eta_day_df_bundle(mock_storage_path):
+    """Test para verificar que se leen a la vez ficheros por parada y ficheros agrupados por minuto."""
+    raw_storage_dir = Path(mock_storage_path) / "raw" / "emt" / "2024/10/08" / "eta"
+    raw_storage_dir.mkdir(parents=True)
+    with open(raw_storage_dir / "eta_1_2024-10-08T1000.json", "w") as f:
+        json.dump(eta_content(1, 10, "2024-10-08T10:00:00"), f)
+    with open(raw_storage_dir / "eta_2024-10-08T1001.ndjson", "w") as f:
+        f.write(json.dumps(eta_content(1, 10, "2024-10-08T10:01:00")) + "\n")
+        f.write(json.dumps(eta_content(2, 20, "2024-10-08T10:01:00")) + "\n")
+
+    result_df = generate_eta_day_df(mock_storage_path, "2024/10/08")
+
+    assert len(result_df) == 3
+    assert list(result_df["stop"]) == [1, 1, 2]
+    assert list(result_df["bus"]) == [10, 10, 20]
+
+
+def test_generate_eta_day_df_malformed(mock_storage_path):
+    """Test para verificar que se descartan los ficheros que no cumplen el esquema de ETA."""
+    raw_storage_dir = Path(mock_storage_path) / "raw" / "emt" / "2024/10/08" / "eta"
+    raw_storage_dir.mkdir(parents=True)
+    with open(raw_storage_dir / "eta_1_2024-10-08T1000.json", "w") as f:
+        json.dump(eta_content(1, 10, "2024-10-08T10:00:00"), f)
+    with open(raw_storage_dir / "eta_2_2024-10-08T1000.json", "w") as f:
+        json.dump({"data": [{"Arrive": [{"line": "1", "stop": 2}]}]}, f)
+
+    with patch('inesdata_mov_datasets.sources.create.emt.logger') as mock_logger:
+        result_df = generate_eta_day_df(mock_storage_path, "2024/10/08")
+
+    assert list(result_df["stop"]) == [1]
+    assert "eta_2_2024-10-08T1000.json" in mock_logger.error.call_args[0][0]
+
+
+def test_read_eta_contents_zstd():
+    """Test para verificar la lectura de un fichero agrupado comprimido con zstd."""
+    zstandard = pytest.importorskip("zstandard")
+    contents = [eta_content(1, 10, "2024-10-08T10:01:00"), eta_content(2, 20, "2024-10-08T10:01:00")]
+    data = "\n".join(json.dumps(content) for content in contents).encode()
+
+    result = read_eta_contents("eta_2024-10-08T1001.ndjson.zst", zstandard.ZstdCompressor().compress(data))
+
+    assert result == [as_schema(content, EtaResponse) for content in contents]
+
+
 ###################### create_eta_emt
 @pytest.fixture
 def settings_create_eta_emt():
@@ -518,6 +552,8 @@ def test_create_eta_emt(mock_async_download, mock_generate_eta_day_df, settings_
         endpoint_url=settings_create_eta_emt.storage.config.minio.endpoint,
         aws_access_key_id=settings_create_eta_emt.storage.config.minio.access_key,
         aws_secret_access_key=settings_create_eta_emt.storage.config.minio.secret_key,
+        select=None,
+        max_downloads=settings_create_eta_emt.storage.config.minio.max_downloads,
     )
 
     # Verifica que el DataFrame devuelto es el esperado
@@ -527,6 +563,33 @@ def test_create_eta_emt(mock_async_download, mock_generate_eta_day_df, settings_
         "line", "stop", "bus", "datetime", "date", "DistanceBus", "positionBusLon", "positionBusLat"
     ]
 
+@patch('inesdata_mov_datasets.sources.create.emt.async_download')
+@patch('inesdata_mov_datasets.sources.create.emt.stream_objs')
+def test_create_eta_emt_stream(mock_stream_objs, mock_async_download, settings_create_eta_emt):
+    """Test para verificar la creación del dataset ETA leyendo de MinIO en memoria."""
+    content = {
+        "data": [{"Arrive": [{"line": "1", "stop": 1, "bus": 10, "geometry": {"coordinates": [1.0, 2.0]}}]}],
+        "datetime": "2024-10-01T10:00:00",
+    }
+
+    async def stream(*args):
+        yield "raw/emt/2024/10/01/eta/eta_1.json", json.dumps(content).encode()
+        yield "raw/emt/2024/10/01/eta/eta_2.json", b"not json"
+
+    mock_stream_objs.side_effect = stream
+    settings_create_eta_emt.storage.config.minio.max_in_flight = 10
+
+    result_df = create_eta_emt(settings_create_eta_emt, "2024/10/01", stream=True)
+
+    # No se descarga nada a disco
+    mock_async_download.assert_not_called()
+    mock_stream_objs.assert_called_once_with(
+        "test-bucket", "raw/emt/2024/10/01/eta/", "http://localhost:9000", "test-access-key", "test-secret-key", 10, None
+    )
+    # El fichero inválido se descarta
+    assert result_df.shape[0] == 1
+    assert result_df["positionBusLon"].iloc[0] == 1.0
+
 ###################### join_calendar_line_datasets
 def test_join_calendar_line_datasets():
     # Crear un DataFrame de ejemplo para calendar_df
@@ -610,6 +673,52 @@ def test_join_eta_dataset():
     assert all(result_df[result_df["line"] == "303"]["datetime"] == eta_df[eta_df["line"] == "303"]["datetime"]), "El valor de 'datetime' no coincide para la línea 303"
 
 
+def test_build_line_index():
+    """Test para verificar que los atributos de las líneas se indexan por línea normalizada."""
+    calendar_line_df = pd.DataFrame({
+        "line": ["027", 1],
+        "dayType": ["LA", "LA"],
+        "datetime": pd.to_datetime(["2024-10-01 08:00:00"] * 2),
+        "date": pd.to_datetime(["2024-10-01"] * 2),
+        "StartTime": ["06:00", "07:00"],
+    })
+
+    line_index = build_line_index(calendar_line_df)
+
+    assert list(line_index.index) == ["27", "1"]
+    assert list(line_index.columns) == ["dayType", "StartTime"]
+
+
+def test_join_eta_dataset_lookup():
+    """Test para verificar el join por índice de líneas con ceros iniciales y líneas repetidas."""
+    calendar_line_df = pd.DataFrame({
+        "line": ["027", "001"],
+        "dayType": ["LA", "LA"],
+        "datetime": pd.to_datetime(["2024-10-01 08:00:00"] * 2),
+        "date": pd.to_datetime(["2024-10-01"] * 2),
+        "MinimunFrequency": [5, 10],
+    })
+    eta_df = pd.DataFrame({
+        "line": ["27", "0027", "1", "99"],
+        "bus": [1, 2, 3, 4],
+        "datetime": pd.to_datetime(["2024-10-01 08:05:00"] * 4),
+        "date": pd.to_datetime(["2024-10-01"] * 4),
+    })
+
+    result_df = join_eta_dataset(calendar_line_df, eta_df, line_index=build_line_index(calendar_line_df))
+
+    assert list(result_df["line"]) == ["27", "27", "1", "99"]
+    assert isinstance(result_df["line"].dtype, pd.CategoricalDtype)
+    assert list(result_df["MinimunFrequency"].iloc[:3]) == [5, 5, 10]
+    assert pd.isna(result_df["MinimunFrequency"].iloc[3])
+
+    # Una línea con varias filas de atributos multiplica sus llegadas, como un merge
+    duplicated_df = pd.concat([calendar_line_df, calendar_line_df.iloc[[1]]])
+    result_df = join_eta_dataset(duplicated_df, eta_df)
+    assert len(result_df) == 5
+    assert (result_df["line"] == "1").sum() == 2
+
+
 ###################### create_emt
 @pytest.fixture
 def mock_settings():
@@ -628,6 +737,7 @@ def mock_settings():
     settings.storage.config.minio.endpoint = "http://localhost:9000"
     settings.storage.config.minio.access_key = "test-access-key"
     settings.storage.config.minio.secret_key = "test-secret-key"
+    settings.sources.emt.join_memory_mb = None  # join del día completo
 
     return settings
 
@@ -686,4 +796,139 @@ def test_create_emt_success(mock_instantiate_logger, mock_to_csv, mock_mkdir, mo
     mock_mkdir.assert_called_once()
 
     # Verificar que el logger fue llamado para iniciar la creación del dataset
-    mock_instantiate_logger.assert_called_once()
\ No newline at end of file
+    mock_instantiate_logger.assert_called_once()
+
+###################### create_emt incremental
+def test_eta_watermark():
+    """Test para verificar que solo se seleccionan los minutos posteriores a la marca y anteriores al corte."""
+    select = EtaWatermark("2024-10-08T1000", "2024-10-08T1002")
+
+    assert not select("raw/emt/2024/10/08/eta/eta_1_2024-10-08T1000.json")
+    assert select("raw/emt/2024/10/08/eta/eta_1_2024-10-08T1001.json.gz")
+    assert select("eta_2024-10-08T1002.ndjson")
+    # Los minutos más recientes se dejan para la siguiente ejecución
+    assert not select("eta_1_2024-10-08T1003.json")
+    assert not select("metadata.txt")
+    assert select.last_tick == "2024-10-08T1002"
+
+
+def join_eta_passthrough(calendar_line_df, eta_df, line_index=None):
+    """Simula el join de ETA añadiendo las columnas de calendario y líneas vacías."""
+    for column in ["deviation", "StartTime", "StopTime", "MinimunFrequency", "MaximumFrequency",
+                   "isHead", "dayType", "strike", "destination", "positionTypeBus", "DistanceBus",
+                   "estimateArrive"]:
+        if column not in eta_df.columns:
+            eta_df[column] = None
+    return eta_df
+
+
+@patch('inesdata_mov_datasets.sources.create.emt.join_eta_dataset', side_effect=join_eta_passthrough)
+@patch('inesdata_mov_datasets.sources.create.emt.join_calendar_line_datasets')
+@patch('inesdata_mov_datasets.sources.create.emt.create_line_detail_emt')
+@patch('inesdata_mov_datasets.sources.create.emt.create_calendar_emt')
+@patch('inesdata_mov_datasets.sources.create.emt.instantiate_logger')
+def test_create_emt_incremental(mock_instantiate_logger, mock_create_calendar, mock_create_line_detail, mock_join_calendar, mock_join_eta, tmp_path):
+    """Test para verificar que una creación incremental solo añade los minutos nuevos."""
+    settings = MagicMock()
+    settings.storage.default = "local"
+    settings.storage.config.local.path = str(tmp_path)
+    settings.storage.output_format = "csv"
+    settings.sources.emt.join_memory_mb = None
+    mock_create_calendar.return_value = MagicMock(empty=False)
+    mock_create_line_detail.return_value = MagicMock(empty=False)
+
+    raw_storage_dir = tmp_path / "raw" / "emt" / "2024/10/08" / "eta"
+    raw_storage_dir.mkdir(parents=True)
+    processed_dir = tmp_path / "processed" / "emt" / "2024/10/08"
+    for stop in [1, 2]:
+        with open(raw_storage_dir / f"eta_{stop}_2024-10-08T1000.json", "w") as f:
+            json.dump(eta_content(stop, 10 * stop, "2024-10-08T10:00:00"), f)
+
+    create_emt(settings, "2024/10/08", incremental=True)
+
+    assert len(pd.read_csv(processed_dir / "emt_20241008.csv")) == 2
+    with open(processed_dir / "emt_20241008_watermark.json") as f:
+        assert json.load(f) == {"eta": "2024-10-08T1000"}
+
+    # Solo se leen y añaden los ficheros del minuto nuevo
+    with open(raw_storage_dir / "eta_1_2024-10-08T1001.json", "w") as f:
+        json.dump(eta_content(1, 10, "2024-10-08T10:01:00"), f)
+
+    create_emt(settings, "2024/10/08", incremental=True)
+
+    df = pd.read_csv(processed_dir / "emt_20241008.csv")
+    assert len(df) == 3
+    assert list(df["datetime"].str[:16]) == ["2024-10-08 10:00", "2024-10-08 10:00", "2024-10-08 10:01"]
+    with open(processed_dir / "emt_20241008_watermark.json") as f:
+        assert json.load(f) == {"eta": "2024-10-08T1001"}
+
+    # Sin minutos nuevos no se añade nada
+    create_emt(settings, "2024/10/08", incremental=True)
+    assert len(pd.read_csv(processed_dir / "emt_20241008.csv")) == 3
+
+    # Una creación completa reconstruye el día y elimina la marca
+    create_emt(settings, "2024/10/08")
+    assert len(pd.read_csv(processed_dir / "emt_20241008.csv")) == 3
+    assert not (processed_dir / "emt_20241008_watermark.json").exists()
+
+
+###################### create_emt chunked
+def test_join_budget():
+    """Test para verificar que el tamaño de los bloques se ajusta al presupuesto de memoria."""
+    budget = JoinBudget(memory_mb=3)
+    joined_df = pd.DataFrame({"value": range(1000)})  # 8000 bytes de datos
+
+    budget.update(eta_rows=100, joined_df=joined_df)
+
+    # 1MB por bloque unido (3MB / 3) y ~80 bytes unidos por fila de ETA
+    bytes_per_row = joined_df.memory_usage(deep=True).sum() / 100
+    assert budget.eta_rows == int(2**20 / bytes_per_row)
+
+
+def test_iter_eta_day_chunks(mock_storage_path):
+    """Test para verificar que los bloques contienen minutos completos en orden."""
+    raw_storage_dir = Path(mock_storage_path) / "raw" / "emt" / "2024/10/08" / "eta"
+    raw_storage_dir.mkdir(parents=True)
+    for minute in ["02", "00", "01"]:
+        for stop in [1, 2]:
+            with open(raw_storage_dir / f"eta_{stop}_2024-10-08T10{minute}.json", "w") as f:
+                json.dump(eta_content(stop, 10 * stop, f"2024-10-08T10:{minute}:00"), f)
+    budget = JoinBudget(memory_mb=1)
+    budget.eta_rows = 3
+
+    chunks = list(iter_eta_day_chunks(mock_storage_path, "2024/10/08", budget))
+
+    # Un bloque se cierra al alcanzar 3 filas, pero sin partir un minuto
+    assert [len(chunk) for chunk in chunks] == [4, 2]
+    assert chunks[0]["datetime"].max() < chunks[1]["datetime"].min()
+
+
+@patch('inesdata_mov_datasets.sources.create.emt.JOIN_FIRST_CHUNK_ROWS', 1)
+@patch('inesdata_mov_datasets.sources.create.emt.join_eta_dataset', side_effect=join_eta_passthrough)
+@patch('inesdata_mov_datasets.sources.create.emt.join_calendar_line_datasets')
+@patch('inesdata_mov_datasets.sources.create.emt.create_line_detail_emt')
+@patch('inesdata_mov_datasets.sources.create.emt.create_calendar_emt')
+@patch('inesdata_mov_datasets.sources.create.emt.instantiate_logger')
+def test_create_emt_chunked(mock_instantiate_logger, mock_create_calendar, mock_create_line_detail, mock_join_calendar, mock_join_eta, tmp_path):
+    """Test para verificar que el join por bloques exporta el día completo en orden."""
+    settings = MagicMock()
+    settings.storage.default = "local"
+    settings.storage.config.local.path = str(tmp_path)
+    settings.storage.output_format = "parquet"
+    settings.sources.emt.join_memory_mb = 1
+    mock_create_calendar.return_value = MagicMock(empty=False)
+    mock_create_line_detail.return_value = MagicMock(empty=False)
+
+    raw_storage_dir = tmp_path / "raw" / "emt" / "2024/10/08" / "eta"
+    raw_storage_dir.mkdir(parents=True)
+    for minute in ["00", "01", "02"]:
+        with open(raw_storage_dir / f"eta_1_2024-10-08T10{minute}.json", "w") as f:
+            json.dump(eta_content(1, 10, f"2024-10-08T10:{minute}:00"), f)
+
+    create_emt(settings, "2024/10/08")
+
+    # Cada bloque se une por separado
+    assert mock_join_eta.call_count >= 2
+    df = read_dataset("emt", "20241008", "20241009", storage_path=str(tmp_path))
+    assert len(df) == 3
+    assert df["datetime"].is_monotonic_increasing
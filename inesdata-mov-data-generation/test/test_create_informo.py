@@ -71,17 +71,12 @@ def test_generate_df_from_file_no_pm_key(mock_logger):
 ###################### generate_day_df
 @patch('inesdata_mov_datasets.sources.create.informo.logger')
 @patch('inesdata_mov_datasets.sources.create.informo.os.listdir')
-@patch('inesdata_mov_datasets.sources.create.informo.open', new_callable=mock_open, read_data='{"pms": [{"valor": 10, "fecha_hora": "2024-10-01 12:00:00"}]}')
-@patch('inesdata_mov_datasets.sources.create.informo.generate_df_from_file')
-
-def test_generate_day_df_valid_data(mock_generate_df_from_file, mock_open, mock_listdir, mock_logger):
+@patch('inesdata_mov_datasets.sources.create.informo.open_raw', new_callable=mock_open, read_data='{"pms": {"pm": [{"idelem": "1001", "intensidad": 10}], "fecha_hora": "01/10/2024 12:00:00"}}')
+def test_generate_day_df_valid_data(mock_open, mock_listdir, mock_logger, tmp_path):
     """Test para verificar la generación de DataFrame con datos válidos."""
     mock_listdir.return_value = ["file1.json", "file2.json"]
-    mock_generate_df_from_file.return_value = pd.DataFrame(
-        {"valor": [10], 
-        "datetime": pd.to_datetime("2024-10-01 12:00:00")})
 
-    storage_path = "/tmp"
+    storage_path = str(tmp_path)
     date = "2024/10/01"
 
     # Ejecutar la función
@@ -91,6 +86,34 @@ def test_generate_day_df_valid_data(mock_generate_df_from_file, mock_open, mock_
     processed_file_path = Path(storage_path) / Path("processed") / "informo" / date / f"informo_{date.replace('/', '')}.csv"
     assert processed_file_path.is_file(), "El archivo procesado no fue creado"
 
+    # Verificar que se juntaron los registros de todos los ficheros
+    df = pd.read_csv(processed_file_path)
+    assert list(df.columns) == ["idelem", "intensidad", "datetime", "date"]
+    assert len(df) == 2
+    assert list(df["date"]) == ["2024-10-01", "2024-10-01"]
+
+@patch('inesdata_mov_datasets.sources.create.informo.logger')
+@patch('inesdata_mov_datasets.sources.create.informo.os.listdir')
+@patch('inesdata_mov_datasets.sources.create.informo.open_raw', new_callable=mock_open, read_data='{"pms": {"pm": [{"idelem": "1001", "intensidad": 10}], "fecha_hora": "01/10/2024 12:00:00"}}')
+def test_generate_day_df_parquet(mock_open, mock_listdir, mock_logger, tmp_path):
+    """Test para verificar que el DataFrame del día se exporta a Parquet conservando los tipos."""
+    mock_listdir.return_value = ["file1.json", "file2.json"]
+
+    storage_path = str(tmp_path)
+    date = "2024/10/01"
+
+    # Ejecutar la función
+    generate_day_df(storage_path, date, output_format="parquet")
+
+    processed_file_path = Path(storage_path) / Path("processed") / "informo" / date / f"informo_{date.replace('/', '')}.parquet"
+    assert processed_file_path.is_file(), "El archivo procesado no fue creado"
+
+    # Verificar que las fechas no se leen como texto y los elementos se codifican como diccionario
+    df = pd.read_parquet(processed_file_path)
+    assert len(df) == 2
+    assert pd.api.types.is_datetime64_any_dtype(df["datetime"])
+    assert isinstance(df["idelem"].dtype, pd.CategoricalDtype)
+
 @patch('inesdata_mov_datasets.sources.create.informo.logger')
 @patch('inesdata_mov_datasets.sources.create.informo.os.listdir')
 def test_generate_day_df_no_files(mock_listdir, mock_logger):
@@ -169,10 +192,15 @@ def test_create_informo(mock_error, mock_debug, mock_info, mock_generate_day_df,
         endpoint_url=mock_settings.storage.config.minio.endpoint,
         aws_access_key_id=mock_settings.storage.config.minio.access_key,
         aws_secret_access_key=mock_settings.storage.config.minio.secret_key,
+        max_downloads=mock_settings.storage.config.minio.max_downloads,
     )
 
     # Verificar que se llama a generate_day_df
-    mock_generate_day_df.assert_called_once_with(storage_path=mock_settings.storage.config.local.path, date=date)
+    mock_generate_day_df.assert_called_once_with(
+        storage_path=mock_settings.storage.config.local.path,
+        date=date,
+        output_format=mock_settings.storage.output_format,
+    )
 
     # Verificar que se llama a logger.debug
     mock_debug.assert_called()
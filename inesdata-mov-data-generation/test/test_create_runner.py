@@ -0,0 +1,114 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from typer.testing import CliRunner
+
+from inesdata_mov_datasets.__main__ import app
+from inesdata_mov_datasets.handlers import logger as logger_handler
+from inesdata_mov_datasets.handlers.logger import instantiate_logger, set_worker_id
+from inesdata_mov_datasets.sources.create.runner import create_dataset, create_datasets
+
+###################### create_dataset
+@patch('inesdata_mov_datasets.sources.create.runner.create_informo')
+@patch('inesdata_mov_datasets.sources.create.runner.create_aemet')
+@patch('inesdata_mov_datasets.sources.create.runner.create_emt')
+def test_create_dataset(mock_create_emt, mock_create_aemet, mock_create_informo):
+    """Test para verificar que cada fuente llama a su función de creación."""
+    settings = MagicMock()
+
+    seconds = create_dataset(settings, "emt", "2024/10/01", stream=True)
+    create_dataset(settings, "aemet", "2024/10/01")
+    create_dataset(settings, "informo", "2024/10/01")
+
+    assert seconds >= 0
+    mock_create_emt.assert_called_once_with(
+        settings=settings, date="2024/10/01", stream=True, incremental=False
+    )
+    mock_create_aemet.assert_called_once_with(settings=settings, date="2024/10/01")
+    mock_create_informo.assert_called_once_with(settings=settings, date="2024/10/01")
+
+
+def test_create_dataset_unknown_source():
+    """Test para verificar que una fuente desconocida lanza un error."""
+    with pytest.raises(ValueError):
+        create_dataset(MagicMock(), "unknown", "2024/10/01")
+
+###################### create_datasets
+@patch('inesdata_mov_datasets.sources.create.runner.set_worker_id')
+@patch('inesdata_mov_datasets.sources.create.runner.ProcessPoolExecutor', ThreadPoolExecutor)
+@patch('inesdata_mov_datasets.sources.create.runner.create_dataset')
+def test_create_datasets(mock_create_dataset, mock_set_worker_id):
+    """Test para verificar que se crean todas las combinaciones de fecha y fuente en paralelo."""
+    def fake_create_dataset(settings, source, date, stream, incremental):
+        return 1.5 if source == "emt" else 0.5
+
+    mock_create_dataset.side_effect = fake_create_dataset
+
+    results = list(create_datasets(MagicMock(), ["2024/10/01", "2024/10/02"], ["emt", "informo"], False, 2))
+
+    assert sorted(results) == [
+        ("2024/10/01", "emt", 1.5),
+        ("2024/10/01", "informo", 0.5),
+        ("2024/10/02", "emt", 1.5),
+        ("2024/10/02", "informo", 0.5),
+    ]
+    # Cada worker recibe un identificador distinto
+    worker_ids = sorted(call.args[0] for call in mock_set_worker_id.call_args_list)
+    assert worker_ids == list(range(len(worker_ids)))
+
+###################### instantiate_logger
+@patch('inesdata_mov_datasets.handlers.logger.logger')
+def test_instantiate_logger_worker(mock_logger):
+    """Test para verificar que cada worker escribe en su propio fichero de log."""
+    settings = MagicMock()
+    settings.storage.logs.path = "/tmp/logs"
+    logger_handler._handler = None
+    try:
+        instantiate_logger(settings, "EMT", "create")
+        assert mock_logger.add.call_args.args[0] == "/tmp/logs/create/inesdata_mov_{time:YYYY_MM_DD}.log"
+
+        set_worker_id(3)
+        instantiate_logger(settings, "EMT", "create")
+        assert mock_logger.add.call_args.args[0] == "/tmp/logs/create/inesdata_mov_{time:YYYY_MM_DD}_worker_3.log"
+    finally:
+        logger_handler._worker_id = None
+        logger_handler._handler = None
+
+
+@patch('inesdata_mov_datasets.handlers.logger.logger')
+def test_instantiate_logger_once(mock_logger):
+    """Test para verificar que el fichero de log se configura una sola vez por proceso."""
+    settings = MagicMock()
+    settings.storage.logs.path = "/tmp/logs"
+    settings.storage.logs.level = "DEBUG"
+    try:
+        # Cada tick del demonio y cada fuente concurrente vuelven a llamar a instantiate_logger
+        instantiate_logger(settings, "EMT", "extract")
+        instantiate_logger(settings, "AEMET", "extract")
+
+        assert mock_logger.add.call_count == 1
+        assert mock_logger.remove.call_count == 1
+        mock_logger.configure.assert_called_with(extra={"source": "AEMET"})
+    finally:
+        logger_handler._handler = None
+
+###################### create --workers
+@patch('inesdata_mov_datasets.__main__.read_settings')
+@patch('inesdata_mov_datasets.__main__.create_datasets')
+def test_command_create_workers(mock_create_datasets, mock_read_settings):
+    """Test para verificar el modo con varios workers y el resumen de tiempos."""
+    mock_create_datasets.return_value = iter([("2024/10/01", "emt", 2.0), ("2024/10/02", "emt", 3.25)])
+
+    result = CliRunner().invoke(
+        app,
+        ["create", "--config-path", "config.yaml", "--start-date", "20241001", "--end-date", "20241003", "--sources", "emt", "--workers", "2"],
+    )
+
+    assert result.exit_code == 0
+    kwargs = mock_create_datasets.call_args.kwargs
+    assert kwargs["dates"] == ["2024/10/01", "2024/10/02"]
+    assert kwargs["sources"] == ["emt"]
+    assert kwargs["workers"] == 2
+    assert "2024/10/01" in result.stdout
+    assert "3.2" in result.stdout
@@ -0,0 +1,124 @@
+import pandas as pd
+from pathlib import Path
+
+from inesdata_mov_datasets import read_dataset
+from inesdata_mov_datasets.dataset import dataset_files, filter_expression
+from inesdata_mov_datasets.utils import write_processed_df
+
+
+def write_emt_day(storage_path: Path, date: str, lines: list):
+    """Exporta a Parquet un dataset de EMT de un día con una fila por línea."""
+    processed_dir = storage_path / "processed" / "emt" / date
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame({
+        "datetime": pd.date_range(date.replace("/", "-") + " 10:00", periods=len(lines), freq="min"),
+        "line": lines,
+        "stop": [100 + i for i in range(len(lines))],
+    })
+    write_processed_df(
+        df, processed_dir / f"emt_{date.replace('/', '')}", "parquet", dictionary_columns=("line", "stop")
+    )
+
+
+###################### dataset_files
+def test_dataset_files(tmp_path):
+    """Test para verificar que solo se listan los ficheros de los días pedidos."""
+    for date in ["2024/10/07", "2024/10/08", "2024/10/09"]:
+        write_emt_day(tmp_path, date, ["1"])
+    # Los días exportados en CSV no se leen
+    (tmp_path / "processed" / "emt" / "2024" / "10" / "10").mkdir(parents=True)
+    (tmp_path / "processed" / "emt" / "2024" / "10" / "10" / "emt_20241010.csv").write_text("a\n1\n")
+
+    files = dataset_files(str(tmp_path), "emt", "20241008", "20241011")
+
+    assert [Path(file).name for file in files] == ["emt_20241008.parquet", "emt_20241009.parquet"]
+
+
+###################### filter_expression
+def test_filter_expression():
+    """Test para verificar la expresión generada a partir de los filtros."""
+    assert filter_expression({}) is None
+    expression = filter_expression({"line": ["1", "27"], "stop": 100, "datetime": (None, None)})
+    assert "is_in" in str(expression)
+    assert "(stop == 100)" in str(expression)
+    assert "datetime" not in str(expression)
+
+
+###################### read_dataset
+def test_read_dataset(tmp_path):
+    """Test para verificar la lectura de un rango de fechas filtrando por línea y fecha."""
+    write_emt_day(tmp_path, "2024/10/07", ["1", "2"])
+    write_emt_day(tmp_path, "2024/10/08", ["1", "2", "27"])
+    write_emt_day(tmp_path, "2024/10/09", ["1", "27"])
+
+    df = read_dataset(
+        "emt",
+        "20241008",
+        "20241010",
+        {"line": ["1", "27"], "datetime": (pd.Timestamp("2024-10-08 10:01"), None)},
+        storage_path=str(tmp_path),
+    )
+
+    assert list(df["line"]) == ["27", "1", "27"]
+    assert df["datetime"].min() == pd.Timestamp("2024-10-08 10:02")
+    assert isinstance(df["line"].dtype, pd.CategoricalDtype)
+
+    # Solo se leen las columnas pedidas
+    df = read_dataset("emt", "20241007", "20241008", storage_path=str(tmp_path), columns=["stop"])
+    assert list(df.columns) == ["stop"]
+    assert len(df) == 2
+
+
+def test_read_dataset_no_files(tmp_path):
+    """Test para verificar que se devuelve un DataFrame vacío si no hay datasets en el rango."""
+    df = read_dataset("emt", "20241008", "20241010", storage_path=str(tmp_path))
+
+    assert df.empty
+
+
+def test_read_dataset_appended_parts(tmp_path):
+    """Test para verificar que se leen las partes añadidas por una creación incremental."""
+    processed_dir = tmp_path / "processed" / "emt" / "2024/10/08"
+    processed_dir.mkdir(parents=True)
+    path = processed_dir / "emt_20241008"
+    first = pd.DataFrame({"datetime": pd.to_datetime(["2024-10-08 10:00"]), "line": ["1"]})
+    second = pd.DataFrame({"datetime": pd.to_datetime(["2024-10-08 10:01"]), "line": ["2"]})
+
+    write_processed_df(first, path, "parquet", dictionary_columns=("line",))
+    part = write_processed_df(second, path, "parquet", dictionary_columns=("line",), append=True)
+
+    assert part.name == "emt_20241008-1.parquet"
+    df = read_dataset("emt", "20241008", "20241009", storage_path=str(tmp_path))
+    assert list(df["line"]) == ["1", "2"]
+
+    # Una exportación completa reemplaza el día con sus partes
+    write_processed_df(second, path, "parquet", dictionary_columns=("line",))
+    assert not part.exists()
+    df = read_dataset("emt", "20241008", "20241009", storage_path=str(tmp_path))
+    assert list(df["line"]) == ["2"]
+
+
+def test_read_dataset_schema_drift(tmp_path):
+    """Test para verificar que se leen partes y días con tipos distintos en una misma columna."""
+    for date, parts in [
+        ("2024/10/08", [[1, 2], [1.5]]),  # la parte añadida tiene la columna como float
+        ("2024/10/09", [[None]]),  # otro día sin ningún valor en la columna
+    ]:
+        processed_dir = tmp_path / "processed" / "emt" / date
+        processed_dir.mkdir(parents=True)
+        for i, frequencies in enumerate(parts):
+            df = pd.DataFrame({
+                "datetime": pd.date_range(date.replace("/", "-") + f" 1{i}:00", periods=len(frequencies), freq="min"),
+                "line": ["1"] * len(frequencies),
+                "MinimunFrequency": frequencies,
+            })
+            write_processed_df(
+                df, processed_dir / f"emt_{date.replace('/', '')}", "parquet", dictionary_columns=("line",), append=i > 0
+            )
+
+    df = read_dataset("emt", "20241008", "20241010", storage_path=str(tmp_path))
+
+    assert str(df["MinimunFrequency"].dtype) == "float64"
+    assert df["MinimunFrequency"].tolist()[:3] == [1.0, 2.0, 1.5]
+    assert pd.isna(df["MinimunFrequency"].iloc[3])
+    assert list(df["line"]) == ["1"] * 4
@@ -37,7 +37,8 @@ async def test_download_aemet_success():
             output_path,
             endpoint_url,
             aws_access_key_id,
-            aws_secret_access_key
+            aws_secret_access_key,
+            max_downloads=50,
         )
 
 @pytest.mark.asyncio
@@ -73,5 +74,6 @@ async def test_download_aemet_exception():
             output_path,
             endpoint_url,
             aws_access_key_id,
-            aws_secret_access_key
+            aws_secret_access_key,
+            max_downloads=50,
         )
\ No newline at end of file
@@ -1,10 +1,11 @@
 import pytest
 from unittest.mock import MagicMock, patch, AsyncMock
-import requests
+from aioresponses import aioresponses
+from yarl import URL
 import datetime
 from pathlib import Path
 import pytz
-from inesdata_mov_datasets.sources.extract.aemet import get_aemet, save_aemet  # Cambia esto por el nombre real de tu módulo
+from inesdata_mov_datasets.sources.extract.aemet import AEMET_URL_MADRID, get_aemet, save_aemet  # Cambia esto por el nombre real de tu módulo
 
 ###################### get_aemet
 @pytest.fixture
@@ -20,20 +21,24 @@ def mock_settings():
 @patch('inesdata_mov_datasets.sources.extract.aemet.logger.info')  # Cambia esto por el nombre real de tu módulo
 @patch('inesdata_mov_datasets.sources.extract.aemet.logger.debug')  # Cambia esto por el nombre real de tu módulo
 @patch('inesdata_mov_datasets.sources.extract.aemet.logger.error')  # Cambia esto por el nombre real de tu módulo
-@patch('inesdata_mov_datasets.sources.extract.aemet.requests.get')  # Cambia esto por el nombre real de tu módulo
 @patch('inesdata_mov_datasets.sources.extract.aemet.save_aemet')  # Cambia esto por el nombre real de tu módulo
 @pytest.mark.asyncio
-async def test_get_aemet(mock_save_aemet, mock_requests_get, mock_error, mock_debug, mock_info, mock_instantiate_logger, mock_settings):
+async def test_get_aemet(mock_save_aemet, mock_error, mock_debug, mock_info, mock_instantiate_logger, mock_settings):
     """Test para verificar la extracción de datos de AEMET."""
     
-    # Configura la respuesta simulada de requests.get
-    mock_requests_get.side_effect = [
-        MagicMock(status_code=200, json=lambda: {"datos": "https://example.com/aemet_data.json"}),  # Primera llamada para la URL de AEMET
-        MagicMock(status_code=200, json=lambda: {"temperature": 22})  # Segunda llamada para los datos
-    ]
+    with aioresponses() as mocked:
+        # Primera llamada para la URL de AEMET (AEMET no siempre responde con content type json)
+        mocked.get(AEMET_URL_MADRID, payload={"datos": "https://example.com/aemet_data.json"}, content_type="text/plain")
+        # Segunda llamada para los datos
+        mocked.get("https://example.com/aemet_data.json", payload={"temperature": 22})
 
-    # Ejecutar la función
-    await get_aemet(mock_settings)
+        # Ejecutar la función
+        await get_aemet(mock_settings)
+
+        # Verificar que se hacen las dos peticiones y la primera lleva la api key
+        assert len(mocked.requests) == 2
+        first_call = mocked.requests[("GET", URL(AEMET_URL_MADRID))][0]
+        assert first_call.kwargs["headers"]["api_key"] == "test-api-key"
 
     # Verificar que se llama a instantiate_logger
     mock_instantiate_logger.assert_called_once_with(mock_settings, "AEMET", "extract")
@@ -42,15 +47,26 @@ async def test_get_aemet(mock_save_aemet, mock_requests_get, mock_error, mock_de
     mock_info.assert_any_call("Extracting AEMET")
     mock_info.assert_any_call("Extracted AEMET")
 
-    # Verificar que se llama a requests.get dos veces
-    assert mock_requests_get.call_count == 2
-
     # Verificar que se llama a save_aemet con los datos obtenidos
     mock_save_aemet.assert_called_once_with(mock_settings, {"temperature": 22})
 
     # Verificar que se llama a logger.debug
     mock_debug.assert_called()
 
+@patch('inesdata_mov_datasets.sources.extract.aemet.instantiate_logger')
+@patch('inesdata_mov_datasets.sources.extract.aemet.logger.error')
+@patch('inesdata_mov_datasets.sources.extract.aemet.save_aemet')
+@pytest.mark.asyncio
+async def test_get_aemet_http_error(mock_save_aemet, mock_error, mock_instantiate_logger, mock_settings):
+    """Test para verificar que un error HTTP de AEMET se registra y no se guarda nada."""
+    with aioresponses() as mocked:
+        mocked.get(AEMET_URL_MADRID, status=429)
+
+        await get_aemet(mock_settings)
+
+    mock_save_aemet.assert_not_called()
+    assert mock_error.call_count == 2
+
 ###################### save_aemet
 @pytest.fixture
 def mock_settings_minio():
@@ -64,6 +80,7 @@ def mock_settings_minio():
     settings.storage.config.minio.access_key = "test-access-key"
     settings.storage.config.minio.secret_key = "test-secret-key"
     settings.storage.default = "minio"  # Cambia esto a "local" para otro test
+    settings.storage.compression = None  # ficheros sin comprimir
     return settings
 
 @pytest.fixture
@@ -71,6 +88,7 @@ def mock_settings_local():
     """Fixture para simular la configuración de settings con almacenamiento local."""
     settings = MagicMock()
     settings.storage.default = "local"
+    settings.storage.compression = None  # ficheros sin comprimir
     settings.storage.config.local.path = "/tmp"
     return settings
 
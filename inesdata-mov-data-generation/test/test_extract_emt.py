@@ -5,9 +5,49 @@ from unittest.mock import patch, AsyncMock, MagicMock
 import os
 import json
 import datetime
-from inesdata_mov_datasets.sources.extract.emt import get_calendar, get_line_detail, get_eta, login_emt, token_control,  get_emt
+from inesdata_mov_datasets.sources.extract import emt
+from inesdata_mov_datasets.sources.extract.emt import get_calendar, get_line_detail, get_eta, login_emt, token_control,  get_emt, get_stored_objects, get_emt_limiter, save_limiter_state
 from inesdata_mov_datasets.settings import Settings
 
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    """Fixture para que cada test empiece sin tokens ni limitador en memoria."""
+    emt._token_cache.clear()
+    emt._token_refreshes.clear()
+    emt._emt_limiter = None
+    yield
+    emt._token_cache.clear()
+    emt._token_refreshes.clear()
+    emt._emt_limiter = None
+
+
+@pytest.fixture(autouse=True)
+def skip_limiter_state(monkeypatch):
+    """Fixture para que las extracciones de los tests no guarden el límite del limitador en disco."""
+    monkeypatch.setattr(emt, "save_limiter_state", lambda config, limiter: None)
+
+
+###################### get_emt_limiter
+def test_get_emt_limiter_saved_state(tmp_path):
+    """Test para verificar que el limitador empieza en el límite alcanzado por la ejecución anterior."""
+    settings = MagicMock()
+    settings.storage.config.local.path = str(tmp_path)
+    settings.sources.emt.initial_concurrency = 10
+    settings.sources.emt.max_concurrency = 100
+    settings.sources.emt.max_requests_per_second = None
+    settings.sources.emt.latency_target = 2.0
+
+    # Sin estado guardado se empieza en initial_concurrency
+    limiter = get_emt_limiter(settings)
+    assert limiter.concurrency == 10
+
+    limiter.limit = 64
+    save_limiter_state(settings, limiter)
+    emt._emt_limiter = None
+
+    assert get_emt_limiter(settings).concurrency == 64
+
 ###################### get_calendar
 @pytest.mark.asyncio
 async def test_get_calendar():
@@ -165,65 +205,60 @@ def mock_settings():
     settings.sources.emt.credentials.x_client_id = "test_client_id"
     settings.sources.emt.credentials.passkey = "test_passkey"
     settings.storage.default = "local"
+    settings.storage.compression = None  # ficheros sin comprimir
     return settings
 
-@patch('inesdata_mov_datasets.sources.extract.emt.requests.get')
 @patch('builtins.open', new_callable=MagicMock)
 @patch('os.makedirs')
 @pytest.mark.asyncio
-async def test_login_emt_success(mock_makedirs, mock_open, mock_requests_get, mock_settings):
+async def test_login_emt_success(mock_makedirs, mock_open, mock_settings):
     """Test para verificar el inicio de sesión exitoso en EMT."""
 
     # Simula la respuesta de la API
-    mock_response = MagicMock()
-    mock_response.json.return_value = {
-        "data": [{"accessToken": "mock_access_token"}]
-    }
-    mock_requests_get.return_value = mock_response
-
-    # Llama a la función
-    token = await login_emt(mock_settings, object_login_name="login_response.json", local_path="/test/storage/")
-    # Verifica que el token retornado sea el esperado
-    assert token == "mock_access_token"
-
-    # Verifica que se llamara a requests.get con los headers correctos
-    mock_requests_get.assert_called_once_with(
-        "https://openapi.emtmadrid.es/v2/mobilitylabs/user/login/",
-        headers={
+    with aioresponses() as mocked:
+        mocked.get(
+            "https://openapi.emtmadrid.es/v2/mobilitylabs/user/login/",
+            payload={"data": [{"accessToken": "mock_access_token"}]},
+        )
+
+        # Llama a la función
+        token = await login_emt(mock_settings, object_login_name="login_response.json", local_path="/test/storage/")
+
+        # Verifica que se llamara al login con los headers correctos
+        assert len(mocked.requests) == 1
+        request = list(mocked.requests.values())[0][0]
+        assert request.kwargs["headers"] == {
             "X-ClientId": "test_client_id",
             "passKey": "test_passkey",
             "Content-Type": "application/json",
             "Accept": "application/json",
-        },
-        verify=True
-    )
+        }
+
+    # Verifica que el token retornado sea el esperado
+    assert token == "mock_access_token"
 
     # Verifica que se creara el directorio si no existe
     mock_makedirs.assert_called_once_with("/test/storage/", exist_ok=True)
 
     # Verifica que se escribiera el archivo con la respuesta de la API
-    mock_open.assert_called_once_with("/test/storage/login_response.json", "w")
+    mock_open.assert_called_once_with("/test/storage/login_response.json", "wb")
 
-@patch('inesdata_mov_datasets.sources.extract.emt.requests.get')
 @pytest.mark.asyncio
-async def test_login_emt_failure(mock_requests_get, mock_settings):
+async def test_login_emt_failure(mock_settings):
     """Test para verificar el manejo de errores en el inicio de sesión."""
 
     # Simula una respuesta de error de la API
-    mock_response = MagicMock()
-    mock_response.json.return_value = {
-        "data": []
-    }
-    mock_requests_get.return_value = mock_response
+    with aioresponses() as mocked:
+        mocked.get("https://openapi.emtmadrid.es/v2/mobilitylabs/user/login/", payload={"data": []})
 
-    # Llama a la función
-    token = await login_emt(mock_settings, "login_response.json")
+        # Llama a la función
+        token = await login_emt(mock_settings, "login_response.json")
+
+        # Verifica que se llamara al login una vez
+        assert len(mocked.requests) == 1
 
     # Verifica que el token retornado sea una cadena vacía
     assert token == ""
-
-    # Verifica que se llamara a requests.get una vez
-    mock_requests_get.assert_called_once()
     
 #TODO ###################### token_control
 @pytest.fixture
@@ -231,6 +266,7 @@ def mock_config():
     """Fixture para simular la configuración de settings."""
     settings = MagicMock()
     settings.storage.default = "local"  # Cambiar a "minio" si es necesario para otros tests
+    settings.storage.compression = None  # ficheros sin comprimir
     settings.storage.config.local.path = "/tmp"
     return settings
 
@@ -280,6 +316,7 @@ def mock_config_minio():
     """Fixture para simular la configuración de settings."""
     settings = MagicMock()
     settings.storage.default = "minio"  # Cambiar a "minio" si es necesario para otros tests
+    settings.storage.compression = None  # ficheros sin comprimir
     settings.storage.config.local.path = "/tmp"
     return settings
 
@@ -299,6 +336,130 @@ async def test_token_control_minio_file_not_exists(mock_login_emt, mock_check_s3
     mock_check_s3_file_exists.assert_called_once()
 
 
+@patch('inesdata_mov_datasets.sources.extract.emt.check_s3_file_exists')
+@patch('inesdata_mov_datasets.sources.extract.emt.login_emt')
+@pytest.mark.asyncio
+async def test_token_control_stored_objects(mock_login_emt, mock_check_s3_file_exists, mock_config_minio):
+    """Test para verificar que no se consulta MinIO si se conocen los objetos guardados."""
+    mock_login_emt.return_value = "fake_token"
+
+    token = await token_control(mock_config_minio, "2023/10/09", "20231009", stored_objects=set())
+
+    assert token == "fake_token"
+    mock_login_emt.assert_called_once()
+    mock_check_s3_file_exists.assert_not_called()
+
+
+###################### token cache
+def login_response(token, expires_in):
+    """Respuesta del login de EMT con un token que caduca en expires_in."""
+    expiration = datetime.datetime.now(datetime.timezone.utc) + expires_in
+    return {"data": [{"accessToken": token, "tokenDteExpiration": {"$date": expiration.timestamp() * 1000}}]}
+
+
+@patch('inesdata_mov_datasets.sources.extract.emt.check_s3_file_exists')
+@patch('inesdata_mov_datasets.sources.extract.emt.read_obj', new_callable=AsyncMock)
+@patch('inesdata_mov_datasets.sources.extract.emt.login_emt', new_callable=AsyncMock)
+@pytest.mark.asyncio
+async def test_token_control_cached(mock_login_emt, mock_read_obj, mock_check_s3_file_exists, mock_config_minio):
+    """Test para verificar que el login guardado solo se lee en el arranque en frío."""
+    mock_read_obj.return_value = json.dumps(login_response("stored_token", datetime.timedelta(hours=12)))
+
+    tokens = [await token_control(mock_config_minio, "2024/10/08", "20241008", stored_objects={"login_20241008.json"}) for _ in range(3)]
+
+    assert tokens == ["stored_token"] * 3
+    mock_read_obj.assert_called_once()
+    mock_login_emt.assert_not_called()
+    mock_check_s3_file_exists.assert_not_called()
+
+
+@patch('inesdata_mov_datasets.sources.extract.emt.upload_objs', new_callable=AsyncMock)
+@pytest.mark.asyncio
+async def test_token_control_refresh_in_background(mock_upload_objs, mock_config_minio):
+    """Test para verificar que un token a punto de caducar se renueva en segundo plano."""
+    emt.cache_token(mock_config_minio, login_response("old_token", datetime.timedelta(minutes=5)))
+
+    with aioresponses() as mocked:
+        mocked.get(
+            "https://openapi.emtmadrid.es/v2/mobilitylabs/user/login/",
+            payload=login_response("new_token", datetime.timedelta(hours=24)),
+        )
+
+        # Mientras se renueva se sigue usando el token vigente y solo se lanza un login
+        assert await token_control(mock_config_minio, "2024/10/08", "20241008") == "old_token"
+        assert await token_control(mock_config_minio, "2024/10/08", "20241008") == "old_token"
+        await emt._token_refreshes[emt.get_credentials_key(mock_config_minio)]
+
+        assert len(mocked.requests) == 1
+
+    assert await token_control(mock_config_minio, "2024/10/08", "20241008") == "new_token"
+    mock_upload_objs.assert_called_once()
+
+
+@patch('inesdata_mov_datasets.sources.extract.emt.login_emt', new_callable=AsyncMock)
+@pytest.mark.asyncio
+async def test_token_control_cache_expired(mock_login_emt, mock_config):
+    """Test para verificar que un token caducado en memoria no se usa."""
+    emt.cache_token(mock_config, login_response("expired_token", datetime.timedelta(minutes=-1)))
+    mock_login_emt.return_value = "new_token"
+
+    token = await token_control(mock_config, "2024/10/08", "20241008", stored_objects=set())
+
+    assert token == "new_token"
+    mock_login_emt.assert_called_once()
+
+
+###################### get_stored_objects
+@pytest.fixture
+def clear_stored_objects_cache():
+    """Fixture para limpiar la caché de objetos diarios."""
+    emt._stored_objects_cache.clear()
+    yield
+    emt._stored_objects_cache.clear()
+
+
+@patch('inesdata_mov_datasets.sources.extract.emt.list_s3_keys', new_callable=AsyncMock)
+@pytest.mark.asyncio
+async def test_get_stored_objects_minio(mock_list_s3_keys, mock_config_minio, clear_stored_objects_cache):
+    """Test para verificar que se lista cada directorio una única vez al día."""
+    mock_list_s3_keys.side_effect = [
+        ["raw/emt/2024/10/08/line_detail/line_detail_1_20241008.json"],
+        ["raw/emt/2024/10/08/calendar/calendar_20241008.json"],
+        [],
+    ]
+
+    stored_objects = await get_stored_objects(mock_config_minio, "2024/10/08")
+    assert stored_objects == {"line_detail_1_20241008.json", "calendar_20241008.json"}
+    # Una petición por directorio (line_detail, calendar, login) sin importar el número de líneas
+    assert mock_list_s3_keys.call_count == 3
+    prefixes = [call.kwargs["prefix"] for call in mock_list_s3_keys.call_args_list]
+    assert prefixes == [
+        "raw/emt/2024/10/08/line_detail/",
+        "raw/emt/2024/10/08/calendar/",
+        "raw/emt/2024/10/08/login/",
+    ]
+
+    # La segunda llamada del mismo día usa la caché
+    assert await get_stored_objects(mock_config_minio, "2024/10/08") is stored_objects
+    assert mock_list_s3_keys.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_get_stored_objects_local(tmp_path, clear_stored_objects_cache):
+    """Test para verificar el listado de objetos diarios en almacenamiento local."""
+    settings = MagicMock()
+    settings.storage.default = "local"
+    settings.storage.compression = None  # ficheros sin comprimir
+    settings.storage.config.local.path = str(tmp_path)
+    line_detail_dir = tmp_path / "raw" / "emt" / "2024/10/08" / "line_detail"
+    line_detail_dir.mkdir(parents=True)
+    (line_detail_dir / "line_detail_1_20241008.json").write_text("{}")
+
+    stored_objects = await get_stored_objects(settings, "2024/10/08")
+
+    assert stored_objects == {"line_detail_1_20241008.json"}
+
+
 ###################### get_emt
 @pytest.fixture
 def mock_settings_get_emt():
@@ -307,7 +468,12 @@ def mock_settings_get_emt():
     settings.sources = MagicMock()
     settings.sources.emt.lines = ["line1", "line2"]  # Ejemplo de líneas
     settings.sources.emt.stops = ["1", "2"]  # Ejemplo de paradas
+    settings.sources.emt.initial_concurrency = 10
+    settings.sources.emt.max_concurrency = 100
+    settings.sources.emt.max_requests_per_second = None
+    settings.sources.emt.latency_target = 2.0
     settings.storage.default = "local"  # Cambia a "minio" si es necesario
+    settings.storage.compression = None  # ficheros sin comprimir
     settings.storage.config.local.path = "/fake/path"  # Ruta ficticia para pruebas
     return settings
 
@@ -323,8 +489,9 @@ def mock_settings_get_emt():
 @patch('inesdata_mov_datasets.sources.extract.emt.upload_objs')  
 @patch('inesdata_mov_datasets.sources.extract.emt.check_local_file_exists')  
 @patch('inesdata_mov_datasets.sources.extract.emt.check_s3_file_exists')  
+@patch('inesdata_mov_datasets.sources.extract.emt.get_stored_objects', new_callable=AsyncMock)  
 @pytest.mark.asyncio
-async def test_get_emt_local(mock_check_s3_file_exists, mock_check_local_file_exists, mock_upload_objs,
+async def test_get_emt_local(mock_get_stored_objects, mock_check_s3_file_exists, mock_check_local_file_exists, mock_upload_objs,
                         mock_get_eta, mock_get_calendar, mock_get_line_detail,
                         mock_token_control, mock_error, mock_debug, mock_info, mock_instantiate_logger, mock_settings_get_emt):
     """Test para verificar la extracción de datos de EMT."""
@@ -333,6 +500,7 @@ async def test_get_emt_local(mock_check_s3_file_exists, mock_check_local_file_ex
     mock_token_control.return_value = "fake_token"
     mock_check_local_file_exists.return_value = False  # Simula que los archivos no existen
     mock_check_s3_file_exists.return_value = False  # Simula que los archivos no existen en S3
+    mock_get_stored_objects.return_value = set()  # Simula que no hay ficheros diarios guardados
 
     # Simula las respuestas de los métodos asíncronos
     mock_get_line_detail.return_value = {"code": "00", "data": "line_data"}
@@ -366,6 +534,37 @@ async def test_get_emt_local(mock_check_s3_file_exists, mock_check_local_file_ex
     mock_debug.assert_called()
 
 
+@patch('inesdata_mov_datasets.sources.extract.emt.instantiate_logger')
+@patch('inesdata_mov_datasets.sources.extract.emt.token_control', new_callable=AsyncMock)
+@patch('inesdata_mov_datasets.sources.extract.emt.get_line_detail', new_callable=AsyncMock)
+@patch('inesdata_mov_datasets.sources.extract.emt.get_calendar', new_callable=AsyncMock)
+@patch('inesdata_mov_datasets.sources.extract.emt.get_eta', new_callable=AsyncMock)
+@patch('inesdata_mov_datasets.sources.extract.emt.get_stored_objects', new_callable=AsyncMock)
+@pytest.mark.asyncio
+async def test_get_emt_eta_bundle_local(mock_get_stored_objects, mock_get_eta, mock_get_calendar, mock_get_line_detail,
+                                        mock_token_control, mock_instantiate_logger, mock_settings_get_emt, tmp_path):
+    """Test para verificar que con el formato bundle se guarda un único fichero por minuto con todas las paradas."""
+    mock_settings_get_emt.storage.config.local.path = str(tmp_path)
+    mock_settings_get_emt.sources.emt.eta_layout = "bundle"
+    mock_settings_get_emt.sources.emt.eta_bundle_compression = None
+    mock_token_control.return_value = "fake_token"
+    mock_get_stored_objects.return_value = set()
+    mock_get_line_detail.return_value = {"code": "00", "data": "line_data"}
+    mock_get_calendar.return_value = {"code": "00", "data": "calendar_data"}
+    mock_get_eta.side_effect = [
+        {"code": "00", "data": "eta_stop_1"},
+        {"code": "00", "data": "eta_stop_2"},
+    ]
+
+    await get_emt(mock_settings_get_emt)
+
+    eta_files = list(tmp_path.glob("raw/emt/*/*/*/eta/*"))
+    assert len(eta_files) == 1
+    assert eta_files[0].name.endswith(".ndjson")
+    lines = eta_files[0].read_text().splitlines()
+    assert [json.loads(line)["data"] for line in lines] == ["eta_stop_1", "eta_stop_2"]
+
+
 @patch('inesdata_mov_datasets.sources.extract.emt.check_local_file_exists')
 @patch('inesdata_mov_datasets.sources.extract.emt.get_line_detail')
 @pytest.mark.asyncio
@@ -413,6 +612,7 @@ async def test_get_emt_calendar_errors_local(mock_logger_error,mock_get_calendar
 async def test_get_emt_minio_success():
     config = Settings()  # Instancia la configuración que se utiliza en producción.
     config.storage.default = "minio"
+    config.storage.compression = None  # ficheros sin comprimir
     
     # Mock del response de token_control
     with patch("inesdata_mov_datasets.sources.extract.emt.token_control", return_value="mocked_token") as mock_token_control:
@@ -446,7 +646,12 @@ def mock_settings_get_emt_minio():
     settings.sources = MagicMock()
     settings.sources.emt.lines = ["line1", "line2"]  # Ejemplo de líneas
     settings.sources.emt.stops = ["1", "2"]  # Ejemplo de paradas
+    settings.sources.emt.initial_concurrency = 10
+    settings.sources.emt.max_concurrency = 100
+    settings.sources.emt.max_requests_per_second = None
+    settings.sources.emt.latency_target = 2.0
     settings.storage.default = "minio"  # Cambia a "minio" si es necesario
+    settings.storage.compression = None  # ficheros sin comprimir
     settings.storage.config.minio.endpoint = "http://localhost:9000"
     settings.storage.config.minio.access_key = "minio_access_key"
     settings.storage.config.minio.secret_key =  "minio_secret_key"
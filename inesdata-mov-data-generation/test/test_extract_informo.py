@@ -1,11 +1,13 @@
 import pytest
 import asyncio
+import aiohttp
 from unittest.mock import MagicMock,patch, mock_open
-from inesdata_mov_datasets.sources.extract.informo import get_informo, save_informo
+from aioresponses import aioresponses
+from inesdata_mov_datasets.sources.extract.informo import INFORMO_URL, get_informo, save_informo
+from inesdata_mov_datasets.handlers.codec import json_dumps
 import xmltodict
 from pathlib import Path
 from loguru import logger
-import json
 import pytz
 import datetime
 
@@ -25,18 +27,21 @@ def mock_settings():
 @patch('inesdata_mov_datasets.sources.extract.informo.logger.info')  
 @patch('inesdata_mov_datasets.sources.extract.informo.logger.debug')  
 @patch('inesdata_mov_datasets.sources.extract.informo.logger.error')  
-@patch('inesdata_mov_datasets.sources.extract.informo.requests.get')  
 @patch('inesdata_mov_datasets.sources.extract.informo.save_informo')  
 @pytest.mark.asyncio
-async def test_get_informo(mock_save_informo, mock_requests_get, mock_error, mock_debug, mock_info, mock_instantiate_logger, mock_settings):
+async def test_get_informo(mock_save_informo, mock_error, mock_debug, mock_info, mock_instantiate_logger, mock_settings):
     """Test para verificar la extracción de datos de INFORMO."""
     
-    # Configurar la respuesta simulada de requests.get
+    # Configurar la respuesta simulada de la API
     mock_response_content = "<xml><data>Datos de ejemplo</data></xml>"
-    mock_requests_get.return_value = MagicMock(status_code=200, content=mock_response_content)
+    with aioresponses() as mocked:
+        mocked.get(INFORMO_URL, body=mock_response_content)
 
-    # Ejecutar la función
-    await get_informo(mock_settings)
+        # Ejecutar la función
+        await get_informo(mock_settings)
+
+        # Verificar que se hace una única petición
+        assert len(mocked.requests) == 1
 
     parsed_data = xmltodict.parse(mock_response_content)
 
@@ -47,8 +52,6 @@ async def test_get_informo(mock_save_informo, mock_requests_get, mock_error, moc
     mock_info.assert_any_call("Extracting INFORMO")
     mock_info.assert_any_call("Extracted INFORMO")
 
-    # Verificar que se llama a requests.get una vez
-    mock_requests_get.assert_called_once_with("https://informo.madrid.es/informo/tmadrid/pm.xml")
     # Verificar que se llama a save_informo con los datos obtenidos
     mock_save_informo.assert_called_once_with(mock_settings, parsed_data)
 
@@ -68,16 +71,16 @@ def mock_settings():
 # Test para manejar un error HTTP en la solicitud
 @patch('inesdata_mov_datasets.sources.extract.informo.instantiate_logger')   
 @patch('inesdata_mov_datasets.sources.extract.informo.logger.error')   
-@patch('inesdata_mov_datasets.sources.extract.informo.requests.get')   
 @pytest.mark.asyncio
-async def test_get_informo_http_error(mock_requests_get, mock_error_logger, mock_instantiate_logger, mock_settings):
+async def test_get_informo_http_error(mock_error_logger, mock_instantiate_logger, mock_settings):
     """Test para verificar que se captura un error HTTP."""
     
-    # Simular una excepción en requests.get
-    mock_requests_get.side_effect = Exception("Error en la conexión")
+    # Simular una excepción en la conexión
+    with aioresponses() as mocked:
+        mocked.get(INFORMO_URL, exception=aiohttp.ClientConnectionError("Error en la conexión"))
 
-    # Ejecutar la función
-    await get_informo(mock_settings)
+        # Ejecutar la función
+        await get_informo(mock_settings)
 
     # Verificar que se llama a instantiate_logger
     mock_instantiate_logger.assert_called_once_with(mock_settings, "INFORMO", "extract")
@@ -88,18 +91,17 @@ async def test_get_informo_http_error(mock_requests_get, mock_error_logger, mock
 # Test para manejar un error de parsing XML
 @patch('inesdata_mov_datasets.sources.extract.informo.instantiate_logger')   
 @patch('inesdata_mov_datasets.sources.extract.informo.logger.error')   
-@patch('inesdata_mov_datasets.sources.extract.informo.requests.get')   
 @patch('inesdata_mov_datasets.sources.extract.informo.save_informo')  
 @pytest.mark.asyncio
-async def test_get_informo_xml_parsing(mock_save_informo, mock_requests_get, mock_error_logger, mock_instantiate_logger, mock_settings):
+async def test_get_informo_xml_parsing(mock_save_informo, mock_error_logger, mock_instantiate_logger, mock_settings):
     """Test para verificar que se captura un error de parsing XML."""
     
     # Simular una respuesta XML no válida
-    mock_response = MagicMock(status_code=200, content="Invalid XML")
-    mock_requests_get.return_value = mock_response
+    with aioresponses() as mocked:
+        mocked.get(INFORMO_URL, body="Invalid XML")
 
-    # Ejecutar la función
-    await get_informo(mock_settings)
+        # Ejecutar la función
+        await get_informo(mock_settings)
 
     # Verificar que se llama a instantiate_logger
     mock_instantiate_logger.assert_called_once_with(mock_settings, "INFORMO", "extract")
@@ -117,6 +119,7 @@ def mock_settings_minio():
     """Fixture para simular la configuración de settings con almacenamiento Minio."""
     settings = MagicMock()
     settings.storage.default = "minio"
+    settings.storage.compression = None  # ficheros sin comprimir
     settings.storage.config.minio.endpoint = "http://minio.local"
     settings.storage.config.minio.access_key = "minio_access_key"
     settings.storage.config.minio.secret_key = "minio_secret_key"
@@ -128,6 +131,7 @@ def mock_settings_local():
     """Fixture para simular la configuración de settings con almacenamiento local."""
     settings = MagicMock()
     settings.storage.default = "local"
+    settings.storage.compression = None  # ficheros sin comprimir
     settings.storage.config.local.path = "/tmp"
     return settings
 
@@ -204,7 +208,7 @@ async def test_save_informo_local(mock_open_func, mock_check_local_file_exists,
     )
 
     # Verificar que se abrió el archivo correctamente para escribir los datos
-    mock_open_func.assert_called_once_with(Path(f"/tmp/raw/informo/{formatted_date_slash}") / f"informo_{formated_date}.json", "w")
+    mock_open_func.assert_called_once_with(Path(f"/tmp/raw/informo/{formatted_date_slash}") / f"informo_{formated_date}.json", "wb")
 
     # Verificar que se escribió el contenido JSON en el archivo
-    mock_open_func().write.assert_called_once_with(json.dumps(mock_data))
\ No newline at end of file
+    mock_open_func().write.assert_called_once_with(json_dumps(mock_data))
\ No newline at end of file
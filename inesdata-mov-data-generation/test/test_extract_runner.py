@@ -0,0 +1,155 @@
+import pytest
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+from inesdata_mov_datasets.sources.extract import runner
+from inesdata_mov_datasets.sources.extract.runner import extract_sources, run_daemon, run_periodically
+from inesdata_mov_datasets.utils import http_session, shared_http_session, storage_context
+
+###################### extract_sources
+@pytest.mark.asyncio
+async def test_extract_sources_concurrent():
+    """Test para verificar que las fuentes se extraen a la vez compartiendo la sesión HTTP."""
+    config = MagicMock()
+    config.storage.default = "local"
+    running = {"current": 0, "max": 0}
+    sessions = []
+
+    def fake_extractor(name):
+        async def extract(config):
+            running["current"] += 1
+            running["max"] = max(running["max"], running["current"])
+            async with http_session() as session:
+                sessions.append(session)
+            await asyncio.sleep(0.01)
+            running["current"] -= 1
+            if name == "aemet":
+                raise RuntimeError("boom")
+        return extract
+
+    extractors = {name: fake_extractor(name) for name in ["emt", "aemet", "informo"]}
+    with patch.dict(runner.EXTRACTORS, extractors):
+        await extract_sources(config, ["emt", "aemet", "informo"])
+
+    # Las tres fuentes se ejecutan a la vez y el error de una no detiene al resto
+    assert running["max"] == 3
+    assert len(sessions) == 3
+    assert len({id(session) for session in sessions}) == 1
+    assert sessions[0].closed
+
+###################### http_session
+@pytest.mark.asyncio
+async def test_http_session_without_shared_session():
+    """Test para verificar que sin sesión compartida se abre una sesión temporal."""
+    async with http_session() as first:
+        pass
+    async with http_session() as second:
+        pass
+    assert first is not second
+    assert first.closed and second.closed
+
+
+@pytest.mark.asyncio
+async def test_http_session_shared():
+    """Test para verificar que dentro de shared_http_session se reutiliza la misma sesión."""
+    async with shared_http_session() as shared:
+        async with http_session() as session:
+            assert session is shared
+        assert not shared.closed
+
+###################### storage_context
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.utils.get_session')
+async def test_storage_context_nested(mock_get_session):
+    """Test para verificar que un contexto de almacenamiento anidado reutiliza el cliente abierto."""
+    config = MagicMock()
+    config.storage.default = "minio"
+    config.storage.config.minio.endpoint = "http://localhost:9000"
+    config.storage.config.minio.access_key = "access"
+    config.storage.config.minio.secret_key = "secret"
+    config.storage.config.minio.max_pool_connections = 10
+
+    async with storage_context(config) as outer:
+        async with storage_context(config) as inner:
+            assert inner is outer
+
+    mock_get_session.return_value.create_client.assert_called_once()
+
+###################### run_periodically
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.sources.extract.runner.extract_source')
+async def test_run_periodically(mock_extract_source):
+    """Test para verificar que la fuente se extrae en cada tick hasta que se para."""
+    stop = asyncio.Event()
+    calls = []
+
+    async def extract(config, source):
+        calls.append(source)
+        if len(calls) == 3:
+            stop.set()
+
+    mock_extract_source.side_effect = extract
+
+    await asyncio.wait_for(run_periodically(MagicMock(), "informo", 0.02, stop, jitter=0), timeout=2)
+
+    assert calls == ["informo"] * 3
+
+
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.sources.extract.runner.logger')
+@patch('inesdata_mov_datasets.sources.extract.runner.extract_source')
+async def test_run_periodically_catch_up(mock_extract_source, mock_logger):
+    """Test para verificar que tras perder ticks se ejecuta solo el último y se sigue el horario."""
+    stop = asyncio.Event()
+    interval = 0.05
+    starts = []
+
+    async def extract(config, source):
+        starts.append(time.time())
+        if len(starts) == 1:
+            # La primera extracción tarda varios ticks
+            await asyncio.sleep(interval * 3.5)
+        if len(starts) == 3:
+            stop.set()
+
+    mock_extract_source.side_effect = extract
+
+    await asyncio.wait_for(run_periodically(MagicMock(), "emt", interval, stop, jitter=0), timeout=2)
+
+    assert len(starts) == 3
+    # El tick perdido se recupera inmediatamente y el siguiente vuelve al horario
+    assert starts[1] - starts[0] == pytest.approx(interval * 3.5, abs=0.03)
+    assert starts[2] - starts[1] <= interval + 0.03
+    mock_logger.warning.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.sources.extract.runner.extract_source')
+async def test_run_periodically_errors(mock_extract_source):
+    """Test para verificar que un error en una extracción no detiene el daemon."""
+    stop = asyncio.Event()
+
+    async def extract(config, source):
+        if mock_extract_source.call_count == 1:
+            raise RuntimeError("boom")
+        stop.set()
+
+    mock_extract_source.side_effect = extract
+
+    await asyncio.wait_for(run_periodically(MagicMock(), "aemet", 0.02, stop, jitter=0), timeout=2)
+
+    assert mock_extract_source.call_count == 2
+
+###################### run_daemon
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.sources.extract.runner.run_periodically')
+async def test_run_daemon(mock_run_periodically):
+    """Test para verificar que cada fuente se programa con su intervalo."""
+    config = MagicMock()
+    config.storage.default = "local"
+
+    await run_daemon(config, ["emt", "informo", "aemet"], jitter=1)
+
+    intervals = {call.args[1]: call.args[2] for call in mock_run_periodically.call_args_list}
+    assert intervals == {"emt": 60, "informo": 300, "aemet": 86400}
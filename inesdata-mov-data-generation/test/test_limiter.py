@@ -0,0 +1,157 @@
+import pytest
+import asyncio
+import time
+from aiohttp import ClientSession
+from aioresponses import aioresponses
+
+from inesdata_mov_datasets.handlers.limiter import AdaptiveLimiter, limited
+from inesdata_mov_datasets.sources.extract.emt import get_eta
+
+###################### AdaptiveLimiter
+@pytest.mark.asyncio
+async def test_limiter_bounds_concurrency():
+    """Test para verificar que nunca hay más peticiones en vuelo que el límite."""
+    limiter = AdaptiveLimiter(initial_concurrency=5, max_concurrency=5)
+    running = {"current": 0, "max": 0}
+
+    async def request():
+        async with limiter.slot() as slot:
+            running["current"] += 1
+            running["max"] = max(running["max"], running["current"])
+            await asyncio.sleep(0.001)
+            running["current"] -= 1
+            slot.status = 200
+
+    await asyncio.gather(*[request() for _ in range(50)])
+
+    assert running["max"] == 5
+    assert limiter.stats()["requests"] == 50
+    assert limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_additive_increase():
+    """Test para verificar que las respuestas rápidas aumentan el límite poco a poco."""
+    limiter = AdaptiveLimiter(initial_concurrency=4, max_concurrency=100)
+
+    for _ in range(4):
+        async with limiter.slot() as slot:
+            slot.status = 200
+
+    # Una ventana completa de respuestas correctas suma una petición concurrente
+    assert limiter.concurrency == 5
+
+
+@pytest.mark.asyncio
+async def test_limiter_decrease_on_throttling():
+    """Test para verificar que un 429 o un 5xx reducen el límite a la mitad una vez por ventana."""
+    limiter = AdaptiveLimiter(initial_concurrency=40, latency_target=0.05)
+
+    for status in [429, 503, 429]:
+        async with limiter.slot() as slot:
+            slot.status = status
+    assert limiter.concurrency == 20
+
+    await asyncio.sleep(0.06)
+    async with limiter.slot() as slot:
+        slot.status = 500
+    assert limiter.concurrency == 10
+    assert limiter.stats()["throttled"] == 2
+    assert limiter.stats()["failed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_decrease_on_latency_and_errors():
+    """Test para verificar que las respuestas lentas y las excepciones también reducen el límite."""
+    limiter = AdaptiveLimiter(initial_concurrency=8, min_concurrency=2, latency_target=0.01)
+
+    async with limiter.slot() as slot:
+        await asyncio.sleep(0.02)
+        slot.status = 200
+    assert limiter.concurrency == 4
+
+    await asyncio.sleep(0.02)
+    with pytest.raises(RuntimeError):
+        async with limiter.slot():
+            raise RuntimeError("boom")
+    assert limiter.concurrency == 2
+
+    # Nunca baja del mínimo
+    await asyncio.sleep(0.02)
+    async with limiter.slot() as slot:
+        slot.status = 429
+    assert limiter.concurrency == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_token_bucket():
+    """Test para verificar que se respeta el número máximo de peticiones por segundo."""
+    limiter = AdaptiveLimiter(initial_concurrency=100, max_requests_per_second=50)
+
+    async def request():
+        async with limiter.slot() as slot:
+            slot.status = 200
+
+    start = time.monotonic()
+    await asyncio.gather(*[request() for _ in range(60)])
+
+    # 50 peticiones salen de golpe y las 10 restantes esperan a que se rellene el cubo
+    assert time.monotonic() - start >= 0.18
+
+
+@pytest.mark.asyncio
+async def test_limited_without_limiter():
+    """Test para verificar que sin limitador no se limita nada."""
+    async with limited(None) as slot:
+        slot.status = 200
+
+###################### get_eta con limitador
+@pytest.mark.asyncio
+async def test_get_eta_reports_throttling():
+    """Test para verificar que get_eta informa al limitador de las respuestas 429."""
+    limiter = AdaptiveLimiter(initial_concurrency=10)
+    stop_id = "123"
+    with aioresponses() as mocked:
+        mocked.post(f"https://openapi.emtmadrid.es/v2/transport/busemtmad/stops/{stop_id}/arrives/", status=429)
+        async with ClientSession() as session:
+            result = await get_eta(session, stop_id, {}, limiter)
+
+    assert result == {"code": -1}
+    assert limiter.stats()["throttled"] == 1
+    assert limiter.concurrency == 5
+
+
+
+@pytest.mark.asyncio
+async def test_get_eta_client_error_is_neutral():
+    """Test para verificar que un 4xx distinto de 429 no reduce el límite aunque se lance como error."""
+    limiter = AdaptiveLimiter(initial_concurrency=10)
+    stop_id = "123"
+    with aioresponses() as mocked:
+        mocked.post(f"https://openapi.emtmadrid.es/v2/transport/busemtmad/stops/{stop_id}/arrives/", status=404)
+        async with ClientSession() as session:
+            result = await get_eta(session, stop_id, {}, limiter)
+
+    assert result == {"code": -1}
+    assert limiter.stats()["requests"] == 1
+    assert limiter.stats()["failed"] == 0
+    assert limiter.concurrency == 10
+
+@pytest.mark.asyncio
+async def test_limiter_cancelled_request_is_neutral():
+    """Test para verificar que una petición cancelada libera su hueco sin contar como fallo."""
+    limiter = AdaptiveLimiter(initial_concurrency=4)
+
+    async def request():
+        async with limiter.slot():
+            await asyncio.sleep(10)
+
+    task = asyncio.ensure_future(request())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert limiter.stats()["in_flight"] == 0
+    assert limiter.stats()["failed"] == 0
+    assert limiter.concurrency == 4
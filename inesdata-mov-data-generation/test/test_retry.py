@@ -0,0 +1,210 @@
+import pytest
+import asyncio
+import aiohttp
+import botocore.exceptions
+from aiohttp import ClientSession
+from aioresponses import aioresponses
+
+from inesdata_mov_datasets.handlers.retry import (
+    ApiError,
+    RetryPolicy,
+    call_with_retry,
+    classify_error,
+    hedged,
+    tick_deadline,
+)
+from inesdata_mov_datasets.sources.extract.emt import get_eta
+
+
+def response_error(status):
+    """Crea un error HTTP con el status indicado."""
+    return aiohttp.ClientResponseError(request_info=None, history=(), status=status)
+
+
+###################### classify_error
+def test_classify_error():
+    """Test para verificar la clase de cada error que determina su política de reintentos."""
+    assert classify_error(response_error(429)) == "throttled"
+    assert classify_error(response_error(503)) == "server"
+    assert classify_error(response_error(404)) is None
+    assert classify_error(asyncio.TimeoutError()) == "timeout"
+    assert classify_error(aiohttp.ClientConnectionError()) == "connection"
+    assert classify_error(ApiError({"code": "80"})) == "api"
+    assert classify_error(ValueError()) is None
+
+
+def test_classify_storage_error():
+    """Test para verificar la clase de los errores de S3 al descargar objetos."""
+    def client_error(status):
+        response = {"Error": {"Code": str(status)}, "ResponseMetadata": {"HTTPStatusCode": status}}
+        return botocore.exceptions.ClientError(response, "GetObject")
+
+    assert classify_error(client_error(503)) == "server"
+    assert classify_error(client_error(429)) == "throttled"
+    assert classify_error(client_error(404)) is None
+    assert classify_error(botocore.exceptions.EndpointConnectionError(endpoint_url="http://minio")) == "connection"
+    assert classify_error(botocore.exceptions.ResponseStreamingError(error="Conexión cerrada")) == "connection"
+
+
+###################### call_with_retry
+@pytest.mark.asyncio
+async def test_call_with_retry_recovers():
+    """Test para verificar que una petición que falla se recupera al reintentarla."""
+    calls = []
+
+    async def request():
+        calls.append(1)
+        if len(calls) < 3:
+            raise response_error(503)
+        return {"code": "00"}
+
+    result = await call_with_retry(request, "test")
+
+    assert result == {"code": "00"}
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_call_with_retry_policy_by_error_class():
+    """Test para verificar que cada clase de error agota su propia política."""
+    calls = []
+    policies = {"server": RetryPolicy(max_retries=2, base_delay=0, max_delay=0)}
+
+    async def request():
+        calls.append(1)
+        raise response_error(500)
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        await call_with_retry(request, "test", policies)
+    assert len(calls) == 3  # primer intento y dos reintentos
+
+    # Los errores sin política (4xx) no se reintentan
+    calls.clear()
+
+    async def not_found():
+        calls.append(1)
+        raise response_error(404)
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        await call_with_retry(not_found, "test", policies)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_call_with_retry_stops_at_tick_deadline():
+    """Test para verificar que no se reintenta si la espera supera el final del tick."""
+    calls = []
+    policies = {"server": RetryPolicy(max_retries=5, base_delay=1, max_delay=1)}
+
+    async def request():
+        calls.append(1)
+        raise response_error(500)
+
+    async with tick_deadline(0.05):
+        with pytest.raises(aiohttp.ClientResponseError):
+            await call_with_retry(request, "test", policies)
+    # Reintentar exigiría esperar hasta 1s y solo quedan 0.05s del tick
+    assert len(calls) <= 2
+
+
+@pytest.mark.asyncio
+async def test_call_with_retry_cuts_slow_request_at_deadline():
+    """Test para verificar que una petición colgada se corta al final del tick."""
+
+    async def request():
+        await asyncio.sleep(10)
+
+    async with tick_deadline(0.05):
+        with pytest.raises(asyncio.TimeoutError):
+            await call_with_retry(request, "test")
+
+
+###################### hedged
+@pytest.mark.asyncio
+async def test_hedged_slow_request():
+    """Test para verificar que una petición lenta se duplica y gana la respuesta más rápida."""
+    calls = []
+    cancelled = []
+
+    async def request():
+        calls.append(1)
+        try:
+            await asyncio.sleep(1 if len(calls) == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return len(calls)
+
+    result = await hedged(request, hedge_after=0.05)
+
+    assert result == 2
+    assert len(calls) == 2
+    assert cancelled == [1]  # la petición lenta se cancela
+
+
+@pytest.mark.asyncio
+async def test_hedged_fast_request():
+    """Test para verificar que una petición rápida no se duplica."""
+    calls = []
+
+    async def request():
+        calls.append(1)
+        return "ok"
+
+    assert await hedged(request, hedge_after=0.05) == "ok"
+    assert len(calls) == 1
+
+
+
+@pytest.mark.asyncio
+async def test_hedged_cancelled_before_hedging():
+    """Test para verificar que al cancelar antes de duplicar la petición también se cancela la primera."""
+    cancelled = []
+
+    async def request():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return "ok"
+
+    async with tick_deadline(0.2):
+        with pytest.raises(asyncio.TimeoutError):
+            await call_with_retry(request, "petición lenta", hedge_after=0.5)
+
+    # La petición no queda huérfana terminando después del límite del tick
+    assert cancelled == [1]
+###################### get_eta
+@pytest.mark.asyncio
+async def test_get_eta_recovers_failed_stop():
+    """Test para verificar que una parada que falla se recupera en la misma extracción."""
+    stop_id = "123"
+    eta_url = f"https://openapi.emtmadrid.es/v2/transport/busemtmad/stops/{stop_id}/arrives/"
+    mock_response = {"code": "00", "data": [{"Arrive": []}]}
+
+    async with ClientSession() as session:
+        with aioresponses() as m:
+            m.post(eta_url, status=500)
+            m.post(eta_url, payload={"code": "98", "description": "Temporary error"})
+            m.post(eta_url, payload=mock_response)
+
+            result = await get_eta(session, stop_id, headers={})
+
+    assert result == mock_response
+
+
+@pytest.mark.asyncio
+async def test_get_eta_returns_api_error_code():
+    """Test para verificar que se devuelve la respuesta con el código de error tras reintentar."""
+    stop_id = "123"
+    eta_url = f"https://openapi.emtmadrid.es/v2/transport/busemtmad/stops/{stop_id}/arrives/"
+    error_response = {"code": "80", "description": "Stop not found"}
+
+    async with ClientSession() as session:
+        with aioresponses() as m:
+            m.post(eta_url, payload=error_response, repeat=True)
+
+            result = await get_eta(session, stop_id, headers={})
+
+    assert result == error_response
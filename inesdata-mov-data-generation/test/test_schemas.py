@@ -0,0 +1,120 @@
+import pytest
+
+from inesdata_mov_datasets.handlers import schemas
+from inesdata_mov_datasets.handlers.schemas import (
+    AemetForecast,
+    AemetResponse,
+    EtaResponse,
+    InformoResponse,
+    SchemaError,
+    as_schema,
+    decode,
+)
+
+ETA_RESPONSE = (
+    b'{"code": "00", "datetime": "2024-10-08T10:00:00", "data": [{"StopInfo": [], "Arrive": ['
+    b'{"line": "27", "stop": "72", "bus": 5631, "isHead": "False", "deviation": 0,'
+    b' "geometry": {"type": "Point", "coordinates": [-3.68, 40]}, "estimateArrive": 126}]}]}'
+)
+
+
+@pytest.fixture(params=["msgspec", "json"])
+def decoder(request, monkeypatch):
+    """Fixture para decodificar con msgspec (si está instalado) y con la conversión de respaldo."""
+    if request.param == "msgspec":
+        pytest.importorskip("msgspec")
+    else:
+        monkeypatch.setattr(schemas, "msgspec", None)
+    return request.param
+
+
+###################### decode
+def test_decode_eta():
+    """Test para verificar que msgspec solo decodifica los campos del esquema de ETA."""
+    pytest.importorskip("msgspec")
+    response = decode(ETA_RESPONSE, EtaResponse)
+
+    arrive = response.data[0].Arrive[0]
+    assert response.datetime == "2024-10-08T10:00:00"
+    assert (arrive.line, arrive.stop, arrive.bus, arrive.estimateArrive) == ("27", "72", 5631, 126)
+    assert arrive.geometry.coordinates == [-3.68, 40.0]
+    # Los campos ausentes quedan a None y los que no están en el esquema no se guardan
+    assert arrive.DistanceBus is None
+    assert not hasattr(arrive.geometry, "type")
+
+
+def test_decode_eta_envelope(decoder):
+    """Test para verificar que sin msgspec solo se comprueba el sobre y las llegadas quedan como dicts."""
+    response = decode(ETA_RESPONSE, EtaResponse)
+
+    arrive = response.data[0].Arrive[0]
+    assert response.datetime == "2024-10-08T10:00:00"
+    if decoder == "json":
+        assert arrive["line"] == "27"
+        assert arrive["geometry"]["coordinates"] == [-3.68, 40]
+
+
+def test_decode_aemet_and_informo(decoder):
+    """Test para verificar los esquemas de AEMET (con y sin predicción) e Informo."""
+    aemet = decode(b'[{"prediccion": {"dia": [{"fecha": "2024-10-08"}]}}, {"prediccion": []}]', AemetResponse)
+    informo = decode(b'{"pms": {"fecha_hora": "08/10/2024 10:00:00", "pm": [{"idelem": "1"}]}}', InformoResponse)
+
+    assert isinstance(aemet[0].prediccion, AemetForecast)
+    assert aemet[0].prediccion.dia == [{"fecha": "2024-10-08"}]
+    assert aemet[1].prediccion == []
+    assert informo.pms.pm == [{"idelem": "1"}]
+    assert decode(b"{}", InformoResponse).pms is None
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"not json",
+        b'{"data": []}',
+        b'{"datetime": "2024-10-08T10:00:00", "data": {"Arrive": []}}',
+        b'{"datetime": "2024-10-08T10:00:00", "data": [{"Arrive": null}]}',
+    ],
+)
+def test_decode_malformed(decoder, data):
+    """Test para verificar que se rechazan los ficheros con el sobre mal formado."""
+    with pytest.raises(SchemaError):
+        decode(data, EtaResponse)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b'{"datetime": "2024-10-08T10:00:00", "data": [{"Arrive": [{"line": "1", "stop": 1, "bus": 10}]}]}',
+        b'{"datetime": "2024-10-08T10:00:00", "data": [{"Arrive": [{"line": ["1"], "stop": 1, "bus": 10,'
+        b' "geometry": {"coordinates": [1.0, 2.0]}}]}]}',
+    ],
+)
+def test_decode_malformed_arrive(data):
+    """Test para verificar que msgspec también rechaza las llegadas mal formadas."""
+    pytest.importorskip("msgspec")
+    with pytest.raises(SchemaError):
+        decode(data, EtaResponse)
+
+
+@pytest.mark.parametrize(
+    "data, schema",
+    [
+        (b'[{"dia": []}]', AemetResponse),
+        (b'[{"prediccion": "none"}]', AemetResponse),
+        (b'{"pms": {"pm": []}}', InformoResponse),
+        (b'{"pms": []}', InformoResponse),
+    ],
+)
+def test_decode_malformed_aemet_and_informo(decoder, data, schema):
+    """Test para verificar que se rechazan los ficheros de AEMET e Informo mal formados."""
+    with pytest.raises(SchemaError):
+        decode(data, schema)
+
+
+###################### as_schema
+def test_as_schema_keeps_instances():
+    """Test para verificar que los datos ya convertidos no se vuelven a convertir."""
+    response = as_schema({"datetime": "2024-10-08T10:00:00"}, EtaResponse)
+
+    assert as_schema(response, EtaResponse) is response
+    assert response.data == []
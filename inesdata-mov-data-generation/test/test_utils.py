@@ -1,71 +1,14 @@
 import pytest
+import pandas as pd
 import asyncio
-import aiofiles
+import aiohttp
+import botocore.exceptions
 import os
 import yaml
 from pathlib import Path
-from unittest.mock import MagicMock, patch, AsyncMock, Mock, mock_open
-
-from inesdata_mov_datasets.utils import list_objs, async_download, get_obj, download_obj, download_objs, read_obj, upload_obj, upload_metadata, upload_objs, read_settings, check_local_file_exists, check_s3_file_exists
-
-###################### list_objs
-@patch('inesdata_mov_datasets.utils.botocore.session.get_session')  # Cambia 'inesdata_mov_datasets.utils' por el nombre real del módulo
-def test_list_objs(mock_get_session):
-    """Test para verificar la lista de objetos en un bucket S3."""
-
-    # Configura el cliente S3 simulado
-    mock_client = MagicMock()
-    mock_get_session.return_value.create_client.return_value = mock_client
-
-    # Configura el paginador simulado
-    mock_paginator = MagicMock()
-    mock_client.get_paginator.return_value = mock_paginator
-
-    # Simula la respuesta del paginador
-    mock_paginator.paginate.return_value = [
-        {
-            "Contents": [
-                {"Key": "prefix/file1.txt"},
-                {"Key": "prefix/file2.txt"},
-            ]
-        },
-        {
-            "Contents": [
-                {"Key": "prefix/file3.txt"},
-            ]
-        },
-    ]
-
-    # Llama a la función
-    bucket = "my-bucket"
-    prefix = "prefix/"
-    endpoint_url = "http://minio:9000"
-    aws_access_key_id = "my-access-key"
-    aws_secret_access_key = "my-secret-key"
+from unittest.mock import MagicMock, patch, AsyncMock, mock_open
 
-    result = list_objs(bucket, prefix, endpoint_url, aws_secret_access_key, aws_access_key_id)
-
-    # Verifica que se llame a create_client con los parámetros correctos
-    mock_get_session.return_value.create_client.assert_called_once_with(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_secret_access_key=aws_secret_access_key,
-        aws_access_key_id=aws_access_key_id,
-    )
-
-    # Verifica que se llame a get_paginator
-    mock_client.get_paginator.assert_called_once_with("list_objects_v2")
-
-    # Verifica que el resultado sea el esperado
-    expected_keys = [
-        "prefix/file1.txt",
-        "prefix/file2.txt",
-        "prefix/file3.txt",
-    ]
-    assert result == expected_keys
-
-    # Verifica que se llame a paginate una vez con los parámetros correctos
-    mock_paginator.paginate.assert_called_once_with(Bucket=bucket, Prefix=prefix)
+from inesdata_mov_datasets.utils import read_metadata_keys, async_download, get_obj, download_obj, download_keys, download_objs, read_obj, upload_obj, upload_metadata, upload_objs, read_settings, check_local_file_exists, check_s3_file_exists, StorageClient, list_s3_keys, stream_objs, ColumnAccumulator, compress, decompress, encode_raw, open_raw, raw_object_name, write_processed_df
 
 ###################### async_download
 @patch('inesdata_mov_datasets.utils.download_objs')  # Cambia 'inesdata_mov_datasets.utils' por el nombre real del módulo
@@ -94,6 +37,8 @@ def test_async_download(mock_download_objs):
         endpoint_url,
         aws_access_key_id,
         aws_secret_access_key,
+        None,
+        50,
     )
 
     # Verifica que se haya creado un nuevo loop de eventos
@@ -132,6 +77,16 @@ def mock_storage_path(tmp_path):
     # Usa la ruta temporal proporcionada por pytest
     return str(tmp_path)
 
+def body_mock(chunks):
+    """Crea el cuerpo de una respuesta de S3 que devuelve el contenido en trozos."""
+    async def iter_chunks(chunk_size):
+        for chunk in chunks:
+            yield chunk
+
+    body = AsyncMock()
+    body.iter_chunks = iter_chunks
+    return body
+
 @pytest.mark.asyncio
 async def test_download_obj(mock_storage_path):
     """Test para verificar la descarga de un objeto desde S3."""
@@ -139,9 +94,9 @@ async def test_download_obj(mock_storage_path):
     # Crear un cliente simulado
     mock_client = AsyncMock()
     
-    # Simular la respuesta de get_obj
-    mock_resp = b'{"key": "value"}'  # Simula el contenido del objeto
-    mock_client.get_object = AsyncMock(return_value={"Body": AsyncMock(read=AsyncMock(return_value=mock_resp))})
+    # Simular el cuerpo de la respuesta, que llega en varios trozos
+    mock_body = body_mock([b'{"key": ', b'"value"}'])
+    mock_client.get_object = AsyncMock(return_value={"Body": mock_body})
 
     # Define los parámetros de entrada
     bucket = "my-bucket"
@@ -155,8 +110,8 @@ async def test_download_obj(mock_storage_path):
     mock_client.get_object.assert_called_once_with(Bucket=bucket, Key=key)
 
     # Verifica que el archivo se ha escrito en el directorio correcto
-    async with aiofiles.open(os.path.join(mock_storage_path, key), "r") as out_file:
-        content = await out_file.read()
+    with open(os.path.join(mock_storage_path, key), "r") as out_file:
+        content = out_file.read()
 
     # Verifica que el contenido del archivo es el esperado
     assert content == '{"key": "value"}'
@@ -167,22 +122,52 @@ async def test_download_obj(mock_storage_path):
 
 
 
+@pytest.mark.asyncio
+async def test_download_obj_error(mock_storage_path):
+    """Test para verificar que una descarga interrumpida no deja un fichero a medias."""
+    async def iter_chunks(chunk_size):
+        yield b'{"key": '
+        raise aiohttp.ClientPayloadError("Conexión cerrada")
+
+    mock_body = AsyncMock()
+    mock_body.iter_chunks = iter_chunks
+    mock_client = AsyncMock()
+    mock_client.get_object = AsyncMock(return_value={"Body": mock_body})
+
+    with pytest.raises(aiohttp.ClientPayloadError):
+        await download_obj(mock_client, "my-bucket", "raw/my-object-key", mock_storage_path)
+
+    # No queda ni el fichero ni el temporal
+    assert os.listdir(os.path.join(mock_storage_path, "raw")) == []
+    # Se libera la conexión de la respuesta
+    mock_body.__aexit__.assert_called_once()
+
+
 ###################### download_objs
 @pytest.mark.asyncio
-@patch('inesdata_mov_datasets.utils.get_session')  
-@patch('inesdata_mov_datasets.utils.download_obj')  
-@patch('inesdata_mov_datasets.utils.list_objs')  
-@patch('inesdata_mov_datasets.utils.logger')  
-async def test_download_objs_without_eta(mock_logger, mock_list_objs, mock_download_obj, mock_get_session):
-    """Test para verificar la descarga de objetos desde S3 sin '/eta' en el prefix."""
-    
-    # Simular el cliente S3
+@patch('inesdata_mov_datasets.utils.get_session')
+@patch('inesdata_mov_datasets.utils.download_obj')
+@patch('inesdata_mov_datasets.utils.logger')
+async def test_download_objs_without_eta(mock_logger, mock_download_obj, mock_get_session):
+    """Test para verificar que sin '/eta' en el prefix las descargas empiezan mientras se lista."""
+    first_downloaded = asyncio.Event()
+
+    async def pages():
+        yield {"Contents": [{"Key": "key1"}, {"Key": "key2"}]}
+        # La segunda página solo llega cuando ya se ha descargado algún objeto de la primera
+        await first_downloaded.wait()
+        yield {"Contents": [{"Key": "key3"}]}
+
+    async def download(client, bucket, key, output_path):
+        first_downloaded.set()
+
+    # Simular el cliente S3 con un listado paginado
     mock_client = AsyncMock()
+    mock_client.get_paginator = MagicMock()
+    mock_client.get_paginator.return_value.paginate.return_value = pages()
     mock_get_session.return_value.create_client.return_value.__aenter__.return_value = mock_client
-    
-    # Simular los objetos listados
-    mock_list_objs.return_value = ['key1', 'key2', 'key3']
-    
+    mock_download_obj.side_effect = download
+
     bucket = "my-bucket"
     prefix = "some/path/"
     output_path = "tmp/"
@@ -191,17 +176,56 @@ async def test_download_objs_without_eta(mock_logger, mock_list_objs, mock_downl
     aws_secret_access_key = "minio_password"
 
     # Ejecutar la función
-    await download_objs(bucket, prefix, output_path, endpoint_url, aws_access_key_id, aws_secret_access_key)
+    failed = await asyncio.wait_for(
+        download_objs(bucket, prefix, output_path, endpoint_url, aws_access_key_id, aws_secret_access_key),
+        timeout=5,
+    )
 
-    # Verifica que se llama a list_objs con los parámetros correctos
-    mock_list_objs.assert_called_once_with(bucket, prefix, endpoint_url, aws_secret_access_key, aws_access_key_id)
+    # Verifica que se lista el prefix con el paginador asíncrono
+    mock_client.get_paginator.return_value.paginate.assert_called_once_with(Bucket=bucket, Prefix=prefix)
 
     # Verifica que se llama a download_obj con las claves obtenidas
     assert mock_download_obj.call_count == 3  # Tres claves: key1, key2, key3
+    assert failed == []
 
     # Verifica que se haya llamado al logger
     mock_logger.debug.assert_any_call("Downloading files from s3")
-    # mock_logger.debug.assert_any_call("Downloading 3 files from emt endpoint")
+
+
+###################### download_keys
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.utils.download_obj')
+async def test_download_keys(mock_download_obj):
+    """Test para verificar que se descarga con un número fijo de workers, reintentando cada objeto."""
+    running = 0
+    max_running = 0
+    attempts = {}
+
+    async def download(client, bucket, key, output_path):
+        nonlocal running, max_running
+        attempts[key] = attempts.get(key, 0) + 1
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        if key == "key3" and attempts[key] == 1:
+            raise aiohttp.ClientConnectionError("Conexión cerrada")
+        if key == "key5":
+            raise ValueError("Objeto no válido")
+
+    mock_download_obj.side_effect = download
+    keys = [f"key{i}" for i in range(20)]
+
+    failed = await download_keys(AsyncMock(), "my-bucket", keys, "tmp/", max_downloads=4)
+
+    # Nunca hay más descargas a la vez que workers
+    assert max_running == 4
+    assert set(attempts) == set(keys)
+    # Los errores de conexión se reintentan y los demás se descartan
+    assert attempts["key3"] == 2
+    assert attempts["key5"] == 1
+    assert failed == ["key5"]
+
 
 ###################### read_obj
 @pytest.mark.asyncio
@@ -258,13 +282,14 @@ async def test_upload_obj(mock_client_creator_context):
     mock_client.put_object.assert_called_once_with(Bucket=bucket, Key=key, Body=object_value.encode("utf-8"))
 
 ###################### upload_metadata
-@patch('botocore.session.get_session')  # Mock para la sesión de botocore
-def test_upload_metadata(mock_get_session):
-    """Test para verificar la subida de metadatos a S3."""
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.utils.get_session')
+async def test_upload_metadata(mock_get_session):
+    """Test para verificar que cada subida de metadatos escribe un fragmento nuevo sin leer los anteriores."""
     
     # Simular el cliente S3
-    mock_client = Mock()
-    mock_get_session.return_value.create_client.return_value = mock_client
+    mock_client = AsyncMock()
+    mock_get_session.return_value.create_client.return_value.__aenter__.return_value = mock_client
 
     bucket = "my-bucket"
     endpoint_url = "http://localhost:9000"
@@ -272,29 +297,84 @@ def test_upload_metadata(mock_get_session):
     aws_secret_access_key = "test-secret-key"
     keys = ["some/object/key1", "some/object/key2"]
 
-    # Caso 1: El archivo de metadatos ya existe
-    mock_client.get_object.return_value = {
-        'Body': Mock(read=Mock(return_value=b'old_file1\nold_file2\n'))
+    await upload_metadata(bucket, endpoint_url, aws_access_key_id, aws_secret_access_key, keys)
+    await upload_metadata(bucket, endpoint_url, aws_access_key_id, aws_secret_access_key, keys)
+
+    # No se lee el contenido previo
+    mock_client.get_object.assert_not_called()
+
+    # Cada llamada escribe su propio fragmento con las claves subidas
+    assert mock_client.put_object.call_count == 2
+    shard_keys = [call.kwargs["Key"] for call in mock_client.put_object.call_args_list]
+    assert shard_keys[0] != shard_keys[1]
+    for call in mock_client.put_object.call_args_list:
+        assert call.kwargs["Bucket"] == bucket
+        assert call.kwargs["Key"].startswith("some/object/metadata/")
+        assert call.kwargs["Body"] == b"some/object/key1\nsome/object/key2"
+
+
+def mock_metadata_client(shards: dict, legacy: bytes = None) -> AsyncMock:
+    """Crea un cliente S3 simulado con fragmentos de metadatos y, opcionalmente, un metadata.txt antiguo."""
+    mock_client = AsyncMock()
+    mock_client.get_paginator = MagicMock()
+    mock_client.get_paginator.return_value.paginate.return_value = AsyncPages(
+        [{"Contents": [{"Key": key} for key in shards]}]
+    )
+
+    async def get_object(Bucket, Key):
+        if Key.endswith("metadata.txt"):
+            if legacy is None:
+                raise botocore.exceptions.ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+            body = AsyncMock()
+            body.__aenter__.return_value.read = AsyncMock(return_value=legacy)
+            return {"Body": body}
+        return {"Body": AsyncMock(read=AsyncMock(return_value=shards[Key]))}
+
+    mock_client.get_object.side_effect = get_object
+    return mock_client
+
+
+@pytest.mark.asyncio
+async def test_read_metadata_keys():
+    """Test para verificar que se combinan los fragmentos de metadatos y el metadata.txt antiguo."""
+    prefix = "raw/emt/2024/10/08/eta/"
+    shards = {
+        prefix + "metadata/20241008T100100000000_b.txt": b"eta_3\neta_4",
+        prefix + "metadata/20241008T100000000000_a.txt": b"eta_2\neta_3\n",
     }
-    
-    upload_metadata(bucket, endpoint_url, aws_access_key_id, aws_secret_access_key, keys)
+    mock_client = mock_metadata_client(shards, legacy=b"eta_1\n\neta_2\n")
+
+    keys = await read_metadata_keys(mock_client, "bucket", prefix)
+
+    assert keys == ["eta_1", "eta_2", "eta_3", "eta_4"]
+    mock_client.get_paginator.return_value.paginate.assert_called_once_with(
+        Bucket="bucket", Prefix=prefix + "metadata/"
+    )
+
+    # Días sin metadata.txt antiguo
+    mock_client = mock_metadata_client(shards)
+    assert await read_metadata_keys(mock_client, "bucket", prefix) == ["eta_2", "eta_3", "eta_4"]
 
-    # Verifica que se llama a get_object para obtener el contenido previo
-    mock_client.get_object.assert_called_once_with(Bucket=bucket, Key='some/object/metadata.txt')
 
-    # Verifica que se llama a put_object con el nuevo contenido
-    expected_content = 'old_file1\nold_file2\n\nsome/object/key1\nsome/object/key2'
-    mock_client.put_object.assert_called_once_with(Bucket=bucket, Key='some/object/metadata.txt', Body=expected_content.encode('utf-8'))
+@pytest.mark.asyncio
+async def test_read_metadata_keys_error():
+    """Test para verificar que solo se ignora la ausencia del metadata.txt antiguo y no otros errores."""
+    prefix = "raw/emt/2024/10/08/eta/"
+    mock_client = mock_metadata_client({prefix + "metadata/20241008T100000000000_a.txt": b"eta_1"})
+    read_shard = mock_client.get_object.side_effect
+
+    async def get_object(Bucket, Key):
+        if Key.endswith("metadata.txt"):
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "AccessDenied"}, "ResponseMetadata": {"HTTPStatusCode": 403}}, "GetObject"
+            )
+        return await read_shard(Bucket, Key)
 
-    # Caso 2: El archivo de metadatos no existe (primer ejecución del día)
-    mock_client.reset_mock()  # Reinicia los mocks
-    mock_client.get_object.side_effect = Exception("File not found")  # Simula que no se encuentra el archivo
+    mock_client.get_object.side_effect = get_object
 
-    upload_metadata(bucket, endpoint_url, aws_access_key_id, aws_secret_access_key, keys)
+    with pytest.raises(botocore.exceptions.ClientError):
+        await read_metadata_keys(mock_client, "bucket", prefix)
 
-    # Verifica que se llama a put_object con el nuevo contenido
-    new_expected_content = 'some/object/key1\nsome/object/key2'
-    mock_client.put_object.assert_called_once_with(Bucket=bucket, Key='some/object/metadata.txt', Body=new_expected_content.encode('utf-8'))
 
 ###################### upload_objs
 @patch('botocore.session.get_session')  # Mock para la sesión de botocore
@@ -444,4 +524,227 @@ async def test_check_s3_file_exists_does_not_exist():
         
         result = await check_s3_file_exists(endpoint_url, aws_secret_access_key, aws_access_key_id, bucket_name, object_name)
 
-    assert result is False
\ No newline at end of file
+    assert result is False
+
+###################### StorageClient
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.utils.get_session')
+async def test_storage_client_reused_by_helpers(mock_get_session):
+    """Test para verificar que los helpers reutilizan el cliente compartido abierto."""
+    mock_client = AsyncMock()
+    mock_client.head_object.return_value = None
+    mock_get_session.return_value.create_client.return_value.__aenter__.return_value = mock_client
+
+    endpoint_url = "http://localhost:9000"
+    async with StorageClient(endpoint_url, "access_key", "secret", max_pool_connections=5):
+        await check_s3_file_exists(endpoint_url, "secret", "access_key", "bucket", "a.json")
+        await check_s3_file_exists(endpoint_url, "secret", "access_key", "bucket", "b.json")
+        await upload_objs("bucket", endpoint_url, "access_key", "secret", {"c.json": "{}"})
+
+    # Una única conexión (y handshake) para todas las llamadas
+    assert mock_get_session.return_value.create_client.call_count == 1
+    assert mock_client.head_object.call_count == 2
+    mock_client.put_object.assert_called_once()
+    # El tamaño del pool se configura en el cliente
+    config = mock_get_session.return_value.create_client.call_args.kwargs["config"]
+    assert config.max_pool_connections == 5
+
+
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.utils.get_session')
+async def test_storage_client_use_ssl(mock_get_session):
+    """Test para verificar que el uso de SSL sigue el parámetro secure de MinIO o, si no, el esquema del endpoint."""
+    create_client = mock_get_session.return_value.create_client
+    settings = MagicMock()
+    settings.storage.config.minio.endpoint = "https://minio:9000"
+    settings.storage.config.minio.max_pool_connections = 5
+
+    for secure in [False, True]:
+        settings.storage.config.minio.secure = secure
+        async with StorageClient.from_settings(settings):
+            pass
+        assert create_client.call_args.kwargs["use_ssl"] is secure
+
+    for endpoint_url, use_ssl in [("http://localhost:9000", False), ("https://minio:9000", True)]:
+        async with StorageClient(endpoint_url, "access_key", "secret"):
+            pass
+        assert create_client.call_args.kwargs["use_ssl"] is use_ssl
+
+
+###################### list_s3_keys
+class AsyncPages:
+    """Simula las páginas devueltas por un paginador asíncrono de aiobotocore."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for page in self.pages:
+            yield page
+
+
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.utils.get_session')
+async def test_list_s3_keys(mock_get_session):
+    """Test para verificar el listado asíncrono de claves de un prefijo."""
+    mock_client = AsyncMock()
+    mock_client.get_paginator = MagicMock()
+    mock_client.get_paginator.return_value.paginate.return_value = AsyncPages(
+        [{"Contents": [{"Key": "prefix/a.json"}, {"Key": "prefix/b.json"}]}, {}]
+    )
+    mock_get_session.return_value.create_client.return_value.__aenter__.return_value = mock_client
+
+    keys = await list_s3_keys("http://localhost:9000", "secret", "access_key", "bucket", "prefix/")
+
+    assert keys == ["prefix/a.json", "prefix/b.json"]
+    mock_client.get_paginator.assert_called_once_with("list_objects_v2")
+    mock_client.get_paginator.return_value.paginate.assert_called_once_with(Bucket="bucket", Prefix="prefix/")
+
+
+###################### stream_objs
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.utils.get_session')
+async def test_stream_objs_bounded(mock_get_session):
+    """Test para verificar la lectura en memoria con un número acotado de objetos en vuelo."""
+    keys = [f"raw/emt/2024/10/08/eta/eta_{i}.json" for i in range(20)]
+    in_flight = {"current": 0, "max": 0}
+
+    mock_client = mock_metadata_client({"raw/emt/2024/10/08/eta/metadata/shard.txt": "\n".join(keys).encode()})
+    read_shard = mock_client.get_object.side_effect
+
+    async def get_object(Bucket, Key):
+        if "/metadata" in Key:
+            return await read_shard(Bucket, Key)
+        in_flight["current"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["current"])
+        await asyncio.sleep(0)
+        return {"Body": AsyncMock(read=AsyncMock(return_value=Key.encode()))}
+
+    mock_client.get_object.side_effect = get_object
+    mock_get_session.return_value.create_client.return_value.__aenter__.return_value = mock_client
+
+    results = []
+    async for key, body in stream_objs(
+        "bucket", "raw/emt/2024/10/08/eta/", "http://localhost:9000", "access", "secret", max_in_flight=4
+    ):
+        # El consumidor libera el hueco del objeto recibido
+        in_flight["current"] -= 1
+        results.append((key, body))
+
+    assert sorted(results) == sorted((key, key.encode()) for key in keys)
+    assert in_flight["max"] <= 4
+
+
+@pytest.mark.asyncio
+@patch('inesdata_mov_datasets.utils.get_session')
+async def test_stream_objs_retry(mock_get_session):
+    """Test para verificar que se reintenta la lectura de un objeto y se descartan los que siguen fallando."""
+    keys = ["raw/emt/2024/10/08/eta/eta_1.json", "raw/emt/2024/10/08/eta/eta_2.json", "raw/emt/2024/10/08/eta/eta_3.json"]
+    attempts = {}
+
+    mock_client = mock_metadata_client({"raw/emt/2024/10/08/eta/metadata/shard.txt": "\n".join(keys).encode()})
+    read_shard = mock_client.get_object.side_effect
+
+    async def get_object(Bucket, Key):
+        if "/metadata" in Key:
+            return await read_shard(Bucket, Key)
+        attempts[Key] = attempts.get(Key, 0) + 1
+        if Key.endswith("eta_1.json") and attempts[Key] == 1:
+            raise aiohttp.ClientConnectionError("Conexión cerrada")
+        if Key.endswith("eta_2.json"):
+            raise ValueError("Objeto no válido")
+        return {"Body": AsyncMock(read=AsyncMock(return_value=Key.encode()))}
+
+    mock_client.get_object.side_effect = get_object
+    mock_get_session.return_value.create_client.return_value.__aenter__.return_value = mock_client
+
+    results = [
+        key
+        async for key, _ in stream_objs(
+            "bucket", "raw/emt/2024/10/08/eta/", "http://localhost:9000", "access", "secret", max_in_flight=2
+        )
+    ]
+
+    # Los errores de conexión se reintentan y los demás se descartan sin cortar la lectura
+    assert sorted(results) == [keys[0], keys[2]]
+    assert attempts[keys[0]] == 2
+    assert attempts[keys[1]] == 1
+
+
+def test_column_accumulator():
+    """Test para verificar que el acumulador construye un único DataFrame con columnas alineadas."""
+    accumulator = ColumnAccumulator()
+    accumulator.add([{"a": 1, "geometry": {}}, {"a": 2, "geometry": {}}], columns={"day": "lunes", "x": [10, 20]}, exclude=("geometry",))
+    accumulator.add([{"a": 3, "b": "nuevo"}])
+    accumulator.add([])
+
+    df = accumulator.to_frame()
+
+    assert accumulator.length == 3
+    assert list(df.columns) == ["a", "day", "x", "b"]
+    assert list(df["a"]) == [1, 2, 3]
+    assert list(df["day"]) == ["lunes", "lunes", None]
+    assert list(df["x"][:2]) == [10, 20]
+    assert list(df["b"]) == [None, None, "nuevo"]
+
+
+###################### compress
+def test_compress_gzip_round_trip(tmp_path):
+    """Test para verificar que un fichero comprimido con gzip se lee según su extensión."""
+    content = '{"code": "00", "data": []}'
+    name = raw_object_name("eta_1.json", "gzip")
+    assert name == "eta_1.json.gz"
+    assert raw_object_name("eta_1.json", None) == "eta_1.json"
+
+    data = encode_raw(content, "gzip")
+    assert data != content.encode("utf-8")
+    assert decompress(data, name) == content.encode("utf-8")
+    # Los ficheros sin extensión de compresión se devuelven tal cual
+    assert decompress(content.encode("utf-8"), "eta_1.json") == content.encode("utf-8")
+
+    path = tmp_path / name
+    path.write_bytes(data)
+    with open_raw(str(path)) as f:
+        assert f.read() == content.encode("utf-8")
+
+
+def test_compress_unknown():
+    """Test para verificar que se rechaza una compresión desconocida."""
+    with pytest.raises(ValueError):
+        compress(b"data", "lz4")
+
+
+###################### write_processed_df
+def test_write_processed_df_parquet(tmp_path):
+    """Test para verificar la exportación a Parquet ordenada por fecha y con columnas diccionario."""
+    import pyarrow.parquet as pq
+
+    df = pd.DataFrame({
+        "datetime": pd.to_datetime(["2024-10-08 10:01", "2024-10-08 10:00", "2024-10-08 10:02"]),
+        "line": ["1", "2", "1"],
+        "estimateArrive": [120, 60, 30],
+    })
+
+    path = write_processed_df(df, tmp_path / "emt_20241008", "parquet", dictionary_columns=("line",))
+
+    assert path == tmp_path / "emt_20241008.parquet"
+    parquet_file = pq.ParquetFile(path)
+    # Los grupos de filas indican la columna por la que están ordenados
+    assert parquet_file.metadata.row_group(0).sorting_columns[0].column_index == 0
+    result = pd.read_parquet(path)
+    assert result["datetime"].is_monotonic_increasing
+    assert list(result["estimateArrive"]) == [60, 120, 30]
+    assert isinstance(result["line"].dtype, pd.CategoricalDtype)
+
+
+def test_write_processed_df_csv(tmp_path):
+    """Test para verificar que el formato por defecto sigue siendo CSV."""
+    df = pd.DataFrame({"datetime": ["2024-10-08 10:00"], "line": ["1"]})
+
+    path = write_processed_df(df, tmp_path / "emt_20241008")
+
+    assert path == tmp_path / "emt_20241008.csv"
+    assert pd.read_csv(path).shape == (1, 2)